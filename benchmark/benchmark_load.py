@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""Startup benchmark of thrift file loading.
+
+A tree of thrift files including each other is generated, then loaded cold
+and warm by `thriftpy.load`, and imported through the import hook. The time
+of a cold load is broken down by phase::
+
+    $ python benchmark_load.py --files 300 --definitions 20 --repeat 3
+
+The tokenizing time is measured by running the lexer alone over every file,
+parsing is what is left of the load once the other phases are deducted.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from ply import lex, yacc
+
+import thriftpy
+from thriftpy.hook import install_import_hook, remove_import_hook
+from thriftpy.parser import parser as thrift_parser
+
+try:
+    from time import perf_counter
+except ImportError:
+    from timeit import default_timer as perf_counter
+
+PHASES = ("lexer_construction", "parser_construction", "tokenizing",
+          "parsing", "class_creation")
+
+
+def file_name(i):
+    return "f%04d" % i
+
+
+def generate_tree(root, files, definitions, fanout):
+    """Write `files` thrift files of about `definitions` definitions each.
+
+    The files form a tree, every file includes `fanout` children and refers
+    to their structs, so loading f0000.thrift loads them all.
+    """
+    for i in range(files):
+        children = [file_name(c)
+                    for c in range(i * fanout + 1, (i + 1) * fanout + 1)
+                    if c < files]
+
+        lines = ['include "%s.thrift"' % c for c in children]
+        lines.append("")
+
+        structs = []
+        for k in range(definitions - 1):
+            if k % 4 == 0:
+                lines.append("enum E%d {" % k)
+                lines.extend("    V%d = %d," % (v, v) for v in range(5))
+                lines.append("}")
+                enum = "E%d" % k
+            else:
+                lines.append("struct S%d {" % k)
+                lines.append("    1: required i64 id,")
+                lines.append("    2: optional string name,")
+                lines.append("    3: optional list<i64> values,")
+                lines.append("    4: optional map<string, i32> attrs,")
+                lines.append("    5: optional %s kind," % enum)
+                for fid, child in enumerate(children, 6):
+                    lines.append("    %d: optional %s.S1 child%d," % (
+                        fid, child, fid))
+                lines.append("}")
+                structs.append("S%d" % k)
+            lines.append("")
+
+        lines.append("service Service%d {" % i)
+        for k, struct in enumerate(structs[:5]):
+            lines.append("    %s get%d(1: i64 id, 2: string name)," % (
+                struct, k))
+        lines.append("}")
+
+        with open(os.path.join(root, file_name(i) + ".thrift"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class Timings(object):
+    """Accumulate the time spent in the phases of loading thrift files."""
+
+    def __init__(self):
+        self.times = dict((phase, 0.0) for phase in PHASES)
+        self._depth = 0
+
+    def timed(self, phase, fn):
+        def wrapper(*args, **kwargs):
+            # only time the outermost call, services create structs
+            if self._depth:
+                return fn(*args, **kwargs)
+
+            self._depth += 1
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.times[phase] += perf_counter() - start
+                self._depth -= 1
+        return wrapper
+
+    @contextlib.contextmanager
+    def patched(self):
+        saved_lex, saved_yacc = lex.lex, yacc.yacc
+
+        # ply finds the grammar in the module of its caller, which is the
+        # wrapper here, so the parser module is passed explicitly.
+        def make_lexer():
+            return saved_lex(module=thrift_parser)
+
+        def make_parser(**kwargs):
+            return saved_yacc(module=thrift_parser, **kwargs)
+
+        patches = {
+            "_make_enum": self.timed("class_creation",
+                                     thrift_parser._make_enum),
+            "_make_struct": self.timed("class_creation",
+                                       thrift_parser._make_struct),
+            "_make_service": self.timed("class_creation",
+                                        thrift_parser._make_service),
+        }
+        saved = dict((name, getattr(thrift_parser, name)) for name in patches)
+
+        for name, fn in patches.items():
+            setattr(thrift_parser, name, fn)
+        lex.lex = self.timed("lexer_construction", make_lexer)
+        yacc.yacc = self.timed("parser_construction", make_parser)
+        try:
+            yield
+        finally:
+            for name, fn in saved.items():
+                setattr(thrift_parser, name, fn)
+            lex.lex, yacc.yacc = saved_lex, saved_yacc
+
+
+def tokenize_time(root):
+    lexer = lex.lex(module=thrift_parser)
+    start = perf_counter()
+    for name in os.listdir(root):
+        if not name.endswith(".thrift"):
+            continue
+        with open(os.path.join(root, name)) as f:
+            lexer.input(f.read())
+        for _ in iter(lexer.token, None):
+            pass
+    return perf_counter() - start
+
+
+def clear_caches():
+    thrift_parser.thrift_cache.clear()
+    for name in [m for m in sys.modules if m.endswith("_thrift")]:
+        del sys.modules[name]
+
+
+def cold_load(root, tokenizing):
+    clear_caches()
+    timings = Timings()
+    with timings.patched():
+        start = perf_counter()
+        thriftpy.load(os.path.join(root, "f0000.thrift"), include_dir=root)
+        total = perf_counter() - start
+
+    result = dict(timings.times, tokenizing=tokenizing, total=total)
+    result["parsing"] = total - sum(result[phase] for phase in PHASES
+                                    if phase != "parsing")
+    return result
+
+
+def warm_load(root):
+    start = perf_counter()
+    thriftpy.load(os.path.join(root, "f0000.thrift"), include_dir=root)
+    return {"total": perf_counter() - start}
+
+
+def hook_import(root):
+    clear_caches()
+    cwd = os.getcwd()
+    # the import hook resolves thrift files relative to the working directory
+    os.chdir(root)
+    install_import_hook()
+    try:
+        start = perf_counter()
+        __import__("f0000_thrift")
+        return {"total": perf_counter() - start}
+    finally:
+        remove_import_hook()
+        os.chdir(cwd)
+
+
+def median(values):
+    values = sorted(values)
+    n = len(values)
+    return values[n // 2] if n % 2 else \
+        (values[n // 2 - 1] + values[n // 2]) / 2
+
+
+def summarize(runs):
+    return dict((key, median([run[key] for run in runs])) for key in runs[0])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100,
+                        help="number of generated thrift files")
+    parser.add_argument("--definitions", type=int, default=20,
+                        help="definitions in every file")
+    parser.add_argument("--fanout", type=int, default=2,
+                        help="includes in every file")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+
+    root = tempfile.mkdtemp()
+    try:
+        generate_tree(root, opts.files, opts.definitions, opts.fanout)
+        tokenizing = tokenize_time(root)
+
+        cold = []
+        warm = []
+        for _ in range(opts.repeat):
+            cold.append(cold_load(root, tokenizing))
+            warm.append(warm_load(root))
+        hook = [hook_import(root) for _ in range(opts.repeat)]
+    finally:
+        clear_caches()
+        shutil.rmtree(root)
+
+    results = {"cold": summarize(cold), "warm": summarize(warm),
+               "import_hook": summarize(hook)}
+
+    for name in ("cold", "warm", "import_hook"):
+        print("{:>12} {:>10.4f}s".format(name, results[name]["total"]),
+              file=sys.stderr)
+    for phase in PHASES:
+        print("{:>24} {:>10.4f}s".format(phase, results["cold"][phase]),
+              file=sys.stderr)
+
+    output = json.dumps({"python": sys.version, "files": opts.files,
+                         "definitions": opts.definitions * opts.files,
+                         "results": results}, indent=2, sort_keys=True)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
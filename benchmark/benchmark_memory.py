@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""Memory benchmark of the decode paths.
+
+Every workload of benchmark_serialization.py is decoded through every
+protocol and transport combination under tracemalloc, reporting per message
+the peak of traced memory, the memory and number of blocks still held once
+the message is decoded, and what is left after the decoded object is
+dropped::
+
+    $ python benchmark_memory.py --workloads texts --transports cymemory,memory
+
+tracemalloc only sees the python allocators, buffers malloc'ed by the
+cython transports are counted by the buffer pool misses instead.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+
+from thriftpy._compat import CYTHON
+from thriftpy.transport.buffered import TBufferedTransportFactory
+from thriftpy.transport.framed import TFramedTransportFactory
+from thriftpy.transport.memory import TMemoryBuffer
+
+from benchmark_serialization import PROTOCOLS, WORKLOADS
+
+# name -> (memory buffer, factory of the transport wrapping it or None)
+TRANSPORTS = {
+    "memory": (TMemoryBuffer, None),
+    "buffered": (TMemoryBuffer, TBufferedTransportFactory()),
+    "framed": (TMemoryBuffer, TFramedTransportFactory()),
+}
+
+if CYTHON:
+    from thriftpy.transport.buffered import TCyBufferedTransportFactory
+    from thriftpy.transport.framed import TCyFramedTransportFactory
+    from thriftpy.transport.memory import TCyMemoryBuffer
+    from thriftpy.transport.cybase import buffer_pool_stats
+
+    TRANSPORTS["cymemory"] = (TCyMemoryBuffer, None)
+    TRANSPORTS["cybuffered"] = (TCyMemoryBuffer,
+                                TCyBufferedTransportFactory())
+    TRANSPORTS["cyframed"] = (TCyMemoryBuffer, TCyFramedTransportFactory())
+else:
+    def buffer_pool_stats():
+        return {"misses": 0}
+
+
+def supported(protocol, transport):
+    # the cython protocol only works on top of cython transports
+    return protocol != "cybin" or transport.startswith("cy")
+
+
+def make_transport(transport, value=None):
+    buffer_cls, trans_factory = TRANSPORTS[transport]
+    inner = buffer_cls(value) if value is not None else buffer_cls()
+    if trans_factory is None:
+        return inner, inner
+    return inner, trans_factory.get_transport(inner)
+
+
+def encode(obj, protocol, transport):
+    inner, trans = make_transport(transport)
+    proto = PROTOCOLS[protocol].get_protocol(trans)
+    obj.write(proto)
+    proto.write_message_end()
+    if trans is not inner and protocol != "cybin":
+        # the cython protocol flushes by itself at the end of the message
+        trans.flush()
+    return inner.getvalue()
+
+
+def decode(cls, data, protocol, transport):
+    _, trans = make_transport(transport, data)
+    proto = PROTOCOLS[protocol].get_protocol(trans)
+    obj = cls()
+    obj.read(proto)
+    return obj
+
+
+_filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def median(values):
+    values = sorted(values)
+    n = len(values)
+    return values[n // 2] if n % 2 else \
+        (values[n // 2 - 1] + values[n // 2]) / 2
+
+
+def measure(fn, opts):
+    for _ in range(opts.warmup):
+        fn()
+
+    samples = []
+    tracemalloc.start()
+    try:
+        for _ in range(opts.messages):
+            gc.collect()
+            misses = buffer_pool_stats()["misses"]
+            tracemalloc.clear_traces()
+
+            obj = fn()
+            retained, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_filters)
+            blocks = sum(stat.count
+                         for stat in snapshot.statistics("filename"))
+
+            del obj
+            gc.collect()
+            leaked = tracemalloc.get_traced_memory()[0]
+
+            samples.append({
+                "peak_bytes": peak,
+                "retained_bytes": retained,
+                "retained_blocks": blocks,
+                "leaked_bytes": leaked,
+                "buffer_mallocs": buffer_pool_stats()["misses"] - misses,
+            })
+    finally:
+        tracemalloc.stop()
+
+    return dict((key, median([s[key] for s in samples]))
+                for key in samples[0])
+
+
+def run_case(workload, protocol, transport, opts):
+    obj = WORKLOADS[workload]()
+    cls = type(obj)
+
+    result = {"workload": workload, "protocol": protocol,
+              "transport": transport}
+    try:
+        data = encode(obj, protocol, transport)
+        decode(cls, data, protocol, transport)
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+        return result
+
+    result["message_bytes"] = len(data)
+    result.update(measure(lambda: decode(cls, data, protocol, transport),
+                          opts))
+    return result
+
+
+def parse_args(argv):
+    def choices(all_choices):
+        def parse(value):
+            values = value.split(",")
+            for v in values:
+                if v not in all_choices:
+                    raise argparse.ArgumentTypeError(
+                        "%s not in %s" % (v, ", ".join(all_choices)))
+            return values
+        return parse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", type=choices(sorted(WORKLOADS)),
+                        default=sorted(WORKLOADS))
+    parser.add_argument("--protocols", type=choices(sorted(PROTOCOLS)),
+                        default=sorted(PROTOCOLS))
+    parser.add_argument("--transports", type=choices(sorted(TRANSPORTS)),
+                        default=sorted(TRANSPORTS))
+    parser.add_argument("--warmup", type=int, default=3,
+                        help="untraced decodes before measuring")
+    parser.add_argument("--messages", type=int, default=5,
+                        help="traced decodes, the median is reported")
+    parser.add_argument("--output", help="write JSON results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+
+    results = []
+    for workload in opts.workloads:
+        for protocol in opts.protocols:
+            for transport in opts.transports:
+                if not supported(protocol, transport):
+                    continue
+
+                result = run_case(workload, protocol, transport, opts)
+                if "error" in result:
+                    print("{workload:>8} {protocol:>6} {transport:>10}  "
+                          "{error}".format(**result), file=sys.stderr)
+                else:
+                    print("{workload:>8} {protocol:>6} {transport:>10} "
+                          "{message_bytes:>10} bytes  peak {peak_bytes:>10} "
+                          "retained {retained_bytes:>10} "
+                          "blocks {retained_blocks:>7} "
+                          "leaked {leaked_bytes:>6} "
+                          "mallocs {buffer_mallocs:>3}".format(**result),
+                          file=sys.stderr)
+                results.append(result)
+
+    output = json.dumps({"python": sys.version, "results": results},
+                        indent=2, sort_keys=True)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
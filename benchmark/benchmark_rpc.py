@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+"""End to end RPC benchmark.
+
+Runs a server in a subprocess for every combination of protocol, transport,
+server and socket type, hammers it with `concurrency` client threads and
+reports throughput and latency percentiles as JSON::
+
+    $ python benchmark_rpc.py --protocols cybin --servers threaded \\
+        --concurrency 4 --requests 2000 --items 10 --output rpc.json
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import thriftpy
+from thriftpy._compat import CYTHON
+from thriftpy.protocol import TJSONProtocolFactory
+from thriftpy.protocol.binary import TBinaryProtocolFactory
+from thriftpy.rpc import make_client
+from thriftpy.server import TSimpleServer, TThreadedServer
+from thriftpy.thrift import TProcessor
+from thriftpy.transport import TServerSocket
+from thriftpy.transport.buffered import TBufferedTransportFactory
+from thriftpy.transport.framed import TFramedTransportFactory
+
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter
+
+bench = thriftpy.load(os.path.join(os.path.dirname(__file__), "rpc.thrift"),
+                      module_name="rpc_thrift")
+
+PROTOCOLS = {
+    "binary": TBinaryProtocolFactory(),
+    "json": TJSONProtocolFactory(),
+}
+
+TRANSPORTS = {
+    "buffered": TBufferedTransportFactory(),
+    "framed": TFramedTransportFactory(),
+}
+
+if CYTHON:
+    from thriftpy.protocol.cybin import TCyBinaryProtocolFactory
+    from thriftpy.transport.buffered import TCyBufferedTransportFactory
+    from thriftpy.transport.framed import TCyFramedTransportFactory
+
+    PROTOCOLS["cybin"] = TCyBinaryProtocolFactory()
+    TRANSPORTS["cybuffered"] = TCyBufferedTransportFactory()
+    TRANSPORTS["cyframed"] = TCyFramedTransportFactory()
+
+SERVERS = ["simple", "threaded", "tornado"]
+SOCKETS = ["tcp", "unix"]
+
+
+class Handler(object):
+    def ping(self):
+        pass
+
+    def echo(self, items):
+        return items
+
+
+def supported(protocol, transport, server, sock_type):
+    # the cython protocol only works on top of cython transports
+    if protocol == "cybin" and not transport.startswith("cy"):
+        return False
+
+    # tornado speaks framed transport over tcp only, with a pure python
+    # memory buffer under the protocol
+    if server == "tornado":
+        return transport.endswith("framed") and protocol != "cybin" and \
+            sock_type == "tcp"
+    return True
+
+
+def make_payload(items, string_size, tags):
+    return [bench.Item(id=i, name="x" * string_size, score=i * 0.5,
+                       tags=list(range(tags)))
+            for i in range(items)]
+
+
+def serve(protocol, transport, server, addr):
+    proto_factory = PROTOCOLS[protocol]
+    trans_factory = TRANSPORTS[transport]
+
+    if server == "tornado":
+        from tornado import ioloop
+        from thriftpy.tornado import make_server
+
+        tornado_server = make_server(bench.BenchService, Handler(),
+                                     proto_factory=proto_factory)
+        tornado_server.listen(addr[1], addr[0])
+        ioloop.IOLoop.current().start()
+        return
+
+    if isinstance(addr, str):
+        sock = TServerSocket(unix_socket=addr)
+    else:
+        sock = TServerSocket(host=addr[0], port=addr[1])
+
+    processor = TProcessor(bench.BenchService, Handler())
+    if server == "simple":
+        thrift_server = TSimpleServer(processor, sock, trans_factory,
+                                      proto_factory)
+    else:
+        thrift_server = TThreadedServer(processor, sock,
+                                        itrans_factory=trans_factory,
+                                        iprot_factory=proto_factory,
+                                        daemon=True)
+    thrift_server.serve()
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def connect(protocol, transport, addr, retries=50):
+    kwargs = {"proto_factory": PROTOCOLS[protocol],
+              "trans_factory": TRANSPORTS[transport],
+              "timeout": 10000}
+    if isinstance(addr, str):
+        kwargs["unix_socket"] = addr
+    else:
+        kwargs["host"], kwargs["port"] = addr
+
+    for _ in range(retries):
+        try:
+            return make_client(bench.BenchService, **kwargs)
+        except Exception:
+            time.sleep(0.1)
+    return make_client(bench.BenchService, **kwargs)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * len(sorted_values))))
+    return sorted_values[k]
+
+
+def run_case(protocol, transport, server, sock_type, opts):
+    if sock_type == "unix":
+        addr = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    else:
+        addr = ("127.0.0.1", free_port())
+
+    ps = multiprocessing.Process(target=serve,
+                                 args=(protocol, transport, server, addr))
+    ps.daemon = True
+    ps.start()
+
+    # the simple server handles a single connection at a time, more clients
+    # would just queue up behind the first one
+    concurrency = 1 if server == "simple" else opts.concurrency
+
+    payload = make_payload(opts.items, opts.string_size, opts.tags)
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(idx):
+        client = connect(protocol, transport, addr)
+        call = client.echo if opts.items else client.ping
+        args = (payload,) if opts.items else ()
+        try:
+            try:
+                for _ in range(opts.warmup):
+                    call(*args)
+            except Exception:
+                errors[idx] += 1
+                return
+            finally:
+                barrier.wait()
+
+            for _ in range(opts.requests):
+                start = perf_counter()
+                try:
+                    call(*args)
+                except Exception:
+                    errors[idx] += 1
+                    break
+                latencies[idx].append(perf_counter() - start)
+        finally:
+            client._iprot.trans.close()
+
+    barrier = _Barrier(concurrency + 1)
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(concurrency)]
+    try:
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        barrier.wait()
+        start = perf_counter()
+        for t in threads:
+            t.join()
+        elapsed = perf_counter() - start
+    finally:
+        ps.terminate()
+        ps.join()
+        if sock_type == "unix":
+            try:
+                os.remove(addr)
+            except OSError:
+                pass
+
+    samples = sorted(s for lat in latencies for s in lat)
+    ms = [s * 1000 for s in samples]
+    return {
+        "protocol": protocol,
+        "transport": transport,
+        "server": server,
+        "socket": sock_type,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": sum(errors),
+        "payload": {"items": opts.items, "string_size": opts.string_size,
+                    "tags": opts.tags},
+        "elapsed": elapsed,
+        "throughput": len(samples) / elapsed if elapsed else None,
+        "latency_ms": {
+            "mean": sum(ms) / len(ms) if ms else None,
+            "p50": percentile(ms, 50),
+            "p90": percentile(ms, 90),
+            "p99": percentile(ms, 99),
+            "max": ms[-1] if ms else None,
+        },
+    }
+
+
+class _Barrier(object):
+    """Minimal threading barrier, threading.Barrier is python3 only."""
+
+    def __init__(self, parties):
+        self.parties = parties
+        self.cond = threading.Condition()
+
+    def wait(self):
+        with self.cond:
+            self.parties -= 1
+            if self.parties <= 0:
+                self.cond.notify_all()
+            while self.parties > 0:
+                self.cond.wait()
+
+
+def parse_args(argv):
+    def choices(all_choices):
+        def parse(value):
+            values = value.split(",")
+            for v in values:
+                if v not in all_choices:
+                    raise argparse.ArgumentTypeError(
+                        "%s not in %s" % (v, ", ".join(all_choices)))
+            return values
+        return parse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--protocols", type=choices(sorted(PROTOCOLS)),
+                        default=sorted(PROTOCOLS))
+    parser.add_argument("--transports", type=choices(sorted(TRANSPORTS)),
+                        default=sorted(TRANSPORTS))
+    parser.add_argument("--servers", type=choices(SERVERS), default=SERVERS)
+    parser.add_argument("--sockets", type=choices(SOCKETS), default=SOCKETS)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=1000,
+                        help="timed requests per client")
+    parser.add_argument("--warmup", type=int, default=100,
+                        help="untimed requests per client")
+    parser.add_argument("--items", type=int, default=10,
+                        help="items echoed per call, 0 to call ping")
+    parser.add_argument("--string-size", type=int, default=32)
+    parser.add_argument("--tags", type=int, default=8,
+                        help="size of the list<i64> of every item")
+    parser.add_argument("--output", help="write JSON results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+
+    try:
+        import tornado  # noqa
+    except ImportError:
+        opts.servers = [s for s in opts.servers if s != "tornado"]
+
+    results = []
+    for server in opts.servers:
+        for sock_type in opts.sockets:
+            for protocol in opts.protocols:
+                for transport in opts.transports:
+                    if not supported(protocol, transport, server,
+                                     sock_type):
+                        continue
+                    result = run_case(protocol, transport, server, sock_type,
+                                      opts)
+                    print("{server:>8} {socket:>4} {protocol:>6} "
+                          "{transport:>10} {throughput:>10.1f} req/s "
+                          "p50 {p50:.3f}ms p99 {p99:.3f}ms".format(
+                              p50=result["latency_ms"]["p50"] or 0,
+                              p99=result["latency_ms"]["p99"] or 0,
+                              **result),
+                          file=sys.stderr)
+                    results.append(result)
+
+    output = json.dumps({"python": sys.version, "results": results},
+                        indent=2, sort_keys=True)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+"""Serialization benchmark over realistic schemas.
+
+Every workload defined in workloads.thrift (and the storm topology from the
+tests) is encoded and decoded by every protocol implementation. Each
+measurement is warmed up, then repeated, and reported as the median and
+standard deviation of the time per operation::
+
+    $ python benchmark_serialization.py --workloads wide,numbers \\
+        --protocols cybin --repeat 7 --output serialization.json
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import math
+import os
+import sys
+import timeit
+
+import thriftpy
+from thriftpy._compat import CYTHON
+from thriftpy.protocol import TJSONProtocolFactory
+from thriftpy.protocol.binary import TBinaryProtocolFactory
+from thriftpy.thrift import TType
+from thriftpy.utils import serialize, deserialize
+
+try:
+    from time import perf_counter
+except ImportError:
+    from timeit import default_timer as perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+workloads = thriftpy.load(os.path.join(HERE, "workloads.thrift"),
+                          module_name="workloads_thrift")
+storm = thriftpy.load(os.path.join(HERE, "..", "tests", "storm.thrift"),
+                      module_name="storm_thrift")
+
+PROTOCOLS = {
+    "binary": TBinaryProtocolFactory(),
+    "json": TJSONProtocolFactory(),
+}
+
+if CYTHON:
+    from thriftpy.protocol.cybin import TCyBinaryProtocolFactory
+    PROTOCOLS["cybin"] = TCyBinaryProtocolFactory()
+
+
+_type_names = {
+    TType.I32: "i32",
+    TType.I64: "i64",
+    TType.DOUBLE: "double",
+    TType.STRING: "string",
+    TType.BOOL: "bool",
+}
+
+
+def make_wide():
+    values = {"i32": 123456, "i64": 1 << 40, "double": 3.14159,
+              "string": "a wide struct field", "bool": True}
+    kwargs = {}
+    for spec in workloads.Wide.thrift_spec.values():
+        ttype, name = spec[:2]
+        kwargs[name] = values[_type_names[ttype]]
+    return workloads.Wide(**kwargs)
+
+
+def make_nested(depth=8):
+    node = workloads.Level0(id=0, name="leaf")
+    for level in range(1, depth + 1):
+        cls = getattr(workloads, "Level%d" % level)
+        node = cls(id=level, name="level %d" % level, child=node)
+    return node
+
+
+def make_numbers(size=10000):
+    return workloads.Numbers(longs=list(range(-size // 2, size // 2)),
+                             doubles=[i * 0.25 for i in range(size)])
+
+
+def make_index(size=1000):
+    entries = {}
+    for i in range(size):
+        name = "entry-%05d" % i
+        entries[name] = workloads.Entry(id=i, name=name, score=i / 7.0,
+                                        active=bool(i % 2))
+    return workloads.Index(entries=entries)
+
+
+def make_blob(size=1024 * 1024):
+    return workloads.Blob(name="blob", data=b"\x5a" * size)
+
+
+def make_texts(count=100, size=8192):
+    return workloads.Texts(texts=[("%d" % i) * (size // len(str(i)))
+                                  for i in range(count)])
+
+
+def make_storm(spouts=10, bolts=30):
+    def java_object(i):
+        return storm.ComponentObject(java_object=storm.JavaObject(
+            full_class_name="backtype.storm.testing.Component%d" % i,
+            args_list=[storm.JavaObjectArg(int_arg=i),
+                       storm.JavaObjectArg(string_arg="arg %d" % i),
+                       storm.JavaObjectArg(double_arg=i / 3.0)]))
+
+    def common(i, inputs):
+        return storm.ComponentCommon(
+            inputs=inputs,
+            streams={"default": storm.StreamInfo(
+                output_fields=["word", "count"], direct=False)},
+            parallelism_hint=i % 4 + 1,
+            json_conf='{"topology.debug": false}')
+
+    spout_specs = dict(
+        ("spout-%d" % i, storm.SpoutSpec(spout_object=java_object(i),
+                                         common=common(i, {})))
+        for i in range(spouts))
+
+    bolt_specs = {}
+    for i in range(bolts):
+        source = storm.GlobalStreamId(componentId="spout-%d" % (i % spouts),
+                                      streamId="default")
+        if i % 2:
+            grouping = storm.Grouping(fields=["word"])
+        else:
+            grouping = storm.Grouping(shuffle=storm.NullStruct())
+        bolt_specs["bolt-%d" % i] = storm.Bolt(
+            bolt_object=java_object(i), common=common(i, {source: grouping}))
+
+    return storm.StormTopology(spouts=spout_specs, bolts=bolt_specs,
+                               state_spouts={})
+
+
+WORKLOADS = {
+    "wide": make_wide,
+    "nested": make_nested,
+    "numbers": make_numbers,
+    "index": make_index,
+    "blob": make_blob,
+    "texts": make_texts,
+    "storm": make_storm,
+}
+
+
+def stats(timings, number):
+    per_op = sorted(t / number for t in timings)
+    n = len(per_op)
+    median = per_op[n // 2] if n % 2 else \
+        (per_op[n // 2 - 1] + per_op[n // 2]) / 2
+    mean = sum(per_op) / n
+    stdev = math.sqrt(sum((t - mean) ** 2 for t in per_op) / (n - 1)) \
+        if n > 1 else 0.0
+    return {
+        "median": median,
+        "stdev": stdev,
+        "min": per_op[0],
+        "ops_per_sec": 1 / median if median else None,
+    }
+
+
+def calibrate(fn, min_time):
+    """Find a loop count for which a repetition lasts at least `min_time`."""
+    number = 1
+    while True:
+        start = perf_counter()
+        for _ in range(number):
+            fn()
+        if perf_counter() - start >= min_time:
+            return number
+        number *= 2
+
+
+def measure(fn, opts):
+    for _ in range(opts.warmup):
+        fn()
+
+    number = calibrate(fn, opts.min_time)
+    timer = timeit.Timer(fn, timer=perf_counter)
+    result = stats(timer.repeat(opts.repeat, number), number)
+    result["number"] = number
+    return result
+
+
+def run_case(workload, protocol, opts):
+    obj = WORKLOADS[workload]()
+    cls = type(obj)
+    proto_factory = PROTOCOLS[protocol]
+
+    result = {"workload": workload, "protocol": protocol}
+    try:
+        buf = serialize(obj, proto_factory)
+        deserialize(cls(), buf, proto_factory)
+    except Exception as e:
+        # e.g. binary fields can't be encoded by the json protocol
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+        return result
+
+    result["bytes_per_op"] = len(buf)
+    result["encode"] = measure(lambda: serialize(obj, proto_factory), opts)
+    result["decode"] = measure(
+        lambda: deserialize(cls(), buf, proto_factory), opts)
+    return result
+
+
+def parse_args(argv):
+    def choices(all_choices):
+        def parse(value):
+            values = value.split(",")
+            for v in values:
+                if v not in all_choices:
+                    raise argparse.ArgumentTypeError(
+                        "%s not in %s" % (v, ", ".join(all_choices)))
+            return values
+        return parse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", type=choices(sorted(WORKLOADS)),
+                        default=sorted(WORKLOADS))
+    parser.add_argument("--protocols", type=choices(sorted(PROTOCOLS)),
+                        default=sorted(PROTOCOLS))
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="untimed calls before measuring")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed repetitions of every measurement")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimal duration of a repetition in seconds")
+    parser.add_argument("--output", help="write JSON results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+
+    results = []
+    for workload in opts.workloads:
+        for protocol in opts.protocols:
+            result = run_case(workload, protocol, opts)
+            if "error" in result:
+                print("{workload:>8} {protocol:>6}  {error}".format(**result),
+                      file=sys.stderr)
+            else:
+                print("{:>8} {:>6} {:>10} bytes  encode {:>12.1f} ops/s "
+                      "decode {:>12.1f} ops/s".format(
+                          workload, protocol, result["bytes_per_op"],
+                          result["encode"]["ops_per_sec"],
+                          result["decode"]["ops_per_sec"]),
+                      file=sys.stderr)
+            results.append(result)
+
+    output = json.dumps({"python": sys.version, "results": results},
+                        indent=2, sort_keys=True)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+struct Item {
+    1: i64 id,
+    2: string name,
+    3: double score,
+    4: list<i64> tags,
+}
+
+service BenchService {
+    void ping(),
+    list<Item> echo(1: list<Item> items),
+}
@@ -0,0 +1,205 @@
+/* Workloads for benchmark_serialization.py */
+
+// a wide, flat record
+struct Wide {
+    1: i32 f1,
+    2: i64 f2,
+    3: double f3,
+    4: string f4,
+    5: bool f5,
+    6: i32 f6,
+    7: i64 f7,
+    8: double f8,
+    9: string f9,
+    10: bool f10,
+    11: i32 f11,
+    12: i64 f12,
+    13: double f13,
+    14: string f14,
+    15: bool f15,
+    16: i32 f16,
+    17: i64 f17,
+    18: double f18,
+    19: string f19,
+    20: bool f20,
+    21: i32 f21,
+    22: i64 f22,
+    23: double f23,
+    24: string f24,
+    25: bool f25,
+    26: i32 f26,
+    27: i64 f27,
+    28: double f28,
+    29: string f29,
+    30: bool f30,
+    31: i32 f31,
+    32: i64 f32,
+    33: double f33,
+    34: string f34,
+    35: bool f35,
+    36: i32 f36,
+    37: i64 f37,
+    38: double f38,
+    39: string f39,
+    40: bool f40,
+    41: i32 f41,
+    42: i64 f42,
+    43: double f43,
+    44: string f44,
+    45: bool f45,
+    46: i32 f46,
+    47: i64 f47,
+    48: double f48,
+    49: string f49,
+    50: bool f50,
+    51: i32 f51,
+    52: i64 f52,
+    53: double f53,
+    54: string f54,
+    55: bool f55,
+    56: i32 f56,
+    57: i64 f57,
+    58: double f58,
+    59: string f59,
+    60: bool f60,
+    61: i32 f61,
+    62: i64 f62,
+    63: double f63,
+    64: string f64,
+    65: bool f65,
+    66: i32 f66,
+    67: i64 f67,
+    68: double f68,
+    69: string f69,
+    70: bool f70,
+    71: i32 f71,
+    72: i64 f72,
+    73: double f73,
+    74: string f74,
+    75: bool f75,
+    76: i32 f76,
+    77: i64 f77,
+    78: double f78,
+    79: string f79,
+    80: bool f80,
+    81: i32 f81,
+    82: i64 f82,
+    83: double f83,
+    84: string f84,
+    85: bool f85,
+    86: i32 f86,
+    87: i64 f87,
+    88: double f88,
+    89: string f89,
+    90: bool f90,
+    91: i32 f91,
+    92: i64 f92,
+    93: double f93,
+    94: string f94,
+    95: bool f95,
+    96: i32 f96,
+    97: i64 f97,
+    98: double f98,
+    99: string f99,
+    100: bool f100,
+    101: i32 f101,
+    102: i64 f102,
+    103: double f103,
+    104: string f104,
+    105: bool f105,
+    106: i32 f106,
+    107: i64 f107,
+    108: double f108,
+    109: string f109,
+    110: bool f110,
+    111: i32 f111,
+    112: i64 f112,
+    113: double f113,
+    114: string f114,
+    115: bool f115,
+    116: i32 f116,
+    117: i64 f117,
+    118: double f118,
+    119: string f119,
+    120: bool f120,
+}
+
+// nested records, Level0 is the innermost one
+struct Level0 {
+    1: i64 id,
+    2: string name,
+}
+
+struct Level1 {
+    1: i64 id,
+    2: string name,
+    3: Level0 child,
+}
+
+struct Level2 {
+    1: i64 id,
+    2: string name,
+    3: Level1 child,
+}
+
+struct Level3 {
+    1: i64 id,
+    2: string name,
+    3: Level2 child,
+}
+
+struct Level4 {
+    1: i64 id,
+    2: string name,
+    3: Level3 child,
+}
+
+struct Level5 {
+    1: i64 id,
+    2: string name,
+    3: Level4 child,
+}
+
+struct Level6 {
+    1: i64 id,
+    2: string name,
+    3: Level5 child,
+}
+
+struct Level7 {
+    1: i64 id,
+    2: string name,
+    3: Level6 child,
+}
+
+struct Level8 {
+    1: i64 id,
+    2: string name,
+    3: Level7 child,
+}
+
+struct Numbers {
+    1: list<i64> longs,
+    2: list<double> doubles,
+}
+
+struct Entry {
+    1: i64 id,
+    2: string name,
+    3: double score,
+    4: bool active,
+}
+
+struct Index {
+    1: map<string, Entry> entries,
+}
+
+struct Blob {
+    1: string name,
+    2: binary data,
+}
+
+// strings longer than the stack buffer of the cython transports
+struct Texts {
+    1: list<string> texts,
+}
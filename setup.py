@@ -49,6 +49,7 @@ if not PYPY:
         cythonize("thriftpy/transport/cybase.pyx")
         cythonize("thriftpy/transport/**/*.pyx")
         cythonize("thriftpy/protocol/cybin/cybin.pyx")
+        cythonize("thriftpy/protocol/cyjson/cyjson.pyx")
 
     ext_modules.append(Extension("thriftpy.transport.cybase",
                                  ["thriftpy/transport/cybase.c"]))
@@ -58,8 +59,15 @@ if not PYPY:
                                  ["thriftpy/transport/memory/cymemory.c"]))
     ext_modules.append(Extension("thriftpy.transport.framed.cyframed",
                                  ["thriftpy/transport/framed/cyframed.c"]))
+    ext_modules.append(Extension("thriftpy.transport.header.cyheader",
+                                 ["thriftpy/transport/header/cyheader.c"]))
+    ext_modules.append(Extension(
+        "thriftpy.transport.compressed.cycompressed",
+        ["thriftpy/transport/compressed/cycompressed.c"]))
     ext_modules.append(Extension("thriftpy.protocol.cybin",
                                  ["thriftpy/protocol/cybin/cybin.c"]))
+    ext_modules.append(Extension("thriftpy.protocol.cyjson",
+                                 ["thriftpy/protocol/cyjson/cyjson.c"]))
 
 setup(name="thriftpy",
       version=version,
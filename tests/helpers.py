@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+Transports and messages shared by the call hooks and metrics tests.
+"""
+
+from __future__ import absolute_import
+
+import time
+
+from thriftpy.protocol.binary import TBinaryProtocol
+from thriftpy.thrift import TMessageType
+from thriftpy.transport import TTransportBase
+from thriftpy.transport.memory import TMemoryBuffer
+
+
+class IdleTransport(TTransportBase):
+    """Hold back every message for `idle` seconds, like a client pausing
+    between calls on a kept alive connection.
+    """
+
+    def __init__(self, messages, idle):
+        self.data = b"".join(messages)
+        self.starts = set()
+        pos = 0
+        for message in messages:
+            self.starts.add(pos)
+            pos += len(message)
+        self.pos = 0
+        self.idle = idle
+
+    def _read(self, sz):
+        if self.pos in self.starts:
+            self.starts.discard(self.pos)
+            time.sleep(self.idle)
+        data = self.data[self.pos:self.pos + sz]
+        self.pos += len(data)
+        return data
+
+
+def encode_request(api, args, seqid=7):
+    """Return the binary encoded call of `api` with `args`."""
+    itrans = TMemoryBuffer()
+    iprot = TBinaryProtocol(itrans)
+    iprot.write_message_begin(api, TMessageType.CALL, seqid)
+    args.write(iprot)
+    iprot.write_message_end()
+    return itrans.getvalue()
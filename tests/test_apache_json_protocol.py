@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import thriftpy
+from thriftpy.protocol import TApacheJSONProtocolFactory
+from thriftpy.protocol.exc import TProtocolException
+from thriftpy.rpc import make_server, client_context
+from thriftpy.thrift import TPayload, TType
+from thriftpy.transport import TMemoryBuffer
+from thriftpy._compat import PYPY, u
+
+import thriftpy.protocol.apache_json as proto
+
+PROTOCOLS = [proto.TApacheJSONProtocol]
+SIMPLE_PROTOCOLS = [proto.TSimpleJSONProtocol]
+if not PYPY:
+    from thriftpy.protocol.cyjson import (
+        TCyApacheJSONProtocol, TCySimpleJSONProtocol)
+    PROTOCOLS.append(TCyApacheJSONProtocol)
+    SIMPLE_PROTOCOLS.append(TCySimpleJSONProtocol)
+
+
+class TItem(TPayload):
+    thrift_spec = {
+        1: (TType.I32, "id", False),
+        2: (TType.LIST, "phones", TType.STRING, False),
+    }
+    default_spec = [("id", None), ("phones", None)]
+
+
+class TValues(TPayload):
+    thrift_spec = {
+        1: (TType.BOOL, "flag", False),
+        2: (TType.BYTE, "byte", False),
+        3: (TType.I16, "short", False),
+        4: (TType.I64, "big", False),
+        5: (TType.DOUBLE, "ratio", False),
+        6: (TType.STRING, "name", False),
+        7: (TType.SET, "tags", TType.STRING, False),
+        8: (TType.MAP, "scores", (TType.I32, TType.DOUBLE), False),
+        9: (TType.MAP, "items", (TType.STRING, (TType.STRUCT, TItem)),
+            False),
+        10: (TType.LIST, "matrix", (TType.LIST, TType.I64), False),
+        11: (TType.STRUCT, "item", TItem, False),
+    }
+    default_spec = [("flag", None), ("byte", None), ("short", None),
+                    ("big", None), ("ratio", None), ("name", None),
+                    ("tags", None), ("scores", None), ("items", None),
+                    ("matrix", None), ("item", None)]
+
+
+VALUES = TValues(
+    flag=True, byte=-3, short=300, big=2 ** 62, ratio=-1.5e-10,
+    name=u('"quo\\ted"\n p\xe3o \U0001f600'), tags=[u("a"), u("b")],
+    scores={1: 0.5, -2: float("inf")},
+    items={u("x"): TItem(id=1, phones=[u("555")]), u("y"): TItem()},
+    matrix=[[1, 2], [], [3]], item=TItem(id=2))
+
+
+def write(protocol, obj, message=None):
+    trans = TMemoryBuffer()
+    p = protocol(trans)
+    if message:
+        p.write_message_begin(*message)
+    p.write_struct(obj)
+    p.write_message_end()
+    return trans.getvalue()
+
+
+@pytest.mark.parametrize("protocol", PROTOCOLS)
+def test_apache_json_write(protocol):
+    obj = TItem(id=13, phones=[u("5234"), u("12346456")])
+
+    assert write(protocol, obj, ("api", 1, 7)) == (
+        b'[1,"api",1,7,{"1":{"i32":13},'
+        b'"2":{"lst":["str",2,"5234","12346456"]}}]')
+    assert write(protocol, TValues(scores={3: float("nan")}, flag=False)) \
+        == b'{"1":{"tf":0},"8":{"map":["i32","dbl",1,{"3":"NaN"}]}}'
+
+
+@pytest.mark.parametrize("protocol", PROTOCOLS)
+def test_apache_json_wire_compatible(protocol):
+    data = write(protocol, VALUES, ("api", 2, 1))
+    assert data == write(proto.TApacheJSONProtocol, VALUES, ("api", 2, 1))
+
+    # messages aren't length prefixed, a reader stops at the end of one
+    trans = TMemoryBuffer(data + b"\n" + data)
+    for reader in PROTOCOLS:
+        p = reader(trans)
+        assert p.read_message_begin() == ("api", 2, 1)
+        assert p.read_struct(TValues()) == VALUES
+        p.read_message_end()
+    assert trans.read(1) == b""
+
+
+@pytest.mark.parametrize("protocol", PROTOCOLS)
+def test_apache_json_read(protocol):
+    data = json.dumps([1, "api", 1, 3, {
+        "6": {"str": u("a\xe3\U0001f600")},
+        "5": {"dbl": "-Infinity"},
+        "12": {"rec": {"1": {"lst": ["i32", 1, 5]}}},
+        "3": {"i32": 5},
+        "7": {"set": ["i32", 1, 5]},
+        "10": {"lst": ["lst", 1, ["i64", 2, 4, "8"]]},
+        "1": {"tf": True},
+    }], indent=2).encode("ascii")
+
+    p = protocol(TMemoryBuffer(data))
+    assert p.read_message_begin() == ("api", 1, 3)
+    # unknown fields and fields of another type are skipped
+    assert p.read_struct(TValues()) == TValues(
+        name=u("a\xe3\U0001f600"), ratio=float("-inf"), flag=True,
+        tags=[], matrix=[[4, 8]])
+
+    p = protocol(TMemoryBuffer(b'[2,"api",1,3,{}]'))
+    with pytest.raises(TProtocolException) as e:
+        p.read_message_begin()
+    assert e.value.type == TProtocolException.BAD_VERSION
+
+    for data in (b'{"1":{"i32":1}', b'{"1":{"xyz":1}}', b'"x"'):
+        p = protocol(TMemoryBuffer(data))
+        with pytest.raises(TProtocolException):
+            p.read_struct(TItem())
+
+
+@pytest.mark.parametrize("protocol", PROTOCOLS + SIMPLE_PROTOCOLS)
+def test_json_write_binary(protocol):
+    # binary fields are written as strings, which are UTF-8
+    with pytest.raises(TProtocolException) as e:
+        write(protocol, TValues(name=b"\xff\xfe"))
+    assert e.value.type == TProtocolException.INVALID_DATA
+
+
+class StrictBuffer(object):
+    """Refuse reads past the end of the data, where a socket would wait."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def read(self, sz):
+        assert sz <= len(self.data) - self.pos
+        self.pos += sz
+        return self.data[self.pos - sz:self.pos]
+
+
+@pytest.mark.parametrize("protocol", PROTOCOLS)
+def test_apache_json_read_to_end(protocol):
+    data = write(protocol, VALUES, ("api", 2, 1))
+    p = protocol(StrictBuffer(data))
+    assert p.read_message_begin() == ("api", 2, 1)
+    assert p.read_struct(TValues()) == VALUES
+
+
+@pytest.mark.parametrize("protocol", SIMPLE_PROTOCOLS)
+def test_simple_json(protocol):
+    data = write(protocol, VALUES, ("api", 1, 7))
+    assert data == write(proto.TSimpleJSONProtocol, VALUES, ("api", 1, 7))
+    assert json.loads(data.decode("utf-8")) == [
+        "api", 1, 7, {
+            "flag": 1, "byte": -3, "short": 300, "big": 2 ** 62,
+            "ratio": -1.5e-10, "name": VALUES.name, "tags": ["a", "b"],
+            "scores": {"1": 0.5, "-2": "Infinity"},
+            "items": {"x": {"id": 1, "phones": ["555"]}, "y": {}},
+            "matrix": [[1, 2], [], [3]], "item": {"id": 2}}]
+
+    p = protocol(TMemoryBuffer(data))
+    for read in (p.read_message_begin, p.read_message_end,
+                 lambda: p.read_struct(TValues())):
+        with pytest.raises(TProtocolException) as e:
+            read()
+        assert e.value.type == TProtocolException.NOT_IMPLEMENTED
+
+
+def test_apache_json_rpc():
+    addressbook = thriftpy.load(
+        os.path.join(os.path.dirname(__file__), "addressbook.thrift"))
+    sock = "./thriftpy_json_test.sock"
+
+    class Dispatcher(object):
+        def hello(self, name):
+            return "hello " + name
+
+        def get(self, name):
+            raise addressbook.PersonNotExistsError(name)
+
+        def get_phones(self, name):
+            return {addressbook.PhoneType.HOME: name}
+
+    server = make_server(addressbook.AddressBookService, Dispatcher(),
+                         unix_socket=sock,
+                         proto_factory=TApacheJSONProtocolFactory())
+    ps = multiprocessing.Process(target=server.serve)
+    ps.start()
+    time.sleep(0.1)
+
+    try:
+        for factory in (proto.TApacheJSONProtocolFactory(),
+                        TApacheJSONProtocolFactory()):
+            with client_context(addressbook.AddressBookService,
+                                unix_socket=sock,
+                                proto_factory=factory) as c:
+                assert c.hello(u("w\xf6rld")) == u("hello w\xf6rld")
+                assert c.get_phones("555") == {
+                    addressbook.PhoneType.HOME: "555"}
+                with pytest.raises(addressbook.PersonNotExistsError):
+                    c.get("Bob")
+                assert c.hello("again") == "hello again"
+    finally:
+        ps.terminate()
+        os.remove(sock)
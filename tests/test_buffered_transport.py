@@ -91,9 +91,57 @@ class BufferedTransportTestCase(TestCase):
 
 
 if CYTHON:
-    from thriftpy.transport.buffered import TCyBufferedTransportFactory
+    from thriftpy.transport.buffered import (
+        TCyBufferedTransport,
+        TCyBufferedTransportFactory,
+    )
+    from thriftpy.transport.memory import TMemoryBuffer
     from thriftpy.protocol.cybin import TCyBinaryProtocolFactory
 
     class TCyBufferedTransportTestCase(BufferedTransportTestCase):
         TRANSPORT_FACTORY = TCyBufferedTransportFactory()
         PROTOCOL_FACTORY = TCyBinaryProtocolFactory()
+
+    class TCyBufferedTransportBinaryTestCase(BufferedTransportTestCase):
+        """Pure python protocol reading through the cython transport."""
+        TRANSPORT_FACTORY = TCyBufferedTransportFactory()
+        PROTOCOL_FACTORY = TBinaryProtocolFactory()
+
+    def test_stats():
+        trans = TCyBufferedTransport(TMemoryBuffer(), buf_size=1024)
+        trans.write(b"x" * 3000)
+        trans.flush()
+        assert trans.stats()["write_calls"] == 1
+        assert trans.stats()["buffer_grows"] == 1
+        assert trans.stats()["peak_buffer_size"] == 4096
+
+        trans = TCyBufferedTransport(TMemoryBuffer(b"hello world"))
+        trans.read(5)
+        trans.read(6)
+        stats = trans.stats()
+        assert stats["bytes_read"] == 11 and stats["read_calls"] == 1
+        assert stats["buffer_grows"] == 0
+
+    def test_adaptive_buffer():
+        for adaptive, shrinks in ((False, 0), (True, 1)):
+            trans = TCyBufferedTransport(TMemoryBuffer(), adaptive=adaptive)
+            trans.write(b"x" * 100000)
+            trans.flush()
+            for _ in range(16):
+                trans.write(b"hello")
+                trans.flush()
+
+            stats = trans.stats()
+            assert stats["buffer_grows"] == 1
+            assert stats["buffer_shrinks"] == shrinks
+
+    def test_factory_buf_size():
+        trans = TCyBufferedTransportFactory(buf_size=65536).get_transport(
+            TMemoryBuffer())
+        assert trans.stats()["peak_buffer_size"] == 65536
+
+    def test_large_read_streamed():
+        trans = TCyBufferedTransport(TMemoryBuffer(b"x" * 100000))
+        assert trans.read(10) == b"x" * 10
+        assert trans.read(99990) == b"x" * 99990
+        assert trans.stats()["buffer_grows"] == 0
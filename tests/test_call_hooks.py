@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+
+import pytest
+
+import thriftpy
+from thriftpy.protocol.binary import TBinaryProtocol
+from thriftpy.thrift import (
+    TApplicationException,
+    TCallInfo,
+    TClient,
+    THook,
+    TMessageType,
+    TProcessor,
+)
+from thriftpy.transport import TTransportBase
+from thriftpy.transport.memory import TMemoryBuffer
+
+from helpers import IdleTransport, encode_request
+
+addressbook = thriftpy.load(os.path.join(os.path.dirname(__file__),
+                                         "addressbook.thrift"))
+
+
+class Dispatcher(object):
+    def hello(self, name):
+        return "hello " + name
+
+    def remove(self, name):
+        raise addressbook.PersonNotExistsError("{0} not exists".format(name))
+
+    def book(self):
+        raise ValueError("boom")
+
+
+class RecordingHook(THook):
+    def __init__(self):
+        self.begun = []
+        self.ended = []
+
+    def begin(self, info):
+        self.begun.append(info.api)
+
+    def end(self, info):
+        self.ended.append(info)
+
+
+class LoopbackTransport(TTransportBase):
+    """Process every flushed request in place and buffer the reply."""
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.wbuf = TMemoryBuffer()
+        self.rbuf = TMemoryBuffer()
+
+    def _read(self, sz):
+        return self.rbuf.read(sz)
+
+    def write(self, buf):
+        self.wbuf.write(buf)
+        self.bytes_written += len(buf)
+
+    def flush(self):
+        request, self.wbuf = self.wbuf.getvalue(), TMemoryBuffer()
+        self.rbuf = TMemoryBuffer()
+        self.processor.process(TBinaryProtocol(TMemoryBuffer(request)),
+                               TBinaryProtocol(self.rbuf))
+
+
+def _process(processor, api, args):
+    itrans = TMemoryBuffer()
+    iprot = TBinaryProtocol(itrans)
+    iprot.write_message_begin(api, TMessageType.CALL, 7)
+    args.write(iprot)
+    iprot.write_message_end()
+
+    iprot = TBinaryProtocol(TMemoryBuffer(itrans.getvalue()))
+    otrans = TMemoryBuffer()
+    processor.process(iprot, TBinaryProtocol(otrans))
+    return len(itrans.getvalue()), len(otrans.getvalue())
+
+
+def test_processor_hook_ok():
+    hook = RecordingHook()
+    processor = TProcessor(addressbook.AddressBookService, Dispatcher(),
+                           hooks=[hook])
+
+    args = addressbook.AddressBookService.hello_args(name="world")
+    request_bytes, response_bytes = _process(processor, "hello", args)
+
+    assert hook.begun == ["hello"]
+    info, = hook.ended
+    assert info.api == "hello" and info.seqid == 7
+    assert info.outcome == TCallInfo.OK and info.exception is None
+    assert info.decode_time >= 0 and info.handler_time >= 0 and \
+        info.encode_time >= 0
+    assert info.request_bytes == request_bytes
+    assert info.response_bytes == response_bytes
+
+
+def test_processor_hook_exceptions():
+    hook = RecordingHook()
+    processor = TProcessor(addressbook.AddressBookService, Dispatcher())
+    processor.add_hook(hook)
+
+    _process(processor, "remove",
+             addressbook.AddressBookService.remove_args(name="alice"))
+    assert hook.ended[-1].outcome == TCallInfo.EXCEPTION
+    assert isinstance(hook.ended[-1].exception,
+                      addressbook.PersonNotExistsError)
+
+    with pytest.raises(ValueError):
+        _process(processor, "book", addressbook.AddressBookService.book_args())
+    assert hook.ended[-1].outcome == TCallInfo.ERROR
+    assert isinstance(hook.ended[-1].exception, ValueError)
+
+    _process(processor, "nope", addressbook.AddressBookService.book_args())
+    assert hook.ended[-1].outcome == TCallInfo.ERROR
+    assert hook.ended[-1].exception.type == \
+        TApplicationException.UNKNOWN_METHOD
+    assert hook.ended[-1].handler_time is None
+
+    assert hook.begun == ["remove", "book", "nope"]
+
+
+def test_client_hook():
+    hook = RecordingHook()
+    processor = TProcessor(addressbook.AddressBookService, Dispatcher())
+    proto = TBinaryProtocol(LoopbackTransport(processor))
+    client = TClient(addressbook.AddressBookService, proto, hooks=[hook])
+
+    assert client.hello("world") == "hello world"
+    info = hook.ended[-1]
+    assert info.api == "hello" and info.outcome == TCallInfo.OK
+    assert info.encode_time >= 0 and info.decode_time >= 0
+    assert info.handler_time is None
+    assert info.request_bytes > 0 and info.response_bytes > 0
+
+    with pytest.raises(addressbook.PersonNotExistsError):
+        client.remove("alice")
+    assert hook.ended[-1].outcome == TCallInfo.EXCEPTION
+
+    assert hook.begun == ["hello", "remove"]
+
+
+def test_no_hooks():
+    processor = TProcessor(addressbook.AddressBookService, Dispatcher())
+    assert not processor._hooks
+
+    _process(processor, "hello",
+             addressbook.AddressBookService.hello_args(name="world"))
+
+
+def test_processor_hook_idle_connection():
+    hook = RecordingHook()
+    processor = TProcessor(addressbook.AddressBookService, Dispatcher(),
+                           hooks=[hook])
+
+    args = addressbook.AddressBookService.hello_args(name="world")
+    iprot = TBinaryProtocol(IdleTransport(
+        [encode_request("hello", args, i) for i in range(2)], 0.2))
+    for _ in range(2):
+        processor.process(iprot, TBinaryProtocol(TMemoryBuffer()))
+
+    # the wait for the next request isn't counted as decoding
+    assert [info.seqid for info in hook.ended] == [0, 1]
+    assert all(info.decode_time < 0.1 for info in hook.ended)
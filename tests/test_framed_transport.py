@@ -105,3 +105,75 @@ if CYTHON:
     class CyFramedTransportTestCase(FramedTransportTestCase):
         PROTOCOL_FACTORY = TCyBinaryProtocolFactory()
         TRANSPORT_FACTORY = TCyFramedTransportFactory()
+
+    def test_stats():
+        from thriftpy.transport.framed import TCyFramedTransport
+        from thriftpy.transport.memory import TMemoryBuffer
+
+        sock = TMemoryBuffer()
+        trans = TCyFramedTransport(sock)
+        for _ in range(3):
+            trans.write(b"hello")
+            trans.flush()
+        stats = trans.stats()
+        assert stats["frames_written"] == 3 and stats["write_calls"] == 3
+        assert stats["bytes_written"] == 15
+
+        trans = TCyFramedTransport(TMemoryBuffer(sock.getvalue()))
+        assert trans.read(15) == b"hello" * 3
+        assert trans.stats()["frames_read"] == 3
+
+    def test_large_frame_streamed():
+        from thriftpy.transport.framed import TCyFramedTransport
+        from thriftpy.transport.memory import TMemoryBuffer
+
+        payload = b"x" * 100000 + b"y" * 10
+        sock = TMemoryBuffer()
+        writer = TCyFramedTransport(sock)
+        writer.write(payload)
+        writer.flush()
+
+        reader = TCyFramedTransport(TMemoryBuffer(sock.getvalue()))
+        assert reader.read(3) == b"xxx"
+        assert reader.read(len(payload) - 3) == payload[3:]
+
+        # the frame went through without growing the read buffers
+        stats = reader.stats()
+        assert stats["buffer_grows"] == 0
+        assert stats["frames_read"] == 1
+
+    def test_raw_socket():
+        from thriftpy.transport import TSocket
+        from thriftpy.transport.framed import TCyFramedTransport
+
+        for timeout in (None, 1000):
+            left, right = socket.socketpair()
+            a, b = TSocket(), TSocket()
+            a.set_handle(left)
+            b.set_handle(right)
+            a.set_timeout(timeout)
+            b.set_timeout(timeout)
+            assert (a._blocking_fd() == -1) == bool(timeout)
+
+            payload = b"x" * 300000 + b"y" * 10
+
+            def write():
+                writer = TCyFramedTransport(a)
+                writer.write(payload)
+                writer.flush()
+                writer.write(b"hello")
+                writer.flush()
+
+            t = threading.Thread(target=write)
+            t.start()
+            reader = TCyFramedTransport(b)
+            assert reader.read(len(payload)) == payload
+            assert reader.read(5) == b"hello"
+            t.join()
+
+            assert a.stats()["bytes_written"] == len(payload) + 13
+            assert b.stats()["bytes_read"] == len(payload) + 13
+            assert b.stats()["read_calls"] >= 2
+
+            a.close()
+            b.close()
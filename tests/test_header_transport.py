@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import multiprocessing
+import time
+
+from os import path
+from unittest import TestCase
+
+import pytest
+
+import thriftpy
+from thriftpy.rpc import client_context, make_server
+from thriftpy.protocol.binary import TBinaryProtocolFactory
+from thriftpy.transport.framed import TFramedTransport
+from thriftpy.transport.header import (
+    THeaderTransport,
+    THeaderTransportFactory,
+    ZLIB_TRANSFORM,
+    decode_frame,
+    encode_frame,
+)
+from thriftpy.transport import TTransportException
+from thriftpy.transport.memory import TMemoryBuffer
+
+from thriftpy._compat import CYTHON
+
+addressbook = thriftpy.load(path.join(path.dirname(__file__),
+                                      "addressbook.thrift"))
+
+
+class Dispatcher(object):
+    def hello(self, name):
+        return "hello " + name
+
+
+def test_encode_decode_frame():
+    payload = b"hello world" * 10
+    frame = encode_frame(payload, seqid=7, transforms=[ZLIB_TRANSFORM],
+                         headers={"request_id": "abc"},
+                         persistent_headers={"client": u"tést"})
+
+    assert len(frame) - 4 < len(payload)
+
+    payload_, seqid, flags, transforms, headers = decode_frame(frame[4:])
+    assert payload_ == payload
+    assert seqid == 7 and flags == 0
+    assert transforms == [ZLIB_TRANSFORM]
+    assert headers == {"request_id": "abc", "client": u"tést"}
+
+
+def test_decode_plain_frame():
+    assert decode_frame(b"\x80\x01\x00\x01")[0] == b"\x80\x01\x00\x01"
+
+
+def test_decode_truncated_frame():
+    magic = b"\x0f\xff\x00\x00\x00\x00\x00\x00"
+    frames = [
+        # varint running past the header section
+        magic + b"\x00\x01\x80\x80\x80\x80payload",
+        # key longer than the header section
+        magic + b"\x00\x02\x00\x00\x01\x01\x0a\x00\x00\x00payload",
+        # header section longer than the frame
+        magic + b"\x00\x08\x00\x00",
+    ]
+    for frame in frames:
+        with pytest.raises(TTransportException):
+            decode_frame(frame)
+
+
+def test_framed_reads_header_frame():
+    m = TMemoryBuffer(encode_frame(b"hello world", headers={"a": "b"}))
+    assert TFramedTransport(m).read(11) == b"hello world"
+
+
+class HeaderTransport(TestCase):
+    @staticmethod
+    def trans(sock):
+        return THeaderTransport(sock)
+
+    def test_read_write_headers(self):
+        sock = TMemoryBuffer()
+        writer = self.trans(sock)
+        writer.set_persistent_header("client", "test")
+        writer.set_header("request_id", "1")
+        writer.write(b"hello")
+        writer.flush()
+
+        # one shot headers are only sent with the next message
+        writer.add_transform(ZLIB_TRANSFORM)
+        writer.write(b"world")
+        writer.flush()
+
+        reader = self.trans(TMemoryBuffer(sock.getvalue()))
+        assert reader.read(5) == b"hello"
+        assert reader.get_headers() == {"client": "test", "request_id": "1"}
+        assert reader.read(5) == b"world"
+        assert reader.get_headers() == {"client": "test"}
+
+    def test_read_plain_frame(self):
+        sock = TMemoryBuffer()
+        framed = TFramedTransport(sock)
+        framed.write(b"hello")
+
+        reader = self.trans(TMemoryBuffer(sock.getvalue()))
+        assert reader.read(5) == b"hello"
+        assert reader.get_headers() == {}
+
+    def test_read_negative_frame_size(self):
+        reader = self.trans(TMemoryBuffer(b"\xff\xff\xff\xf0hello"))
+        with pytest.raises(TTransportException):
+            reader.read(5)
+
+
+if CYTHON:
+    from thriftpy.transport.header import TCyHeaderTransport
+
+    class CyHeaderTransport(HeaderTransport):
+        @staticmethod
+        def trans(sock):
+            return TCyHeaderTransport(sock)
+
+
+class HeaderTransportTestCase(TestCase):
+    TRANSPORT_FACTORY = THeaderTransportFactory(transforms=[ZLIB_TRANSFORM])
+    PROTOCOL_FACTORY = TBinaryProtocolFactory()
+
+    PORT = 50002
+
+    def mk_server(self):
+        server = make_server(addressbook.AddressBookService, Dispatcher(),
+                             host="localhost", port=self.PORT,
+                             proto_factory=self.PROTOCOL_FACTORY,
+                             trans_factory=self.TRANSPORT_FACTORY)
+        p = multiprocessing.Process(target=server.serve)
+        return p
+
+    def client(self):
+        return client_context(addressbook.AddressBookService,
+                              host="localhost", port=self.PORT,
+                              proto_factory=self.PROTOCOL_FACTORY,
+                              trans_factory=self.TRANSPORT_FACTORY)
+
+    def setUp(self):
+        self.server = self.mk_server()
+        self.server.start()
+        time.sleep(0.3)
+
+    def tearDown(self):
+        if self.server.is_alive():
+            self.server.terminate()
+
+    def test_able_to_communicate(self):
+        with self.client() as c:
+            c._oprot.trans.set_header("request_id", "1")
+            assert c.hello("world") == "hello world"
+            assert c.hello("header") == "hello header"
+
+
+if CYTHON:
+    from thriftpy.transport.header import TCyHeaderTransportFactory
+    from thriftpy.transport.framed import TCyFramedTransportFactory
+    from thriftpy.protocol.cybin import TCyBinaryProtocolFactory
+
+    def test_cy_factory_buf_size():
+        trans = TCyHeaderTransportFactory(buf_size=65536).get_transport(
+            TMemoryBuffer())
+        assert trans.stats()["peak_buffer_size"] == 65536
+
+    class CyHeaderTransportTestCase(HeaderTransportTestCase):
+        TRANSPORT_FACTORY = TCyHeaderTransportFactory(
+            transforms=[ZLIB_TRANSFORM])
+        PROTOCOL_FACTORY = TCyBinaryProtocolFactory()
+
+    class CyHeaderClientFramedServerTestCase(CyHeaderTransportTestCase):
+        def mk_server(self):
+            server = make_server(addressbook.AddressBookService,
+                                 Dispatcher(),
+                                 host="localhost", port=self.PORT,
+                                 proto_factory=self.PROTOCOL_FACTORY,
+                                 trans_factory=TCyFramedTransportFactory())
+            return multiprocessing.Process(target=server.serve)
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import pytest
+
 from thriftpy.protocol import TJSONProtocol
+from thriftpy.protocol.exc import TProtocolException
 from thriftpy.thrift import TPayload, TType
 from thriftpy.transport import TMemoryBuffer
-from thriftpy._compat import u
+from thriftpy._compat import PYPY, u
 
 import thriftpy.protocol.json as proto
 
@@ -112,3 +115,121 @@ def test_unicode_string():
     foo2.read(p)
 
     assert foo == foo2
+
+
+def test_parsed_spec():
+    import os
+    import thriftpy
+
+    addressbook = thriftpy.load(
+        os.path.join(os.path.dirname(__file__), "addressbook.thrift"))
+
+    phones = [addressbook.PhoneNumber(number="555"),
+              addressbook.PhoneNumber(type=addressbook.PhoneType.HOME,
+                                      number="556")]
+    book = addressbook.AddressBook(people={
+        "alice": addressbook.Person(name="alice", phones=phones,
+                                    created_at=1)})
+
+    trans = TMemoryBuffer()
+    p = TJSONProtocol(trans)
+    book.write(p)
+
+    book2 = addressbook.AddressBook()
+    book2.read(p)
+
+    assert book == book2
+
+
+def test_read_columns():
+    import os
+    import thriftpy
+    from thriftpy.thrift import read_columns
+
+    addressbook = thriftpy.load(
+        os.path.join(os.path.dirname(__file__), "addressbook.thrift"))
+
+    phones = [addressbook.PhoneNumber(number="555"),
+              addressbook.PhoneNumber(type=addressbook.PhoneType.HOME,
+                                      number="556")]
+    trans = TMemoryBuffer()
+    p = TJSONProtocol(trans)
+    addressbook.Person(name="alice", phones=phones).write(p)
+
+    person = addressbook.Person()
+    columns = read_columns(p, person, "phones")
+    assert person.name == "alice" and person.phones is None
+    assert columns == {"type": [addressbook.PhoneType.MOBILE,
+                                addressbook.PhoneType.HOME],
+                       "number": ["555", "556"],
+                       "mix_item": [None, None]}
+
+
+if not PYPY:
+    from thriftpy.protocol.cyjson import TCyJSONProtocol
+
+    class TValues(TPayload):
+        thrift_spec = {
+            1: (TType.STRING, "name", False),
+            2: (TType.DOUBLE, "ratio", False),
+            3: (TType.I64, "big", False),
+            4: (TType.BOOL, "flag", False),
+            5: (TType.MAP, "tags", (TType.STRING, TType.I32), False),
+            6: (TType.LIST, "items", (TType.STRUCT, TItem), False),
+        }
+        default_spec = [("name", None), ("ratio", None), ("big", None),
+                        ("flag", None), ("tags", None), ("items", None)]
+
+    VALUES = TValues(
+        name=u('"quo\\ted"\n\t\x01 p\xe3o \U0001f600 \x7f'),
+        ratio=-1.5e-10, big=2 ** 62, flag=True, tags={u("a"): 1},
+        items=[TItem(id=1, phones=[u("x")]), TItem()])
+
+    def test_cy_json_wire_compatible():
+        for protocol in (proto.TJSONProtocol, TCyJSONProtocol):
+            trans = TMemoryBuffer()
+            p = protocol(trans)
+            p.write_message_begin("api", 1, 7)
+            p.write_struct(VALUES)
+            p.write_message_end()
+            data = trans.getvalue()
+
+            if protocol is proto.TJSONProtocol:
+                expected = data
+            assert data == expected
+
+            for reader in (proto.TJSONProtocol, TCyJSONProtocol):
+                p = reader(TMemoryBuffer(data))
+                assert p.read_message_begin() == ("api", 1, 7)
+                assert p.read_struct(TValues()) == VALUES
+
+    def test_cy_json_read():
+        import json
+        import struct
+
+        text = json.dumps({
+            "payload": {"name": u("a\xe3\U0001f600"), "ratio": "2.5",
+                        "unknown": [{"x": "]}"}, None],
+                        "tags": [{"value": 2, "key": "b"}],
+                        "items": [], "big": 12345678901234567890123},
+            "metadata": {"name": "api", "seqid": 1, "ttype": 2,
+                         "version": 1}}, indent=2).encode("ascii")
+        p = TCyJSONProtocol(TMemoryBuffer(struct.pack("!I", len(text)) +
+                                          text))
+        assert p.read_message_begin() == ("api", 2, 1)
+        obj = p.read_struct(TValues())
+        assert obj == TValues(name=u("a\xe3\U0001f600"), ratio=2.5,
+                              tags={u("b"): 2}, items=[],
+                              big=12345678901234567890123)
+
+        text = b'{"payload": {"name": "\\u00e3\\ud83d\\ude00"'
+        p = TCyJSONProtocol(TMemoryBuffer(struct.pack("!I", len(text)) +
+                                          text))
+        with pytest.raises(TProtocolException):
+            p.read_struct(TValues())
+
+    def test_cy_json_write_binary():
+        p = TCyJSONProtocol(TMemoryBuffer())
+        with pytest.raises(TProtocolException) as e:
+            p.write_struct(TValues(name=b"\xff\xfe"))
+        assert e.value.type == TProtocolException.INVALID_DATA
@@ -21,9 +21,28 @@ class MemoryTransport(TestCase):
 
         assert b"hello" == b
 
+    def test_byte_counters(self):
+        m = self.trans(b"hello world")
+        m.read(5)
+        m.write(b"hello")
+
+        assert m.bytes_read == 5
+        assert m.bytes_written == 5
+
+    def test_setvalue_buffer(self):
+        m = self.trans()
+        m.setvalue(memoryview(b"hello world")[6:])
+
+        assert b"world" == m.read(5)
+
 
 if CYTHON:
     from thriftpy.transport.memory import TCyMemoryBuffer
+    from thriftpy.transport.cybase import (
+        buffer_pool_stats,
+        clear_buffer_pool,
+        set_buffer_pool_limit,
+    )
 
     class CyMemoryTransport(MemoryTransport):
         @staticmethod
@@ -57,9 +76,52 @@ if CYTHON:
             m.write(b"hellowaaa")
             assert b"orldhellowaaa" == m.getvalue()
 
+        def test_stats(self):
+            m = self.trans(buf_size=1024)
+            m.write(b"x" * 1000)
+            assert m.stats()["buffer_grows"] == 0
+
+            m.write(b"x" * 1000)
+            m.read(10)
+            stats = m.stats()
+            assert stats["buffer_grows"] == 1
+            assert stats["peak_buffer_size"] == 2048
+            assert stats["bytes_read"] == 10
+            assert stats["bytes_written"] == 2000
+
         def test_read(self):
             m = self.trans(b"hello world")
             b = m.read(5)
 
             assert b"hello" == b
             assert b" world" == m.getvalue()
+
+        def test_buffer_pool_reuse(self):
+            clear_buffer_pool()
+
+            m = self.trans(b"hello world")
+            del m
+            assert buffer_pool_stats()["buffers"] == {4096: 1}
+
+            hits = buffer_pool_stats()["hits"]
+            m = self.trans(b"hello world")
+            assert buffer_pool_stats()["hits"] == hits + 1
+            assert buffer_pool_stats()["retained"] == 0
+
+            # the grown buffer goes back to a larger size class
+            m.write(b"x" * 5000)
+            del m
+            assert buffer_pool_stats()["buffers"] == {4096: 1, 8192: 1}
+
+        def test_buffer_pool_limit(self):
+            clear_buffer_pool()
+            set_buffer_pool_limit(4096)
+            try:
+                buffers = [self.trans() for _ in range(3)]
+                del buffers[:]
+                assert buffer_pool_stats()["retained"] == 4096
+
+                set_buffer_pool_limit(0)
+                assert buffer_pool_stats()["retained"] == 0
+            finally:
+                set_buffer_pool_limit(16 * 1024 * 1024)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+import threading
+
+import pytest
+
+import thriftpy
+from thriftpy.contrib.metrics import Histogram, MetricsCollector
+from thriftpy.protocol.binary import TBinaryProtocol
+from thriftpy.thrift import TApplicationException, TCallInfo, TProcessor
+from thriftpy.transport.memory import TMemoryBuffer
+
+from helpers import IdleTransport, encode_request
+
+addressbook = thriftpy.load(os.path.join(os.path.dirname(__file__),
+                                         "addressbook.thrift"))
+
+
+def _info(api, outcome=TCallInfo.OK, exception=None, handler_time=0.001):
+    info = TCallInfo(api, 0)
+    info.decode_time = info.encode_time = 0.0
+    info.handler_time = handler_time
+    info.request_bytes, info.response_bytes = 10, 20
+    info.outcome, info.exception = outcome, exception
+    return info
+
+
+def _call(collector, info):
+    collector.begin(info)
+    collector.end(info)
+
+
+def test_histogram_precision():
+    h = Histogram(precision=5)
+    for v in range(100000):
+        h.record(v)
+
+    assert h.count == 100000
+    assert h.min == 0 and h.max == 99999
+    for p in (1, 50, 90, 99, 99.9):
+        expected = p / 100.0 * 100000
+        assert abs(h.percentile(p) - expected) <= expected / 16 + 1
+
+
+def test_histogram_merge():
+    a, b = Histogram(), Histogram()
+    for v in range(10):
+        a.record(v)
+        b.record(v + 1000)
+
+    a.merge(b)
+    assert a.count == 20
+    assert a.min == 0 and a.max == 1009
+    assert a.percentile(50) == 9
+
+    with pytest.raises(ValueError):
+        a.merge(Histogram(precision=3))
+
+    with pytest.raises(ValueError):
+        a.record(-1)
+
+
+def test_collector_snapshot():
+    collector = MetricsCollector()
+
+    _call(collector, _info("ping"))
+    _call(collector, _info("ping", TCallInfo.ERROR, ValueError()))
+    _call(collector, _info("ping", TCallInfo.ERROR, TApplicationException()))
+    collector.begin(_info("sleep"))
+
+    snapshot = collector.snapshot()
+    ping = snapshot["ping"]
+    assert ping["calls"] == 3
+    assert ping["errors"] == {"ValueError": 1, "TApplicationException": 1}
+    assert ping["in_flight"] == 0
+    assert ping["request_bytes"] == 30 and ping["response_bytes"] == 60
+    assert ping["latency"]["count"] == 3
+    assert 0.0009 < ping["latency"]["p50"] < 0.0011
+
+    assert snapshot["sleep"]["in_flight"] == 1
+    assert snapshot["sleep"]["calls"] == 0
+
+    collector.reset()
+    snapshot = collector.snapshot()
+    assert "ping" not in snapshot
+    assert snapshot["sleep"]["in_flight"] == 1
+
+
+def test_collector_threads():
+    collector = MetricsCollector()
+
+    def work():
+        for _ in range(1000):
+            _call(collector, _info("ping"))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert collector.snapshot()["ping"]["calls"] == 4000
+
+
+def test_collector_dead_threads():
+    collector = MetricsCollector()
+
+    def work():
+        _call(collector, _info("ping"))
+
+    for _ in range(50):
+        threads = [threading.Thread(target=work) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    # the shards of the threads gone are folded into one
+    assert collector.snapshot()["ping"]["calls"] == 1000
+    assert len(collector._shards) <= 20
+
+    collector.reset()
+    assert "ping" not in collector.snapshot()
+
+
+def test_collector_latency_spaced_calls():
+    class Dispatcher(object):
+        def hello(self, name):
+            return "hello " + name
+
+    collector = MetricsCollector()
+    service = addressbook.AddressBookService
+    processor = TProcessor(service, Dispatcher(), hooks=[collector])
+
+    messages = [encode_request("hello", service.hello_args(name="world"), i)
+                for i in range(3)]
+
+    iprot = TBinaryProtocol(IdleTransport(messages, 0.2))
+    for _ in messages:
+        processor.process(iprot, TBinaryProtocol(TMemoryBuffer()))
+
+    # latency runs from the arrival of a request, not the wait for it
+    latency = collector.snapshot()["hello"]["latency"]
+    assert latency["count"] == 3
+    assert latency["max"] < 0.1
+
+
+def test_collector_exposition():
+    collector = MetricsCollector(prefix="svc")
+    _call(collector, _info("ping", TCallInfo.EXCEPTION, KeyError()))
+
+    text = collector.exposition()
+    assert 'svc_calls_total{method="ping"} 1\n' in text
+    assert 'svc_errors_total{method="ping",exception="KeyError"} 1\n' in text
+    assert 'svc_latency_seconds{method="ping",quantile="0.99"}' in text
+    assert 'svc_latency_seconds_count{method="ping"} 1\n' in text
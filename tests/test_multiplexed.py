@@ -9,16 +9,31 @@ import time
 import pytest
 
 import thriftpy
-from thriftpy.protocol import TBinaryProtocolFactory
+from thriftpy.protocol import (
+    TBinaryProtocolFactory,
+    TMultiplexedProtocol,
+    TMultiplexedProtocolFactory,
+)
 from thriftpy.rpc import client_context
 from thriftpy.server import TThreadedServer
-from thriftpy.thrift import TProcessor, TMultiplexingProcessor
-from thriftpy.transport import TBufferedTransportFactory, TServerSocket
+from thriftpy.thrift import (
+    TApplicationException,
+    TClient,
+    TMultiplexedProcessor,
+    TMultiplexingProcessor,
+    TProcessor,
+)
+from thriftpy.transport import (
+    TBufferedTransportFactory,
+    TServerSocket,
+    TSocket,
+)
 
 
 mux = thriftpy.load(os.path.join(os.path.dirname(__file__),
                                  "multiplexed.thrift"))
 sock_path = "./thriftpy_test.sock"
+mux_sock_path = "./thriftpy_mux_test.sock"
 
 
 class DispatcherOne(object):
@@ -57,6 +72,35 @@ def server(request):
     request.addfinalizer(fin)
 
 
+@pytest.fixture(scope="module")
+def mux_server(request):
+    p1 = TProcessor(mux.ThingOneService, DispatcherOne())
+    p2 = TProcessor(mux.ThingTwoService, DispatcherTwo())
+
+    mux_proc = TMultiplexedProcessor()
+    mux_proc.register_processor("ThingOneService", p1)
+    mux_proc.register_processor("ThingTwoService", p2)
+    # the same service may be exposed under another name
+    mux_proc.register_processor("ThingUnoService", p1)
+
+    _server = TThreadedServer(mux_proc,
+                              TServerSocket(unix_socket=mux_sock_path),
+                              iprot_factory=TBinaryProtocolFactory(),
+                              itrans_factory=TBufferedTransportFactory())
+    ps = multiprocessing.Process(target=_server.serve)
+    ps.start()
+    time.sleep(0.1)
+
+    def fin():
+        if ps.is_alive():
+            ps.terminate()
+        try:
+            os.remove(mux_sock_path)
+        except IOError:
+            pass
+    request.addfinalizer(fin)
+
+
 def client_one(timeout=3000):
     return client_context(mux.ThingOneService, unix_socket=sock_path,
                           timeout=timeout)
@@ -72,3 +116,56 @@ def test_multiplexed_server(server):
         assert c.doThingOne() is True
     with client_two() as c:
         assert c.doThingTwo() is True
+
+
+def mux_client(service, service_name, timeout=3000):
+    proto_factory = TMultiplexedProtocolFactory(TBinaryProtocolFactory(),
+                                                service_name)
+    return client_context(service, unix_socket=mux_sock_path,
+                          proto_factory=proto_factory, timeout=timeout)
+
+
+def test_multiplexed_protocol(mux_server):
+    with mux_client(mux.ThingOneService, "ThingOneService") as c:
+        assert c.doThingOne() is True
+    with mux_client(mux.ThingTwoService, "ThingTwoService") as c:
+        assert c.doThingTwo() is True
+    with mux_client(mux.ThingOneService, "ThingUnoService") as c:
+        assert c.doThingOne() is True
+
+
+def test_multiplexed_shared_connection(mux_server):
+    trans = TBufferedTransportFactory().get_transport(
+        TSocket(unix_socket=mux_sock_path))
+    proto = TBinaryProtocolFactory().get_protocol(trans)
+    trans.open()
+    try:
+        one = TClient(mux.ThingOneService,
+                      TMultiplexedProtocol(proto, "ThingOneService"))
+        two = TClient(mux.ThingTwoService,
+                      TMultiplexedProtocol(proto, "ThingTwoService"))
+        for _ in range(3):
+            assert one.doThingOne() is True
+            assert two.doThingTwo() is True
+    finally:
+        trans.close()
+
+
+def test_multiplexed_unknown_service(mux_server):
+    with mux_client(mux.ThingOneService, "NoSuchService") as c:
+        with pytest.raises(TApplicationException) as e:
+            c.doThingOne()
+        assert e.value.type == TApplicationException.UNKNOWN_METHOD
+
+
+def test_multiplexed_processor_registration():
+    p1 = TProcessor(mux.ThingOneService, DispatcherOne())
+
+    mux_proc = TMultiplexedProcessor()
+    mux_proc.register_processor("ThingOneService", p1)
+    with pytest.raises(TApplicationException):
+        mux_proc.register_processor("ThingOneService", p1)
+
+    # registrations are not shared between processor instances
+    assert not TMultiplexedProcessor().processors
+    assert not TMultiplexingProcessor().processors
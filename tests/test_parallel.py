@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+import thriftpy
+from thriftpy.contrib.parallel import ParallelDecoder
+from thriftpy.contrib.records import RecordReader, RecordWriter
+from thriftpy.thrift import TPayload, TType
+from thriftpy.utils import serialize, serialize_many
+
+addressbook = thriftpy.load(os.path.join(os.path.dirname(__file__),
+                                         "addressbook.thrift"),
+                            "addressbook_thrift")
+
+
+class TItem(TPayload):
+    thrift_spec = {
+        1: (TType.I32, "id", False),
+        2: (TType.LIST, "phones", TType.STRING, False),
+    }
+    default_spec = [("id", None), ("phones", None)]
+
+
+PEOPLE = [addressbook.Person(name=str(i), created_at=i) for i in range(50)]
+
+
+def test_parallel_decode():
+    bufs = [serialize(p) for p in PEOPLE]
+    with ParallelDecoder(addressbook.Person, processes=2,
+                         chunk_size=7) as decoder:
+        assert decoder.map(bufs) == PEOPLE
+        assert sorted(decoder.imap(bufs, ordered=False),
+                      key=lambda p: p.created_at) == PEOPLE
+        assert decoder.map(iter(bufs[:3])) == PEOPLE[:3]
+        assert decoder.map([]) == []
+
+        buf = serialize_many(PEOPLE, length_prefixed=True)
+        assert decoder.map_prefixed(buf) == PEOPLE
+
+
+def test_parallel_unpickleable():
+    container = thriftpy.load(os.path.join(os.path.dirname(__file__),
+                                           "container.thrift"))
+    with pytest.raises(ValueError):
+        ParallelDecoder(container.MixItem)
+
+
+def test_parallel_records(tmpdir):
+    items = [TItem(id=i, phones=[str(i)]) for i in range(50)]
+    path = str(tmpdir.join("items.rec"))
+    with RecordWriter(path, sync_interval=10) as writer:
+        for item in items:
+            writer.write(item)
+
+    pool = ThreadPool(2)
+    with ParallelDecoder(TItem, chunk_size=8, pool=pool) as decoder:
+        assert decoder.map_records(path) == items
+        assert sorted(decoder.imap_records(path, ordered=False),
+                      key=lambda i: i.id) == items
+    pool.close()
+    pool.join()
+
+
+def test_parallel_records_scanned_once(tmpdir, monkeypatch):
+    items = [TItem(id=i) for i in range(50)]
+    path = str(tmpdir.join("items.rec"))
+    with RecordWriter(path, sync_interval=10, index=False) as writer:
+        for item in items:
+            writer.write(item)
+
+    scans = []
+    scan = RecordReader._scan
+
+    def counting_scan(self):
+        scans.append(self)
+        scan(self)
+    monkeypatch.setattr(RecordReader, "_scan", counting_scan)
+
+    pool = ThreadPool(2)
+    with ParallelDecoder(TItem, chunk_size=8, pool=pool) as decoder:
+        assert decoder.map_records(path) == items
+    pool.close()
+    pool.join()
+    assert len(scans) == 1
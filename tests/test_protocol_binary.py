@@ -1,10 +1,21 @@
 # -*- coding: utf-8 -*-
 
+import array
 from io import BytesIO
 
+import pytest
+
 from thriftpy._compat import u
-from thriftpy.thrift import TType, TPayload
-from thriftpy.utils import hexlify
+from thriftpy.protocol.arrays import NUMERIC, numpy
+from thriftpy.thrift import TPayload, TSizedIterator, TType
+from thriftpy.utils import (
+    deserialize_columns,
+    deserialize_iter,
+    deserialize_many,
+    hexlify,
+    serialize,
+    serialize_many,
+)
 from thriftpy.protocol import binary as proto
 
 
@@ -16,6 +27,29 @@ class TItem(TPayload):
     default_spec = [("id", None), ("phones", None)]
 
 
+class TSeries(TPayload):
+    thrift_spec = {
+        1: (TType.LIST, "ids", TType.I32, False),
+        2: (TType.LIST, "values", TType.DOUBLE, False),
+    }
+    default_spec = [("ids", None), ("values", None)]
+
+
+class TBook(TPayload):
+    thrift_spec = {
+        1: (TType.STRING, "owner", False),
+        2: (TType.LIST, "items", (TType.STRUCT, TItem), False),
+        3: (TType.I32, "size", False),
+    }
+    default_spec = [("owner", None), ("items", None), ("size", None)]
+
+
+def _array(ttype, values):
+    if numpy is not None:
+        return numpy.array(values, dtype=NUMERIC[ttype][1][1:])
+    return array.array(NUMERIC[ttype][3], values)
+
+
 def test_pack_i8():
     b = BytesIO()
     proto.write_val(b, TType.I08, 123)
@@ -134,6 +168,141 @@ def test_read_struct():
     assert _item == _item2
 
 
+def test_iter_struct():
+    b = BytesIO(b"\x08\x00\x01\x00\x00\x00{\x0f\x00\x02\x0b\x00\x00\x00"
+                b"\x02\x00\x00\x00\x06123456\x00\x00\x00\x06abcdef\x00")
+    _item = TItem()
+    phones = proto.TBinaryProtocol(b).iter_struct(_item, "phones")
+    assert _item.id is None
+
+    assert list(phones) == ["123456", "abcdef"]
+    assert _item.id == 123 and _item.phones is None
+
+
+def test_deserialize_iter():
+    item = TItem(id=123, phones=["123456", "abcdef"])
+    _item = TItem()
+    phones = deserialize_iter(_item, serialize(item), "phones")
+    assert list(phones) == ["123456", "abcdef"]
+    assert _item.id == 123
+
+
+def test_serialize_many():
+    items = [TItem(id=i, phones=[str(i)] * i) for i in range(5)]
+
+    for factory in (proto.TBinaryProtocolFactory(), None):
+        kwargs = {"proto_factory": factory} if factory else {}
+        bufs = serialize_many(items, **kwargs)
+        assert bufs == [serialize(item) for item in items]
+        assert deserialize_many(TItem, bufs, **kwargs) == items
+
+        buf = serialize_many(items, length_prefixed=True, **kwargs)
+        assert buf[:4] == proto.pack_i32(len(bufs[0]))
+        assert len(buf) == sum(len(b) + 4 for b in bufs)
+        assert deserialize_many(TItem, buf, length_prefixed=True,
+                                **kwargs) == items
+
+    with pytest.raises(ValueError):
+        deserialize_many(TItem, buf[:-1], length_prefixed=True)
+
+
+def test_write_sized_iterator():
+    class FlushCounter(BytesIO):
+        flushes = 0
+        shut = False
+
+        def flush(self):
+            self.flushes += 1
+
+        def close(self):
+            self.shut = True
+
+    b = FlushCounter()
+    phones = (p for p in ["123456", "abcdef", "xyz"])
+    item = TItem(id=123, phones=TSizedIterator(phones, 3, chunk_size=2))
+    proto.TBinaryProtocol(b).write_struct(item)
+    assert b.flushes == 1
+
+    expected = BytesIO()
+    proto.TBinaryProtocol(expected).write_struct(
+        TItem(id=123, phones=["123456", "abcdef", "xyz"]))
+    assert b.getvalue() == expected.getvalue()
+
+    for size in (2, 4):
+        item = TItem(phones=TSizedIterator(iter(["1", "2", "3"]), size))
+        with pytest.raises(ValueError):
+            proto.TBinaryProtocol(BytesIO()).write_struct(item)
+
+    # framed transports aren't flushed in the middle of a message
+    b = FlushCounter()
+    b.framed = True
+    phones = iter(["1", "2", "3"])
+    item = TItem(phones=TSizedIterator(phones, 3, chunk_size=1))
+    proto.TBinaryProtocol(b).write_struct(item)
+    assert b.flushes == 0
+
+    # a message cut short after a flush closes the transport
+    b = FlushCounter()
+    item = TItem(phones=TSizedIterator(iter(["1", "2", "3"]), 4, 2))
+    with pytest.raises(ValueError):
+        proto.TBinaryProtocol(b).write_struct(item)
+    assert b.flushes == 1 and b.shut
+
+
+def test_numeric_arrays():
+    ids, values = [1, -2, 2 ** 31 - 1], [0.5, -1.25]
+    expected = BytesIO()
+    proto.TBinaryProtocol(expected).write_struct(TSeries(ids, values))
+
+    b = BytesIO()
+    proto.TBinaryProtocol(b).write_struct(TSeries(
+        _array(TType.I32, ids), _array(TType.DOUBLE, values)))
+    assert b.getvalue() == expected.getvalue()
+
+    b.seek(0)
+    _item = TSeries()
+    proto.TBinaryProtocol(b).read_struct(_item)
+    assert _item.ids == ids and _item.values == values
+
+    b.seek(0)
+    _item = TSeries()
+    proto.TBinaryProtocol(b, decode_arrays=True).read_struct(_item)
+    assert not isinstance(_item.ids, list)
+    assert list(_item.ids) == ids and list(_item.values) == values
+
+    # a negative size reads as an empty list, whatever decode_arrays is
+    data = (b"\x0f\x00\x01\x08\xff\xff\xff\xff"
+            b"\x0f\x00\x02\x04\x00\x00\x00\x01?\xe0\0\0\0\0\0\0\0")
+    for decode_arrays in (False, True):
+        _item = TSeries()
+        proto.TBinaryProtocol(BytesIO(data), decode_arrays=decode_arrays) \
+            .read_struct(_item)
+        assert list(_item.ids) == [] and list(_item.values) == [0.5]
+
+
+def test_read_columns():
+    items = [TItem(id=1, phones=["a"]), TItem(id=2), TItem(id=3)]
+    b = BytesIO()
+    proto.TBinaryProtocol(b).write_struct(TBook(u("x"), items, 3))
+
+    for decode_arrays in (False, True):
+        b.seek(0)
+        book = TBook()
+        p = proto.TBinaryProtocol(b, decode_arrays=decode_arrays)
+        columns = p.read_struct_columns(book, "items")
+        assert book.owner == u("x") and book.size == 3 and book.items is None
+        assert list(columns["id"]) == [1, 2, 3]
+        assert columns["phones"] == [["a"], None, None]
+        assert isinstance(columns["id"], list) != decode_arrays
+
+    columns = deserialize_columns(TBook(), serialize(TBook(items=[])),
+                                  "items")
+    assert columns == {"id": [], "phones": []}
+
+    with pytest.raises(TypeError):
+        deserialize_columns(TBook(), serialize(TBook(owner="x")), "owner")
+
+
 def test_write_empty_struct():
     b = BytesIO()
     item = TItem()
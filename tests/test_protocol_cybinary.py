@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import array
 import multiprocessing
 import os
 import time
@@ -7,7 +8,8 @@ import time
 import pytest
 
 from thriftpy._compat import u
-from thriftpy.thrift import TType, TPayload
+from thriftpy.protocol.arrays import NUMERIC, numpy
+from thriftpy.thrift import TPayload, TSizedIterator, TType
 from thriftpy.transport import TSocket, TServerSocket
 from thriftpy.utils import hexlify
 
@@ -18,6 +20,8 @@ if not PYPY:
     from thriftpy.protocol import cybin as proto
     from thriftpy.transport.memory import TCyMemoryBuffer
     from thriftpy.transport.buffered import TCyBufferedTransport
+    from thriftpy.transport.framed import TCyFramedTransport
+    from thriftpy.transport.memory import TMemoryBuffer
 
 
 class TItem(TPayload):
@@ -28,6 +32,29 @@ class TItem(TPayload):
     default_spec = [("id", None), ("phones", None)]
 
 
+class TSeries(TPayload):
+    thrift_spec = {
+        1: (TType.LIST, "ids", TType.I32, False),
+        2: (TType.LIST, "values", TType.DOUBLE, False),
+    }
+    default_spec = [("ids", None), ("values", None)]
+
+
+class TBook(TPayload):
+    thrift_spec = {
+        1: (TType.STRING, "owner", False),
+        2: (TType.LIST, "items", (TType.STRUCT, TItem), False),
+        3: (TType.I32, "size", False),
+    }
+    default_spec = [("owner", None), ("items", None), ("size", None)]
+
+
+def _array(ttype, values):
+    if numpy is not None:
+        return numpy.array(values, dtype=NUMERIC[ttype][1][1:])
+    return array.array(NUMERIC[ttype][3], values)
+
+
 def test_write_bool():
     b = TCyMemoryBuffer()
     proto.write_val(b, TType.BOOL, 1)
@@ -184,6 +211,115 @@ def test_read_struct():
     assert _item == _item2
 
 
+def test_iter_struct():
+    b = TCyMemoryBuffer(b"\x08\x00\x01\x00\x00\x00{"
+                        b"\x0f\x00\x02\x0b\x00\x00\x00"
+                        b"\x02\x00\x00\x00\x06123456"
+                        b"\x00\x00\x00\x06abcdef\x00")
+    b = proto.TCyBinaryProtocol(b)
+    _item = TItem()
+    assert list(b.iter_struct(_item, "phones")) == ["123456", "abcdef"]
+    assert _item.id == 123 and _item.phones is None
+
+
+def test_write_sized_iterator():
+    trans = TCyMemoryBuffer()
+    b = proto.TCyBinaryProtocol(trans)
+    phones = (p for p in ["123456", "abcdef", "xyz"])
+    b.write_struct(TItem(id=123, phones=TSizedIterator(phones, 3, 2)))
+
+    _item = TItem()
+    b.read_struct(_item)
+    assert _item == TItem(id=123, phones=["123456", "abcdef", "xyz"])
+
+    item = TItem(phones=TSizedIterator(iter(["1", "2", "3"]), 2))
+    with pytest.raises(ValueError):
+        b.write_struct(item)
+
+
+def test_write_sized_iterator_framed():
+    # the message is sent as a single frame, whatever the chunk size
+    sock = TMemoryBuffer()
+    trans = TCyFramedTransport(sock)
+    phones = iter(["123456", "abcdef", "xyz"])
+    proto.TCyBinaryProtocol(trans).write_struct(
+        TItem(id=123, phones=TSizedIterator(phones, 3, 1)))
+    trans.flush()
+    assert trans.frames_written == 1
+
+    _item = TItem()
+    proto.TCyBinaryProtocol(
+        TCyFramedTransport(TMemoryBuffer(sock.getvalue()))).read_struct(_item)
+    assert _item == TItem(id=123, phones=["123456", "abcdef", "xyz"])
+
+
+def test_write_sized_iterator_cut_short():
+    class ClosingBuffer(TMemoryBuffer):
+        shut = False
+
+        def close(self):
+            self.shut = True
+
+    sock = ClosingBuffer()
+    b = proto.TCyBinaryProtocol(TCyBufferedTransport(sock))
+    item = TItem(phones=TSizedIterator(iter(["1", "2", "3"]), 4, 2))
+    with pytest.raises(ValueError):
+        b.write_struct(item)
+    assert sock.getvalue() and sock.shut
+
+
+def test_numeric_arrays():
+    ids, values = [1, -2, 2 ** 31 - 1], [0.5, -1.25]
+    expected = TCyMemoryBuffer()
+    proto.TCyBinaryProtocol(expected).write_struct(TSeries(ids, values))
+    expected.flush()
+
+    trans = TCyMemoryBuffer()
+    proto.TCyBinaryProtocol(trans).write_struct(TSeries(
+        _array(TType.I32, ids), _array(TType.DOUBLE, values)))
+    trans.flush()
+    assert trans.getvalue() == expected.getvalue()
+
+    _item = TSeries()
+    proto.TCyBinaryProtocol(expected).read_struct(_item)
+    assert _item.ids == ids and _item.values == values
+
+    _item = TSeries()
+    b = proto.TCyBinaryProtocol(trans, decode_arrays=True)
+    b.read_struct(_item)
+    assert not isinstance(_item.ids, list)
+    assert list(_item.ids) == ids and list(_item.values) == values
+
+    # a negative size reads as an empty list, whatever decode_arrays is
+    data = (b"\x0f\x00\x01\x08\xff\xff\xff\xff"
+            b"\x0f\x00\x02\x04\x00\x00\x00\x01?\xe0\0\0\0\0\0\0\0")
+    for decode_arrays in (False, True):
+        _item = TSeries()
+        proto.TCyBinaryProtocol(TCyMemoryBuffer(data),
+                                decode_arrays=decode_arrays).read_struct(_item)
+        assert list(_item.ids) == [] and list(_item.values) == [0.5]
+
+
+def test_read_columns():
+    items = [TItem(id=1, phones=["a"]), TItem(id=2), TItem(id=3)]
+    trans = TCyMemoryBuffer()
+    b = proto.TCyBinaryProtocol(trans)
+    b.write_struct(TBook(u("x"), items, 3))
+    b.write_struct(TBook(items=[]))
+
+    book = TBook()
+    columns = b.read_struct_columns(book, "items")
+    assert book.owner == u("x") and book.size == 3 and book.items is None
+    assert columns == {"id": [1, 2, 3], "phones": [["a"], None, None]}
+    assert b.read_struct_columns(TBook(), "items") == {"id": [], "phones": []}
+
+    b = proto.TCyBinaryProtocol(trans, decode_arrays=True)
+    b.write_struct(TBook(items=items))
+    columns = b.read_struct_columns(TBook(), "items")
+    assert not isinstance(columns["id"], list)
+    assert list(columns["id"]) == [1, 2, 3]
+
+
 def test_write_empty_struct():
     trans = TCyMemoryBuffer()
     b = proto.TCyBinaryProtocol(trans)
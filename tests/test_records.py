@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import pytest
+
+from thriftpy.contrib.records import RecordReader, RecordWriter
+from thriftpy.protocol import TBinaryProtocolFactory
+from thriftpy.thrift import TPayload, TType
+from thriftpy.utils import serialize
+
+
+class TItem(TPayload):
+    thrift_spec = {
+        1: (TType.I32, "id", False),
+        2: (TType.LIST, "phones", TType.STRING, False),
+    }
+    default_spec = [("id", None), ("phones", None)]
+
+
+ITEMS = [TItem(id=i, phones=[str(i)] * (i % 3)) for i in range(25)]
+
+
+@pytest.mark.parametrize("index", [True, False])
+def test_records(tmpdir, index):
+    path = str(tmpdir.join("items.rec"))
+    with RecordWriter(path, sync_interval=10, index=index) as writer:
+        for item in ITEMS:
+            writer.write(item)
+    assert writer.count == 25
+
+    with RecordReader(path, TItem) as reader:
+        assert list(reader) == ITEMS
+        assert len(reader) == 25
+        assert reader[0] == ITEMS[0]
+        assert reader[13] == ITEMS[13]
+        assert reader[-1] == ITEMS[-1]
+        assert list(reader.iter_raw(21)) == [serialize(i) for i in ITEMS[21:]]
+        assert list(reader.iter_raw(25)) == []
+
+        with pytest.raises(IndexError):
+            reader[25]
+
+        # records are decoded through views of the mapping, none is left
+        # behind to keep it from being closed
+        records = iter(reader)
+        assert next(records) == ITEMS[0]
+        reader.close()
+
+
+def test_records_file_objects(tmpdir):
+    path = tmpdir.join("items.rec")
+    factory = TBinaryProtocolFactory()
+    with path.open("wb") as f:
+        writer = RecordWriter(f, proto_factory=factory, sync_interval=1)
+        for item in ITEMS[:3]:
+            writer.write(item)
+        writer.close()
+
+    with path.open("rb") as f:
+        reader = RecordReader(f, TItem, proto_factory=factory)
+        assert list(reader) == ITEMS[:3]
+        assert reader[2] == ITEMS[2]
+        reader.close()
+
+    empty = str(tmpdir.join("empty.rec"))
+    RecordWriter(empty).close()
+    with RecordReader(empty, TItem) as reader:
+        assert len(reader) == 0 and list(reader) == []
+
+
+def test_records_corrupted(tmpdir):
+    path = tmpdir.join("items.rec")
+    with RecordWriter(str(path), sync_interval=10, index=False) as writer:
+        for item in ITEMS:
+            writer.write(item)
+
+    data = path.read_binary()
+    path.write_binary(data[:-1])
+    with RecordReader(str(path), TItem) as reader:
+        with pytest.raises(ValueError):
+            list(reader)
+
+    # clobber the first sync marker
+    offset = data.index(data[4:20], 20)
+    path.write_binary(data[:offset] + b"\0" * 16 + data[offset + 16:])
+    with RecordReader(str(path), TItem) as reader:
+        with pytest.raises(ValueError):
+            len(reader)
+
+    path.write_binary(b"")
+    with pytest.raises(ValueError):
+        RecordReader(str(path), TItem)
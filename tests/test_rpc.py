@@ -12,7 +12,8 @@ import pytest
 import thriftpy
 thriftpy.install_import_hook()  # noqa
 
-from thriftpy.rpc import make_server, client_context
+from thriftpy.rpc import make_server, client_context, iter_call
+from thriftpy.transport import TSocket  # noqa
 
 
 addressbook = thriftpy.load(os.path.join(os.path.dirname(__file__),
@@ -142,6 +143,25 @@ def test_complex_tstruct():
         assert len(c.get_phonenumbers("Alice", 1000)) == 1000
 
 
+def test_iter_call(server, person):
+    with client() as c:
+        c.add(person)
+        phones = iter_call(c, "get_phonenumbers", "Alice", 1000)
+        assert sum(1 for _ in phones) == 1000
+
+        carol = addressbook.Person(name="Carol", phones=person.phones[:2])
+        c.add(carol)
+        phones = dict(iter_call(c, "get_phones", "Carol"))
+        assert phones == {addressbook.PhoneType.MOBILE: "555-1212",
+                          addressbook.PhoneType.HOME: "555-1234"}
+
+        # the client is usable again once the iteration is over
+        assert c.hello("world") == "hello world"
+
+        with pytest.raises(TypeError):
+            iter_call(c, "hello", "world")
+
+
 def test_exception():
     with pytest.raises(addressbook.PersonNotExistsError):
         with client() as c:
@@ -152,3 +172,20 @@ def test_client_timeout():
     with pytest.raises(socket.timeout):
         with client(timeout=500) as c:
             c.sleep(1000)
+
+
+def test_socket_stats():
+    left, right = socket.socketpair()
+    a, b = TSocket(), TSocket()
+    a.set_handle(left)
+    b.set_handle(right)
+
+    a.write(b"hello")
+    a.write(b"world")
+    assert b.read(10)
+    assert a.stats()["write_calls"] == 2
+    assert a.stats()["bytes_written"] == 10
+    assert b.stats()["read_calls"] == 1
+
+    a.close()
+    b.close()
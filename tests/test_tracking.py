@@ -7,6 +7,7 @@ import os
 import multiprocessing
 import time
 import tempfile
+import threading
 import pickle
 import thriftpy
 
@@ -18,14 +19,16 @@ except ImportError:
 import pytest
 
 from thriftpy.contrib.tracking import TTrackedProcessor, TTrackedClient, \
-    TrackerBase, trace_thrift
+    TrackerBase, BatchTracker, trace_thrift, deadline, remaining_budget
 from thriftpy.contrib.tracking.tracker import ctx
 
-from thriftpy.thrift import TProcessorFactory, TClient, TProcessor
+from thriftpy.thrift import TProcessorFactory, TClient, TProcessor, \
+    TApplicationException, TMessageType
 from thriftpy.server import TThreadedServer
 from thriftpy.transport import TServerSocket, TBufferedTransportFactory, \
-    TTransportException, TSocket
+    TTransportException, TSocket, TMemoryBuffer
 from thriftpy.protocol import TBinaryProtocolFactory
+from thriftpy.utils import deserialize_many
 
 
 addressbook = thriftpy.load(os.path.join(os.path.dirname(__file__),
@@ -295,3 +298,180 @@ def test_request_id_func():
     header2 = trace_thrift.RequestHeader()
     tracker.gen_header(header2)
     assert header2.request_id == "hello"
+
+
+def _tracked_call(processor, budget, api="hello", args=None):
+    iprot = TBinaryProtocolFactory().get_protocol(TMemoryBuffer())
+    oprot = TBinaryProtocolFactory().get_protocol(TMemoryBuffer())
+
+    header = trace_thrift.RequestHeader(request_id="hello", seq="1",
+                                        budget=budget)
+    header.write(iprot)
+    iprot.write_message_begin(api, TMessageType.CALL, 0)
+    if args is None:
+        args = getattr(addressbook.AddressBookService, api + "_args")()
+    args.write(iprot)
+    iprot.write_message_end()
+
+    processor.process(iprot, oprot)
+    return oprot
+
+
+def test_deadline_budget():
+    ctx.__dict__.clear()
+    assert remaining_budget() is None
+
+    with deadline(1000):
+        assert 0 < remaining_budget() <= 1000
+
+        # nested deadline can't extend the outer one
+        with deadline(5000):
+            assert remaining_budget() <= 1000
+
+        header = trace_thrift.RequestHeader()
+        TrackerBase().gen_header(header)
+        assert 0 < header.budget <= 1000
+
+    assert remaining_budget() is None
+
+
+def test_deadline_propagated_to_handler():
+    budgets = []
+
+    class BudgetDispatcher(object):
+        def hello(self, name):
+            budgets.append(remaining_budget())
+            return "hello %s" % name
+
+    processor = TTrackedProcessor(TrackerBase(),
+                                  addressbook.AddressBookService,
+                                  BudgetDispatcher())
+    processor._upgraded = True
+
+    args = addressbook.AddressBookService.hello_args(name="world")
+    oprot = _tracked_call(processor, 3000, args=args)
+
+    assert len(budgets) == 1 and 0 < budgets[0] <= 3000
+
+    api, msg_type, seqid = oprot.read_message_begin()
+    assert msg_type == TMessageType.REPLY
+    result = addressbook.AddressBookService.hello_result()
+    result.read(oprot)
+    assert result.success == "hello world"
+
+
+def test_deadline_exceeded_skips_handler():
+    called = []
+
+    class SlowDispatcher(object):
+        def ping(self):
+            called.append(True)
+
+    processor = TTrackedProcessor(TrackerBase(),
+                                  addressbook.AddressBookService,
+                                  SlowDispatcher())
+    processor._upgraded = True
+
+    oprot = _tracked_call(processor, 0, api="ping")
+    assert not called
+
+    api, msg_type, seqid = oprot.read_message_begin()
+    assert msg_type == TMessageType.EXCEPTION
+    exc = TApplicationException()
+    exc.read(oprot)
+    assert exc.type == TApplicationException.INTERNAL_ERROR
+
+
+def test_client_deadline_exceeded(server, dbm_db):
+    ctx.__dict__.clear()
+
+    with client() as c:
+        with deadline(0):
+            with pytest.raises(TApplicationException):
+                c.ping()
+
+        # connection is still usable after the call was given up
+        c.ping()
+
+
+def test_batch_tracker():
+    batches = []
+    infos = [trace_thrift.RequestInfo(request_id=str(i), api="ping",
+                                      status=True, start=i, end=i + 1)
+             for i in range(30)]
+
+    def export(data):
+        batches.append(deserialize_many(trace_thrift.RequestInfo, data,
+                                        length_prefixed=True))
+
+    def wait_exported(n):
+        for _ in range(100):
+            if tracker.exported >= n:
+                return
+            time.sleep(0.01)
+
+    # overflow, the records exceeding the capacity are dropped
+    tracker = BatchTracker(export=export, batch_size=10, interval=60,
+                           capacity=5)
+    for info in infos[:8]:
+        tracker.record(info, None)
+    assert tracker.dropped == 3
+    tracker.close()
+    assert batches == [infos[:5]]
+    tracker.record(infos[0], None)
+    assert tracker.dropped == 4
+
+    # flushed in batches when enough records are buffered
+    del batches[:]
+    tracker = BatchTracker(export=export, batch_size=10, interval=60)
+    for info in infos:
+        tracker.record(info, None)
+    wait_exported(30)
+    assert sum(batches, []) == infos
+    assert all(len(batch) <= 10 for batch in batches)
+    tracker.close()
+
+    # or when the interval elapsed
+    del batches[:]
+    tracker = BatchTracker(export=export, batch_size=10, interval=0.05)
+    tracker.record(infos[0], None)
+    wait_exported(1)
+    assert batches == [infos[:1]] and tracker.batches == 1
+    tracker.close()
+
+
+def test_batch_tracker_export_error():
+    class FailingTracker(BatchTracker):
+        def export(self, data):
+            raise IOError("collector down")
+
+    tracker = FailingTracker(batch_size=2, interval=60)
+    for i in range(3):
+        tracker.record(trace_thrift.RequestInfo(request_id=str(i)), None)
+    tracker.close()
+    assert tracker.errors == 2 and tracker.exported == 0
+
+
+def test_batch_tracker_needs_export():
+    with pytest.raises(TypeError):
+        BatchTracker()
+
+
+def test_batch_tracker_capacity_threads():
+    tracker = BatchTracker(export=lambda data: None, batch_size=10000,
+                           interval=60, capacity=100)
+    info = trace_thrift.RequestInfo(request_id="1")
+
+    def work():
+        for _ in range(1000):
+            tracker.record(info, None)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(tracker._buffer) == 100
+    assert tracker.dropped == 7900
+    tracker.close()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import multiprocessing
+import time
+
+from os import path
+from unittest import TestCase
+
+import pytest
+
+import thriftpy
+from thriftpy.rpc import client_context, make_server
+from thriftpy.protocol.binary import TBinaryProtocolFactory
+from thriftpy.transport import TTransportException
+from thriftpy.transport.compressed import (
+    RAW,
+    ZLIB,
+    TZlibTransport,
+    TZlibTransportFactory,
+)
+from thriftpy.transport.framed import TFramedTransport
+from thriftpy.transport.memory import TMemoryBuffer
+
+from thriftpy._compat import CYTHON
+
+addressbook = thriftpy.load(path.join(path.dirname(__file__),
+                                      "addressbook.thrift"))
+
+
+class Dispatcher(object):
+    def hello(self, name):
+        return "hello " + name
+
+
+class ZlibTransport(TestCase):
+    @staticmethod
+    def trans(sock, **kwargs):
+        return TZlibTransport(sock, **kwargs)
+
+    def test_small_message_not_compressed(self):
+        sock = TMemoryBuffer()
+        t = self.trans(sock, min_size=100)
+        t.write(b"hello world")
+        t.flush()
+
+        value = sock.getvalue()
+        assert value[0:1] == bytearray([RAW])
+        assert value.endswith(b"hello world")
+
+        assert self.trans(TMemoryBuffer(value)).read(11) == b"hello world"
+
+    def test_large_message_compressed(self):
+        data = b"hello world " * 1000
+
+        sock = TMemoryBuffer()
+        t = self.trans(sock, min_size=100)
+        t.write(data[:6000])
+        t.write(data[6000:])
+        t.flush()
+        t.write(b"small")
+        t.flush()
+
+        value = sock.getvalue()
+        assert value[0:1] == bytearray([ZLIB])
+        assert len(value) < len(data)
+
+        reader = self.trans(TMemoryBuffer(value))
+        assert reader.read(len(data)) == data
+        assert reader.read(5) == b"small"
+
+    def test_bad_block_header(self):
+        for block in (b"\x00\xff\xff\xff\xf0hello",
+                      b"\x02\x00\x00\x00\x05hello",
+                      b"\x01\x00\x00\x00\x05hello"):
+            with pytest.raises(TTransportException):
+                self.trans(TMemoryBuffer(block)).read(5)
+
+    def test_over_framed_transport(self):
+        data = b"hello world " * 1000
+
+        sock = TMemoryBuffer()
+        t = self.trans(TFramedTransport(sock))
+        t.write(data)
+        t.flush()
+
+        reader = self.trans(TFramedTransport(TMemoryBuffer(sock.getvalue())))
+        assert reader.read(len(data)) == data
+
+
+if CYTHON:
+    from thriftpy.transport.compressed import TCyZlibTransport
+    from thriftpy.transport.framed import TCyFramedTransport
+
+    class CyZlibTransport(ZlibTransport):
+        @staticmethod
+        def trans(sock, **kwargs):
+            return TCyZlibTransport(sock, **kwargs)
+
+        def test_over_cy_framed_transport(self):
+            data = b"hello world " * 1000
+
+            sock = TMemoryBuffer()
+            t = self.trans(TCyFramedTransport(sock))
+            t.write(data)
+            t.flush()
+
+            reader = self.trans(
+                TCyFramedTransport(TMemoryBuffer(sock.getvalue())))
+            assert reader.read(len(data)) == data
+
+
+class ZlibTransportTestCase(TestCase):
+    TRANSPORT_FACTORY = TZlibTransportFactory(min_size=0)
+    PROTOCOL_FACTORY = TBinaryProtocolFactory()
+
+    PORT = 50003
+
+    def mk_server(self):
+        server = make_server(addressbook.AddressBookService, Dispatcher(),
+                             host="localhost", port=self.PORT,
+                             proto_factory=self.PROTOCOL_FACTORY,
+                             trans_factory=self.TRANSPORT_FACTORY)
+        p = multiprocessing.Process(target=server.serve)
+        return p
+
+    def client(self):
+        return client_context(addressbook.AddressBookService,
+                              host="localhost", port=self.PORT,
+                              proto_factory=self.PROTOCOL_FACTORY,
+                              trans_factory=self.TRANSPORT_FACTORY)
+
+    def setUp(self):
+        self.server = self.mk_server()
+        self.server.start()
+        time.sleep(0.3)
+
+    def tearDown(self):
+        if self.server.is_alive():
+            self.server.terminate()
+
+    def test_able_to_communicate(self):
+        name = "world" * 1000
+        with self.client() as c:
+            assert c.hello("world") == "hello world"
+            assert c.hello(name) == "hello " + name
+
+
+if CYTHON:
+    from thriftpy.transport.compressed import TCyZlibTransportFactory
+    from thriftpy.transport.framed import TCyFramedTransportFactory
+    from thriftpy.protocol.cybin import TCyBinaryProtocolFactory
+
+    def test_cy_factory_buf_size():
+        trans = TCyZlibTransportFactory(buf_size=65536).get_transport(
+            TMemoryBuffer())
+        assert trans.stats()["peak_buffer_size"] == 65536
+
+    class CyZlibTransportTestCase(ZlibTransportTestCase):
+        TRANSPORT_FACTORY = TCyZlibTransportFactory(min_size=0)
+        PROTOCOL_FACTORY = TCyBinaryProtocolFactory()
+
+    class CyFramedZlibTransportTestCase(ZlibTransportTestCase):
+        TRANSPORT_FACTORY = TCyZlibTransportFactory(
+            min_size=0, trans_factory=TCyFramedTransportFactory())
+        PROTOCOL_FACTORY = TCyBinaryProtocolFactory()
@@ -16,6 +16,12 @@ PY3 = sys.version_info[0] == 3
 PYPY = "__pypy__" in sys.modules
 CYTHON = not PYPY  # Cython always disabled in pypy
 
+try:
+    from time import perf_counter
+except ImportError:
+    # python2, time.time has the best resolution on unix
+    from time import time as perf_counter  # noqa
+
 if PY3:
     text_type = str
     string_types = (str,)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per method metrics of clients and processors.
+
+`MetricsCollector` is a hook counting calls, errors by exception type, bytes
+and in-flight requests, and recording latencies in log-linear histograms::
+
+    metrics = MetricsCollector()
+    server = make_server(pingpong.PingService, Dispatcher(), hooks=[metrics])
+
+    metrics.snapshot()["ping"]["latency"]["p99"]
+    print(metrics.exposition())
+
+Every thread records into its own shard, so recording takes no lock, shards
+are merged when a snapshot is taken. The shards of the threads gone are
+folded into one.
+"""
+
+from __future__ import absolute_import
+
+import threading
+import weakref
+
+from ...thrift import TCallInfo, THook
+from .histogram import Histogram
+
+__all__ = ["MetricsCollector", "Histogram"]
+
+QUANTILES = (50, 90, 99, 99.9)
+
+
+class _MethodStats(object):
+    __slots__ = ("calls", "errors", "request_bytes", "response_bytes",
+                 "latency")
+
+    def __init__(self, precision):
+        self.calls = 0
+        self.errors = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = Histogram(precision)
+
+
+class _Shard(object):
+    def __init__(self):
+        self.methods = {}
+        # not cleared by reset, requests in flight are still in flight
+        self.in_flight = {}
+
+
+class MetricsCollector(THook):
+    """Hook collecting per method metrics, latencies are recorded in
+    microseconds and reported in seconds.
+    """
+
+    def __init__(self, prefix="thrift", precision=5):
+        self.prefix = prefix
+        self.precision = precision
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = _Shard()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._retire()
+                self._shards.append(
+                    (weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def _retire(self):
+        """Fold the shards of the threads gone into a single one, so threads
+        coming and going, one per connection of a threaded server, don't
+        pile up shards. Called with the lock held.
+        """
+        live = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                live.append((ref, shard))
+            else:
+                _merge_shard(self._retired, shard, self.precision)
+        self._shards = live
+
+    def begin(self, info):
+        in_flight = self._shard().in_flight
+        in_flight[info.api] = in_flight.get(info.api, 0) + 1
+
+    def end(self, info):
+        shard = self._shard()
+        shard.in_flight[info.api] = shard.in_flight.get(info.api, 0) - 1
+
+        stats = shard.methods.get(info.api)
+        if stats is None:
+            stats = shard.methods[info.api] = _MethodStats(self.precision)
+
+        stats.calls += 1
+        if info.outcome != TCallInfo.OK:
+            name = type(info.exception).__name__
+            stats.errors[name] = stats.errors.get(name, 0) + 1
+        if info.request_bytes:
+            stats.request_bytes += info.request_bytes
+        if info.response_bytes:
+            stats.response_bytes += info.response_bytes
+
+        # from the arrival of the request, the wait for it isn't decoding
+        elapsed = 0.0
+        for t in (info.decode_time, info.handler_time, info.encode_time):
+            if t is not None:
+                elapsed += t
+        stats.latency.record(elapsed * 1000000)
+
+    def reset(self):
+        """Drop everything recorded so far, but the in-flight requests."""
+        with self._lock:
+            self._retired.methods = {}
+            for _, shard in self._shards:
+                shard.methods = {}
+
+    def snapshot(self):
+        """Return the metrics of every method merged across threads."""
+        total = _Shard()
+        with self._lock:
+            self._retire()
+            _merge_shard(total, self._retired, self.precision)
+            for _, shard in self._shards:
+                _merge_shard(total, shard, self.precision)
+        merged, in_flight = total.methods, total.in_flight
+
+        result = {}
+        for api in set(merged) | set(in_flight):
+            m = merged.get(api)
+            if m is None:
+                if not in_flight[api]:
+                    continue
+                m = _MethodStats(self.precision)
+            result[api] = {
+                "calls": m.calls,
+                "errors": m.errors,
+                "in_flight": in_flight.get(api, 0),
+                "request_bytes": m.request_bytes,
+                "response_bytes": m.response_bytes,
+                "latency": _latency_summary(m.latency),
+            }
+        return result
+
+    def exposition(self):
+        """Render a snapshot in the Prometheus text format."""
+        p = self.prefix
+        lines = []
+        snapshot = self.snapshot()
+
+        for api in sorted(snapshot):
+            m = snapshot[api]
+            label = 'method="%s"' % api
+
+            lines.append('%s_calls_total{%s} %d' % (p, label, m["calls"]))
+            for name in sorted(m["errors"]):
+                lines.append('%s_errors_total{%s,exception="%s"} %d' % (
+                    p, label, name, m["errors"][name]))
+            lines.append('%s_in_flight{%s} %d' % (p, label, m["in_flight"]))
+            lines.append('%s_request_bytes_total{%s} %d' % (
+                p, label, m["request_bytes"]))
+            lines.append('%s_response_bytes_total{%s} %d' % (
+                p, label, m["response_bytes"]))
+
+            latency = m["latency"]
+            if latency["count"]:
+                for q in QUANTILES:
+                    lines.append('%s_latency_seconds{%s,quantile="%s"} %r' % (
+                        p, label, q / 100.0, latency[_quantile_key(q)]))
+            lines.append('%s_latency_seconds_sum{%s} %r' % (
+                p, label, latency["sum"]))
+            lines.append('%s_latency_seconds_count{%s} %d' % (
+                p, label, latency["count"]))
+
+        return "\n".join(lines) + "\n"
+
+
+def _merge_shard(into, shard, precision):
+    for api, count in list(shard.in_flight.items()):
+        into.in_flight[api] = into.in_flight.get(api, 0) + count
+
+    for api, stats in list(shard.methods.items()):
+        m = into.methods.get(api)
+        if m is None:
+            m = into.methods[api] = _MethodStats(precision)
+
+        m.calls += stats.calls
+        for name, count in list(stats.errors.items()):
+            m.errors[name] = m.errors.get(name, 0) + count
+        m.request_bytes += stats.request_bytes
+        m.response_bytes += stats.response_bytes
+        m.latency.merge(stats.latency)
+
+
+def _quantile_key(q):
+    return "p" + ("%g" % q).replace(".", "")
+
+
+def _latency_summary(h):
+    def seconds(us):
+        return None if us is None else us / 1000000.0
+
+    summary = {
+        "count": h.count,
+        "sum": h.total / 1000000.0,
+        "min": seconds(h.min),
+        "max": seconds(h.max),
+        "mean": seconds(h.mean()),
+    }
+    for q in QUANTILES:
+        summary[_quantile_key(q)] = seconds(h.percentile(q))
+    return summary
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division
+
+
+class Histogram(object):
+    """Log-linear histogram of non negative integers, in the spirit of
+    HdrHistogram.
+
+    Values below 2 ** precision are counted exactly, larger values share
+    buckets whose width is a power of two, so the relative error of any
+    recorded value is below 2 ** (1 - precision). Buckets are kept sparse,
+    recording is a dict update and histograms merge by adding counts.
+
+    A histogram is not thread safe, keep one per thread and merge them.
+    """
+
+    def __init__(self, precision=5):
+        self.precision = precision
+        self._half = 1 << (precision - 1)
+        self._exact = 1 << precision
+
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self._exact:
+            return value
+
+        shift = value.bit_length() - self.precision
+        return shift * self._half + (value >> shift)
+
+    def _bounds(self, index):
+        """Return the lowest and highest value counted by a bucket."""
+        if index < self._exact:
+            return index, index
+
+        shift = index // self._half - 1
+        mantissa = index - shift * self._half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        value = int(value)
+        if value < 0:
+            raise ValueError("Histogram values can't be negative")
+
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Can't merge histograms of different precision")
+
+        for index, count in list(other.buckets.items()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+
+        if other.min is not None and (self.min is None or
+                                      other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or
+                                      other.max > self.max):
+            self.max = other.max
+
+    def copy(self):
+        h = Histogram(self.precision)
+        h.merge(self)
+        return h
+
+    def clear(self):
+        self.buckets = {}
+        self.count = self.total = 0
+        self.min = self.max = None
+
+    def mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, p):
+        """Return the value below which `p` percent of the values fall,
+        as the highest value of its bucket but never above the maximum.
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, int(round(p / 100 * self.count)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._bounds(index)[1], self.max)
+        return self.max
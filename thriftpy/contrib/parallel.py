@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+Decoding of many serialized objects across a process pool.
+
+`ParallelDecoder` splits a sequence of serialized objects, a length prefixed
+buffer or a record file into chunks decoded by the workers of a pool, and
+returns the objects in order, or chunk by chunk as they are decoded::
+
+    with ParallelDecoder(Event, processes=8) as decoder:
+        events = decoder.map_records("events.rec")
+
+The objects go back from the workers pickled, structs of modules made by
+`thriftpy.load` need a `module_name` for that. Such structs are sent to the
+workers as the path of their thrift file, which the workers load again if
+they don't have the module yet.
+"""
+
+from __future__ import absolute_import
+
+import itertools
+import multiprocessing
+import os
+import sys
+
+from ..parser import load
+from ..parser.parser import thrift_cache
+from ..protocol import TCyBinaryProtocolFactory
+from ..transport import TMemoryBuffer
+from ..utils import _split_prefixed
+from .records import RecordReader
+
+__all__ = ["ParallelDecoder"]
+
+
+def _struct_ref(thrift_class):
+    """Return a pickleable reference to `thrift_class`."""
+    module_name, name = thrift_class.__module__, thrift_class.__name__
+
+    for module in list(thrift_cache.values()):
+        if module.__name__ == module_name and \
+                getattr(module, name, None) is thrift_class:
+            if sys.modules.get(module_name) is not module:
+                raise ValueError("%s can't be pickled, load its thrift file "
+                                 "with a module_name" % name)
+            return os.path.abspath(module.__thrift_file__), module_name, name
+
+    # a class of a regular module, pickled by reference
+    return thrift_class
+
+
+_classes = {}
+
+
+def _resolve(ref):
+    if not isinstance(ref, tuple):
+        return ref
+
+    cls = _classes.get(ref)
+    if cls is None:
+        path, module_name, name = ref
+        module = sys.modules.get(module_name)
+        if module is None:
+            module = load(path, module_name)
+        cls = _classes[ref] = getattr(module, name)
+    return cls
+
+
+def _decode(cls, proto_factory, bufs):
+    transport = TMemoryBuffer()
+    protocol = proto_factory.get_protocol(transport)
+
+    result = []
+    for buf in bufs:
+        transport.setvalue(buf)
+        obj = cls()
+        obj.read(protocol)
+        result.append(obj)
+    return result
+
+
+def _decode_chunk(args):
+    ref, proto_factory, bufs = args
+    return _decode(_resolve(ref), proto_factory, bufs)
+
+
+def _decode_records(args):
+    ref, proto_factory, path, offset, skip, count = args
+    cls = _resolve(ref)
+    with RecordReader(path, cls, proto_factory) as reader:
+        records = itertools.islice(reader._iter_raw(offset, skip), count)
+        return [reader._decode(o, sz) for o, sz in records]
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ParallelDecoder(object):
+    """Decode objects of `thrift_class` in chunks of `chunk_size` across the
+    workers of `pool`, or of a new process pool of `processes` workers.
+    """
+
+    def __init__(self, thrift_class, processes=None, chunk_size=1000,
+                 proto_factory=TCyBinaryProtocolFactory(), pool=None):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+
+        self.thrift_class = thrift_class
+        self.chunk_size = chunk_size
+        self.proto_factory = proto_factory
+
+        self._ref = _struct_ref(thrift_class)
+        self._owned = pool is None
+        self._pool = multiprocessing.Pool(processes) if pool is None \
+            else pool
+
+    def _imap(self, func, tasks, ordered):
+        imap = self._pool.imap if ordered else self._pool.imap_unordered
+        for objs in imap(func, tasks):
+            for obj in objs:
+                yield obj
+
+    def imap(self, bufs, ordered=True):
+        """Decode every bytes of `bufs`. Unless `ordered`, the objects are
+        yielded chunk by chunk as the chunks are decoded.
+        """
+        tasks = ((self._ref, self.proto_factory, chunk)
+                 for chunk in _chunks(bufs, self.chunk_size))
+        return self._imap(_decode_chunk, tasks, ordered)
+
+    def map(self, bufs):
+        return list(self.imap(bufs))
+
+    def imap_prefixed(self, buf, ordered=True):
+        """Decode a length prefixed buffer, as made by
+        `thriftpy.utils.serialize_many`.
+        """
+        return self.imap(_split_prefixed(buf), ordered)
+
+    def map_prefixed(self, buf):
+        return list(self.imap_prefixed(buf))
+
+    def imap_records(self, path, ordered=True):
+        """Decode the records of a record file, every worker reads its own
+        chunks of records from the file. The file is scanned once here if it
+        has no index, the workers are handed the offset of their chunk.
+        """
+        path = os.path.abspath(path)
+        with RecordReader(path, self.thrift_class) as reader:
+            count = len(reader)
+            tasks = [(self._ref, self.proto_factory, path) +
+                     reader._seek(start) +
+                     (min(self.chunk_size, count - start),)
+                     for start in range(0, count, self.chunk_size)]
+
+        return self._imap(_decode_records, tasks, ordered)
+
+    def map_records(self, path):
+        return list(self.imap_records(path))
+
+    def close(self):
+        if self._owned:
+            self._pool.close()
+            self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
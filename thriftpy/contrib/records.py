@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+
+"""
+Files of thrift records.
+
+A record file starts with a magic and a random 16 bytes sync marker, followed
+by the records, each preceded by its length as a 4 bytes big endian integer.
+Every `sync_interval` records a length of -1 and the sync marker are written,
+so a reader can find the start of a block of records from any offset.
+
+Unless the writer is told otherwise, closing it appends an index of the
+offsets of the blocks and a fixed size footer, which give random access by
+record number. Files without an index are scanned once on the first random
+access::
+
+    with RecordWriter("events.rec") as writer:
+        for event in events:
+            writer.write(event)
+
+    with RecordReader("events.rec", Event) as reader:
+        for event in reader:
+            ...
+        last = reader[len(reader) - 1]
+"""
+
+from __future__ import absolute_import
+
+import bisect
+import mmap
+import os
+import struct
+
+from .._compat import PY3
+from ..protocol import TCyBinaryProtocolFactory
+from ..transport import TMemoryBuffer
+
+__all__ = ["RecordWriter", "RecordReader"]
+
+MAGIC = b"TRec"
+FOOTER_MAGIC = b"TIdx"
+SYNC_SIZE = 16
+HEADER_SIZE = len(MAGIC) + SYNC_SIZE
+
+# index offset, record count, sync interval, magic
+FOOTER = struct.Struct("!qqi4s")
+LENGTH = struct.Struct("!i")
+OFFSET = struct.Struct("!q")
+SYNC = -1
+
+
+class RecordWriter(object):
+    """Append thrift objects to a new record file at `path`, or to a file
+    object opened for binary writing.
+    """
+
+    def __init__(self, path, proto_factory=TCyBinaryProtocolFactory(),
+                 sync_interval=1000, index=True):
+        if sync_interval < 1:
+            raise ValueError("sync_interval must be positive")
+
+        if hasattr(path, "write"):
+            self._file, self._owned = path, False
+        else:
+            self._file, self._owned = open(path, "wb"), True
+
+        self.sync_interval = sync_interval
+        self.index = index
+        self.count = 0
+        self.closed = False
+
+        self._sync = os.urandom(SYNC_SIZE)
+        self._blocks = []
+        self._offset = HEADER_SIZE
+
+        self._trans = TMemoryBuffer()
+        self._proto = proto_factory.get_protocol(self._trans)
+
+        self._file.write(MAGIC + self._sync)
+
+    def write(self, thrift_object):
+        thrift_object.write(self._proto)
+        self._proto.write_message_end()
+        data = self._trans.getvalue()
+        self._trans.setvalue(b"")
+        self.write_raw(data)
+
+    def write_raw(self, data):
+        """Append an already serialized record."""
+        if self.closed:
+            raise ValueError("Write to a closed record file")
+
+        if self.count % self.sync_interval == 0:
+            if self.count:
+                self._file.write(LENGTH.pack(SYNC) + self._sync)
+                self._offset += LENGTH.size + SYNC_SIZE
+            self._blocks.append(self._offset)
+
+        self._file.write(LENGTH.pack(len(data)))
+        self._file.write(data)
+        self._offset += LENGTH.size + len(data)
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.index:
+            self._file.write(b"".join(OFFSET.pack(o) for o in self._blocks))
+            self._file.write(FOOTER.pack(self._offset, self.count,
+                                         self.sync_interval, FOOTER_MAGIC))
+        self._file.flush()
+        if self._owned:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordReader(object):
+    """Read the records of `thrift_class` of the record file at `path`, or
+    of a file object opened for binary reading.
+
+    The file is mapped in memory, every record is copied from a view of the
+    mapping into a single reused memory transport and decoded from there, on
+    python 3, python 2 copies a slice of the mapping first.
+    """
+
+    def __init__(self, path, thrift_class,
+                 proto_factory=TCyBinaryProtocolFactory()):
+        if hasattr(path, "fileno"):
+            self._file, self._owned = path, False
+        else:
+            self._file, self._owned = open(path, "rb"), True
+
+        self.thrift_class = thrift_class
+
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped
+            if self._owned:
+                self._file.close()
+            raise ValueError("Not a record file")
+
+        if len(self._mmap) < HEADER_SIZE or \
+                self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("Not a record file")
+        self.sync = self._mmap[len(MAGIC):HEADER_SIZE]
+
+        self._trans = TMemoryBuffer()
+        self._proto = proto_factory.get_protocol(self._trans)
+
+        # (first record number, offset) of every block, None until known
+        self._blocks = None
+        self._count = None
+        self._end = len(self._mmap)
+        self._read_footer()
+
+    def _read_footer(self):
+        size = len(self._mmap)
+        if size < HEADER_SIZE + FOOTER.size:
+            return
+
+        index_offset, count, interval, magic = FOOTER.unpack_from(
+            self._mmap, size - FOOTER.size)
+        if magic != FOOTER_MAGIC or interval < 1 or \
+                not HEADER_SIZE <= index_offset <= size - FOOTER.size:
+            return
+
+        n_blocks = (count + interval - 1) // interval
+        if index_offset + n_blocks * OFFSET.size != size - FOOTER.size:
+            return
+
+        self._end = index_offset
+        self._count = count
+        self._blocks = [
+            (i * interval,
+             OFFSET.unpack_from(self._mmap, index_offset + i * OFFSET.size)[0])
+            for i in range(n_blocks)]
+
+    def _scan(self):
+        """Build the block index of a file without one."""
+        blocks, count = [], 0
+        for offset in self._iter_raw(HEADER_SIZE, block_starts=True):
+            if not blocks or offset is not None:
+                blocks.append((count, offset or HEADER_SIZE))
+            count += 1
+        self._blocks, self._count = blocks, count
+
+    def _iter_raw(self, offset, skip=0, block_starts=False):
+        """Yield the (offset, size) of the records from `offset` but the
+        first `skip` ones, or with `block_starts` only the offset of the
+        block started by every record, None if it doesn't.
+        """
+        m, end = self._mmap, self._end
+        block_start = None
+        while offset < end:
+            if end - offset < LENGTH.size:
+                raise ValueError("Truncated record at offset %d" % offset)
+            sz, = LENGTH.unpack_from(m, offset)
+            offset += LENGTH.size
+
+            if sz == SYNC:
+                if m[offset:offset + SYNC_SIZE] != self.sync:
+                    raise ValueError("Bad sync marker at offset %d"
+                                     % (offset - LENGTH.size))
+                offset += SYNC_SIZE
+                block_start = offset
+                continue
+
+            if sz < 0 or offset + sz > end:
+                raise ValueError("Bad record length %d at offset %d"
+                                 % (sz, offset - LENGTH.size))
+            if skip:
+                skip -= 1
+            elif block_starts:
+                yield block_start
+                block_start = None
+            else:
+                yield offset, sz
+            offset += sz
+
+    def iter_raw(self, start=0):
+        """Iterate over the serialized records from record number `start`."""
+        if start:
+            if start >= len(self):
+                return iter(())
+            offset, skip = self._seek(start)
+        else:
+            offset, skip = HEADER_SIZE, 0
+
+        m = self._mmap
+        return (m[o:o + sz] for o, sz in self._iter_raw(offset, skip))
+
+    def _seek(self, n):
+        if self._blocks is None:
+            self._scan()
+
+        i = bisect.bisect_right(self._blocks, (n, float("inf"))) - 1
+        first, offset = self._blocks[i]
+        return offset, n - first
+
+    def _decode(self, offset, sz):
+        if PY3:
+            # released right away, or the mapping couldn't be closed
+            with memoryview(self._mmap) as view:
+                self._trans.setvalue(view[offset:offset + sz])
+        else:
+            # mmap has no memoryview on python 2
+            self._trans.setvalue(self._mmap[offset:offset + sz])
+        obj = self.thrift_class()
+        obj.read(self._proto)
+        return obj
+
+    def __iter__(self):
+        for offset, sz in self._iter_raw(HEADER_SIZE):
+            yield self._decode(offset, sz)
+
+    def __len__(self):
+        if self._count is None:
+            self._scan()
+        return self._count
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError("record number out of range")
+
+        offset, skip = self._seek(n)
+        return self._decode(*next(self._iter_raw(offset, skip)))
+
+    def close(self):
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._owned:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -5,6 +5,9 @@ Tracking support similar to twitter finagle-thrift.
 
 Note: When using tracking, every client should have a corresponding
 server processor.
+
+Calls made inside a `deadline` block carry their remaining time budget to
+the server, which skips the handler if the budget ran out before dispatch.
 """
 
 from __future__ import absolute_import
@@ -21,7 +24,7 @@ trace_thrift = load(os.path.join(os.path.dirname(__file__), "tracking.thrift"))
 
 
 __all__ = ["TTrackedClient", "TTrackedProcessor", "TrackerBase",
-           "ConsoleTracker"]
+           "ConsoleTracker", "BatchTracker", "deadline", "remaining_budget"]
 
 
 class TTrackedClient(TClient):
@@ -58,12 +61,18 @@ class TTrackedClient(TClient):
             self._iprot.read_message_end()
 
     def _send(self, _api, **kwargs):
+        self.send_start = int(time.time() * 1000)
+
         if self._upgraded:
             self._header = trace_thrift.RequestHeader()
             self.tracer.gen_header(self._header)
+            if self._header.budget == 0:
+                # the deadline is already exceeded, don't bother the server
+                raise TApplicationException(
+                    TApplicationException.INTERNAL_ERROR,
+                    "Deadline exceeded")
             self._header.write(self._oprot)
 
-        self.send_start = int(time.time() * 1000)
         super(TTrackedClient, self)._send(_api, **kwargs)
 
     def _req(self, _api, *args, **kwargs):
@@ -109,8 +118,25 @@ class TTrackedProcessor(TProcessor):
             self.tracer.handle(request_header)
             res = super(TTrackedProcessor, self).process_in(iprot)
 
+            if remaining_budget() == 0:
+                res = self._expire(*res)
+
         self._do_process(iprot, oprot, *res)
 
+    def _expire(self, api, seqid, result, call):
+        """The caller has already given up on the request, skip the handler
+        and reply with an exception instead of a result nobody will read.
+        """
+        if call is None:
+            return api, seqid, result, call
+
+        if result.oneway:
+            return api, seqid, result, lambda: None
+
+        exc = TApplicationException(TApplicationException.INTERNAL_ERROR,
+                                    "Deadline exceeded")
+        return api, seqid, exc, None
+
     def _try_upgrade(self, iprot):
         api, msg_type, seqid = iprot.read_message_begin()
         if msg_type == TMessageType.CALL and api == trace_method:
@@ -166,4 +192,6 @@ class TTrackedProcessor(TProcessor):
             self.send_result(oprot, api, result, seqid)
 
 
-from .tracker import TrackerBase, ConsoleTracker  # noqa
+from .tracker import (  # noqa
+    TrackerBase, ConsoleTracker, deadline, remaining_budget)
+from .exporter import BatchTracker  # noqa
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+Export of tracking records off the request path.
+
+`BatchTracker` buffers the records of the tracked calls in a bounded queue,
+and exports them in batches from a background thread, as soon as
+`batch_size` records are buffered or every `interval` seconds::
+
+    def send(data):
+        sock.sendto(data, collector_addr)
+
+    tracker = BatchTracker("client", "server", export=send)
+    client = TTrackedClient(tracker, service, proto)
+
+A batch is exported as a single buffer of the records serialized by
+`proto_factory`, the cython binary protocol when available, each preceded by
+its length, see `thriftpy.utils.deserialize_many`. When the queue is full,
+the new records are dropped and counted in `dropped`.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import logging
+import os
+import threading
+
+from ...protocol import TCyBinaryProtocolFactory
+from ...utils import serialize_many
+from .tracker import TrackerBase
+
+
+class BatchTracker(TrackerBase):
+    """Tracker exporting its records in batches from a background thread,
+    by calling `export`, or the `export` method of a subclass, with every
+    serialized batch.
+
+    The thread is started by the first record of every process, so the
+    tracker can be made before a server forks its workers. `close` exports
+    the records left and stops it.
+    """
+
+    def __init__(self, client=None, server=None, export=None, batch_size=100,
+                 interval=1.0, capacity=10000,
+                 proto_factory=TCyBinaryProtocolFactory()):
+        super(BatchTracker, self).__init__(client, server)
+
+        if batch_size < 1 or capacity < 1:
+            raise ValueError("batch_size and capacity must be positive")
+
+        if export is not None:
+            self.export = export
+        elif type(self).export == BatchTracker.export:
+            raise TypeError("BatchTracker needs an export callable or a "
+                            "subclass overriding export")
+        self.batch_size = batch_size
+        self.interval = interval
+        self.capacity = capacity
+        self.proto_factory = proto_factory
+
+        self.dropped = 0
+        self.exported = 0
+        self.batches = 0
+        self.errors = 0
+        self.closed = False
+
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._wakeup = None
+        self._thread = None
+        self._pid = None
+
+    def export(self, data):
+        """Export a serialized batch of records, called from the exporter
+        thread. To be overridden unless an `export` callable is given.
+        """
+        raise NotImplementedError
+
+    def record(self, header, exception):
+        if self._pid != os.getpid():
+            self._start()
+
+        buf = self._buffer
+        with self._lock:
+            if self.closed or len(buf) >= self.capacity:
+                self.dropped += 1
+                return
+            buf.append(header)
+            size = len(buf)
+
+        if size >= self.batch_size and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            # the records of the parent process are its own to export
+            self._buffer.clear()
+            self._export_lock = threading.Lock()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._wakeup,),
+                name="thriftpy-tracking-exporter")
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, wakeup):
+        while not self.closed:
+            wakeup.wait(self.interval)
+            wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Export the buffered records now."""
+        buf = self._buffer
+        with self._export_lock:
+            while buf:
+                batch = []
+                while buf and len(batch) < self.batch_size:
+                    batch.append(buf.popleft())
+                self._export(batch)
+
+    def _export(self, batch):
+        try:
+            self.export(serialize_many(batch, self.proto_factory,
+                                       length_prefixed=True))
+        except Exception:
+            self.errors += 1
+            logging.exception("Failed to export %d tracking records",
+                              len(batch))
+        else:
+            self.batches += 1
+            self.exported += len(batch)
+
+    def close(self):
+        """Stop the exporter thread and export the records left, records
+        made afterwards are dropped.
+        """
+        if self.closed:
+            return
+        self.closed = True
+
+        if self._pid == os.getpid():
+            self._wakeup.set()
+            self._thread.join()
+        self.flush()
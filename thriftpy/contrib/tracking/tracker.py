@@ -2,12 +2,44 @@
 
 from __future__ import absolute_import
 
+import contextlib
 import threading
+import time
 import uuid
 
 ctx = threading.local()
 
 
+@contextlib.contextmanager
+def deadline(ms):
+    """Limit the tracked calls made inside the block to `ms` milliseconds.
+
+    The deadline is propagated to the server as a time budget, nested calls
+    made by the server handler inherit what is left of it. A deadline can
+    only be shortened, never extended beyond the one of the current request.
+    """
+    prev = getattr(ctx, "deadline", None)
+    expire = time.time() + ms / 1000.0
+    if prev is not None:
+        expire = min(expire, prev)
+
+    ctx.deadline = expire
+    try:
+        yield
+    finally:
+        ctx.deadline = prev
+
+
+def remaining_budget():
+    """Return the time budget left for the current request in milliseconds,
+    or None if no deadline was set.
+    """
+    expire = getattr(ctx, "deadline", None)
+    if expire is None:
+        return None
+    return max(0, int((expire - time.time()) * 1000))
+
+
 class TrackerBase(object):
     def __init__(self, client=None, server=None):
         self.client = client
@@ -17,8 +49,14 @@ class TrackerBase(object):
         ctx.header = header
         ctx.counter = 0
 
+        if header.budget is None:
+            ctx.deadline = None
+        else:
+            ctx.deadline = time.time() + header.budget / 1000.0
+
     def gen_header(self, header):
         header.request_id = self.get_request_id()
+        header.budget = remaining_budget()
 
         if not hasattr(ctx, "header"):
             header.seq = '1'
@@ -18,6 +18,7 @@ struct RequestInfo {
 struct RequestHeader {
     1: string request_id
     2: string seq
+    3: optional i64 budget // remaining time budget in milliseconds
 }
 
 /**
@@ -4,19 +4,47 @@ from __future__ import absolute_import
 
 from .binary import TBinaryProtocol, TBinaryProtocolFactory
 from .json import TJSONProtocol, TJSONProtocolFactory
+from .apache_json import (
+    TApacheJSONProtocol, TApacheJSONProtocolFactory,
+    TSimpleJSONProtocol, TSimpleJSONProtocolFactory,
+)
+from .multiplex import TMultiplexedProtocol, TMultiplexedProtocolFactory
 
 from thriftpy._compat import PYPY, CYTHON
 if not PYPY:
     # enable cython binary by default for CPython.
     if CYTHON:
         from .cybin import TCyBinaryProtocol, TCyBinaryProtocolFactory
+        from .cyjson import (
+            TCyJSONProtocol, TCyJSONProtocolFactory,
+            TCyApacheJSONProtocol, TCyApacheJSONProtocolFactory,
+            TCySimpleJSONProtocol, TCySimpleJSONProtocolFactory,
+        )
         TBinaryProtocol = TCyBinaryProtocol  # noqa
         TBinaryProtocolFactory = TCyBinaryProtocolFactory  # noqa
+        TJSONProtocol = TCyJSONProtocol  # noqa
+        TJSONProtocolFactory = TCyJSONProtocolFactory  # noqa
+        TApacheJSONProtocol = TCyApacheJSONProtocol  # noqa
+        TApacheJSONProtocolFactory = TCyApacheJSONProtocolFactory  # noqa
+        TSimpleJSONProtocol = TCySimpleJSONProtocol  # noqa
+        TSimpleJSONProtocolFactory = TCySimpleJSONProtocolFactory  # noqa
 else:
     # disable cython binary protocol for PYPY since it's slower.
     TCyBinaryProtocol = TBinaryProtocol
     TCyBinaryProtocolFactory = TBinaryProtocolFactory
+    TCyJSONProtocol = TJSONProtocol
+    TCyJSONProtocolFactory = TJSONProtocolFactory
+    TCyApacheJSONProtocol = TApacheJSONProtocol
+    TCyApacheJSONProtocolFactory = TApacheJSONProtocolFactory
+    TCySimpleJSONProtocol = TSimpleJSONProtocol
+    TCySimpleJSONProtocolFactory = TSimpleJSONProtocolFactory
 
 __all__ = ['TBinaryProtocol', 'TBinaryProtocolFactory',
            'TCyBinaryProtocol', 'TCyBinaryProtocolFactory',
-           'TJSONProtocol', 'TJSONProtocolFactory']
+           'TJSONProtocol', 'TJSONProtocolFactory',
+           'TCyJSONProtocol', 'TCyJSONProtocolFactory',
+           'TApacheJSONProtocol', 'TApacheJSONProtocolFactory',
+           'TCyApacheJSONProtocol', 'TCyApacheJSONProtocolFactory',
+           'TSimpleJSONProtocol', 'TSimpleJSONProtocolFactory',
+           'TCySimpleJSONProtocol', 'TCySimpleJSONProtocolFactory',
+           'TMultiplexedProtocol', 'TMultiplexedProtocolFactory']
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+
+"""
+The JSON protocols of Apache Thrift.
+
+`TApacheJSONProtocol` speaks the JSON protocol of the other Thrift
+implementations, in which fields are keyed by id and values tagged with
+their type::
+
+    [1,"ping",1,0,{"1":{"str":"hello"},"2":{"lst":["i32",2,4,8]}}]
+
+`TSimpleJSONProtocol` writes plain JSON keyed by field names instead, for
+readers that don't know about thrift, and can't read it back.
+
+Neither has a length prefix, a message is read from the transport up to the
+end of its JSON value. Strings and binaries being the same type here, binary
+fields are written as strings rather than base64, so they must be valid
+UTF-8, other bytes raise TProtocolException.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+from ..thrift import TType
+from .exc import TProtocolException
+from .json import unpack_field_spec
+
+VERSION = 1
+
+TYPE_NAMES = {
+    TType.BOOL: "tf",
+    TType.BYTE: "i8",
+    TType.I16: "i16",
+    TType.I32: "i32",
+    TType.I64: "i64",
+    TType.DOUBLE: "dbl",
+    TType.STRING: "str",
+    TType.STRUCT: "rec",
+    TType.MAP: "map",
+    TType.LIST: "lst",
+    TType.SET: "set",
+}
+NAME_TYPES = dict((v, k) for k, v in TYPE_NAMES.items())
+
+INTEGER = (TType.BYTE, TType.I16, TType.I32, TType.I64)
+
+QUOTE, BACKSLASH = ord('"'), ord("\\")
+OPENING, CLOSING = (ord("{"), ord("[")), (ord("}"), ord("]"))
+
+SPECIAL_FLOATS = {
+    float("inf"): "Infinity",
+    float("-inf"): "-Infinity",
+}
+
+
+def invalid(msg):
+    return TProtocolException(TProtocolException.INVALID_DATA, msg)
+
+
+def write_only():
+    return TProtocolException(TProtocolException.NOT_IMPLEMENTED,
+                              "TSimpleJSONProtocol is write only")
+
+
+def type_spec(spec):
+    """Return (ttype, type spec) of a container element spec."""
+    if isinstance(spec, int):
+        return spec, None
+    return spec[0], spec[1]
+
+
+def read_json(trans):
+    """Read a whole JSON object or array from `trans`.
+
+    Nothing after it may be consumed and transports wait for as many bytes
+    as they are asked for, so it is read in chunks of what the value needs
+    at least to be complete, a closing byte for every open array, object
+    and string.
+    """
+    read = trans.read
+    c = read(1)
+    while c.isspace():
+        c = read(1)
+    if c not in (b"{", b"["):
+        raise invalid("Expected a JSON object or array")
+
+    data = [c]
+    depth, in_string, escaped = 1, False, False
+    while depth:
+        chunk = read(depth + in_string + escaped)
+        if not chunk:
+            raise invalid("Unexpected end of data")
+        data.append(chunk)
+
+        for c in bytearray(chunk):
+            if escaped:
+                escaped = False
+            elif in_string:
+                if c == BACKSLASH:
+                    escaped = True
+                elif c == QUOTE:
+                    in_string = False
+            elif c == QUOTE:
+                in_string = True
+            elif c in OPENING:
+                depth += 1
+            elif c in CLOSING:
+                depth -= 1
+
+    try:
+        return json.loads(b"".join(data).decode("utf-8"))
+    except ValueError as e:
+        raise invalid("Bad JSON: %s" % e)
+
+
+def write_json(trans, data):
+    trans.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+
+def text(val):
+    if not isinstance(val, bytes):
+        return val
+    try:
+        return val.decode("utf-8")
+    except UnicodeDecodeError:
+        raise invalid("Binary data isn't UTF-8 and can't be written as a "
+                      "JSON string")
+
+
+def number(ttype, val):
+    """Return a bool, number or double as written, NaN and infinities as
+    strings.
+    """
+    if ttype == TType.BOOL:
+        return 1 if val else 0
+    if ttype == TType.DOUBLE:
+        val = float(val)
+        if val != val:
+            return "NaN"
+        return SPECIAL_FLOATS.get(val, val)
+    return val
+
+
+def key_to_json(ttype, val):
+    """Return a map key as a string, JSON object keys being strings."""
+    if ttype == TType.STRING:
+        return text(val)
+    if ttype in INTEGER or ttype == TType.BOOL:
+        return str(number(ttype, val))
+    if ttype == TType.DOUBLE:
+        val = number(ttype, val)
+        return val if isinstance(val, str) else repr(val)
+    raise invalid("Can't write a map key of type %d" % ttype)
+
+
+def key_to_obj(ttype, val):
+    if ttype == TType.STRING:
+        return val
+    if ttype in INTEGER:
+        return int(val)
+    if ttype == TType.BOOL:
+        return int(val) != 0
+    if ttype == TType.DOUBLE:
+        return float(val)
+    raise invalid("Can't read a map key of type %d" % ttype)
+
+
+def json_value(ttype, val, spec=None):
+    if ttype == TType.STRING:
+        return text(val)
+
+    if ttype == TType.STRUCT:
+        return struct_to_json(val)
+
+    if ttype in (TType.SET, TType.LIST):
+        e_type, e_spec = type_spec(spec)
+        res = [TYPE_NAMES[e_type], len(val)]
+        res.extend(json_value(e_type, v, e_spec) for v in val)
+        return res
+
+    if ttype == TType.MAP:
+        k_type, k_spec = type_spec(spec[0])
+        v_type, v_spec = type_spec(spec[1])
+        return [TYPE_NAMES[k_type], TYPE_NAMES[v_type], len(val),
+                dict((key_to_json(k_type, k), json_value(v_type, v, v_spec))
+                     for k, v in val.items())]
+
+    return number(ttype, val)
+
+
+def obj_value(ttype, val, spec=None):
+    if ttype in INTEGER:
+        return int(val)
+
+    if ttype == TType.DOUBLE:
+        return float(val)
+
+    if ttype == TType.BOOL:
+        return bool(val)
+
+    if ttype == TType.STRING:
+        return val
+
+    if ttype == TType.STRUCT:
+        return struct_to_obj(val, spec())
+
+    if ttype in (TType.SET, TType.LIST):
+        e_type, e_spec = type_spec(spec)
+        if NAME_TYPES.get(val[0]) != e_type:
+            return []
+        return [obj_value(e_type, v, e_spec) for v in val[2:]]
+
+    if ttype == TType.MAP:
+        k_type, k_spec = type_spec(spec[0])
+        v_type, v_spec = type_spec(spec[1])
+        if NAME_TYPES.get(val[0]) != k_type or \
+                NAME_TYPES.get(val[1]) != v_type:
+            return {}
+        return dict((key_to_obj(k_type, k), obj_value(v_type, v, v_spec))
+                    for k, v in val[3].items())
+
+
+def struct_to_json(val):
+    outobj = {}
+    for fid, field_spec in val.thrift_spec.items():
+        field_type, field_name, field_type_spec = \
+            unpack_field_spec(field_spec)
+
+        v = getattr(val, field_name)
+        if v is None:
+            continue
+
+        outobj[str(fid)] = {
+            TYPE_NAMES[field_type]: json_value(field_type, v, field_type_spec)}
+
+    return outobj
+
+
+def struct_to_obj(val, obj):
+    for fid, field in val.items():
+        (type_name, v), = field.items()
+        if type_name not in NAME_TYPES:
+            raise invalid("Unknown type %r" % type_name)
+
+        field_spec = obj.thrift_spec.get(int(fid))
+        if field_spec is None:
+            continue
+
+        field_type, field_name, field_type_spec = \
+            unpack_field_spec(field_spec)
+        # fields of another type are skipped, like the binary protocol does
+        if NAME_TYPES[type_name] != field_type:
+            continue
+
+        setattr(obj, field_name, obj_value(field_type, v, field_type_spec))
+
+    return obj
+
+
+def simple_value(ttype, val, spec=None):
+    if ttype == TType.STRING:
+        return text(val)
+
+    if ttype == TType.STRUCT:
+        return struct_to_simple(val)
+
+    if ttype in (TType.SET, TType.LIST):
+        e_type, e_spec = type_spec(spec)
+        return [simple_value(e_type, v, e_spec) for v in val]
+
+    if ttype == TType.MAP:
+        k_type, k_spec = type_spec(spec[0])
+        v_type, v_spec = type_spec(spec[1])
+        return dict((key_to_json(k_type, k), simple_value(v_type, v, v_spec))
+                    for k, v in val.items())
+
+    return number(ttype, val)
+
+
+def struct_to_simple(val):
+    outobj = {}
+    for fid, field_spec in val.thrift_spec.items():
+        field_type, field_name, field_type_spec = \
+            unpack_field_spec(field_spec)
+
+        v = getattr(val, field_name)
+        if v is None:
+            continue
+
+        outobj[field_name] = simple_value(field_type, v, field_type_spec)
+
+    return outobj
+
+
+class TApacheJSONProtocol(object):
+    """The JSON protocol of Apache Thrift.
+
+    A message is a JSON array of the version, name, type and seqid of the
+    message followed by its struct, a struct alone is a JSON object.
+    """
+
+    def __init__(self, trans):
+        self.trans = trans
+        self._message = None
+        self._payload = None
+
+    def read_message_begin(self):
+        message = read_json(self.trans)
+        if not isinstance(message, list) or len(message) < 5:
+            raise invalid("Bad message")
+
+        version = message[0]
+        if version != VERSION:
+            raise TProtocolException(
+                type=TProtocolException.BAD_VERSION,
+                message="Bad version in read_message_begin:{}".format(version))
+
+        name, ttype, seqid, self._payload = message[1:5]
+        return name, ttype, seqid
+
+    def read_message_end(self):
+        self._payload = None
+
+    def write_message_begin(self, name, ttype, seqid):
+        self._message = [VERSION, name, ttype, seqid]
+
+    def write_message_end(self):
+        pass
+
+    def read_struct(self, obj):
+        if self._payload is None:
+            data = read_json(self.trans)
+        else:
+            data, self._payload = self._payload, None
+
+        try:
+            return struct_to_obj(data, obj)
+        except (AttributeError, IndexError, TypeError, ValueError) as e:
+            raise invalid("Bad struct: %s" % e)
+
+    def write_struct(self, obj):
+        data = struct_to_json(obj)
+        if self._message is not None:
+            data, self._message = self._message + [data], None
+        write_json(self.trans, data)
+
+    def skip(self, ttype):
+        if self._payload is None:
+            read_json(self.trans)
+        self._payload = None
+
+
+class TApacheJSONProtocolFactory(object):
+    def get_protocol(self, trans):
+        return TApacheJSONProtocol(trans)
+
+
+class TSimpleJSONProtocol(object):
+    """The write only simple JSON protocol of Apache Thrift.
+
+    Structs and maps are written as JSON objects, keyed by field name for
+    structs, lists and sets as arrays. A message is a JSON array of its
+    name, type and seqid followed by its struct.
+    """
+
+    def __init__(self, trans):
+        self.trans = trans
+        self._message = None
+
+    def read_message_begin(self):
+        raise write_only()
+
+    def read_message_end(self):
+        raise write_only()
+
+    def write_message_begin(self, name, ttype, seqid):
+        self._message = [name, ttype, seqid]
+
+    def write_message_end(self):
+        pass
+
+    def read_struct(self, obj):
+        raise write_only()
+
+    def write_struct(self, obj):
+        data = struct_to_simple(obj)
+        if self._message is not None:
+            data, self._message = self._message + [data], None
+        write_json(self.trans, data)
+
+
+class TSimpleJSONProtocolFactory(object):
+    def get_protocol(self, trans):
+        return TSimpleJSONProtocol(trans)
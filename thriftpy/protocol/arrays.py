@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+Numeric lists as arrays.
+
+list<i16>, list<i32>, list<i64> and list<double> values are decoded in bulk
+into numpy arrays, or into array.array when numpy isn't installed, and such
+arrays are encoded with a single byteswap instead of value by value.
+"""
+
+from __future__ import absolute_import
+
+import array
+import sys
+
+from ..thrift import TType
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _typecode(codes, size):
+    for code in codes:
+        if array.array(code).itemsize == size:
+            return code
+
+
+# ttype -> (width, numpy wire dtype, numpy kind, array.array typecode)
+NUMERIC = {
+    TType.I16: (2, ">i2", "i", _typecode("hi", 2)),
+    TType.I32: (4, ">i4", "i", _typecode("ilh", 4)),
+    TType.I64: (8, ">i8", "i", _typecode("lq", 8)),
+    TType.DOUBLE: (8, ">f8", "f", _typecode("d", 8)),
+}
+
+
+def decode_array(ttype, data):
+    """Return the big endian values of `ttype` in `data` as an array in
+    native byte order.
+    """
+    width, dtype, kind, typecode = NUMERIC[ttype]
+
+    if numpy is not None:
+        dtype = numpy.dtype(dtype)
+        return numpy.frombuffer(data, dtype).astype(dtype.newbyteorder("="))
+
+    arr = array.array(typecode)
+    if hasattr(arr, "frombytes"):
+        arr.frombytes(data)
+    else:
+        arr.fromstring(data)
+    if LITTLE_ENDIAN:
+        arr.byteswap()
+    return arr
+
+
+def encode_array(ttype, val):
+    """Return the values of `val` as big endian bytes, or None if `val`
+    isn't an array matching `ttype`.
+    """
+    width, dtype, kind, typecode = NUMERIC[ttype]
+
+    if numpy is not None and isinstance(val, numpy.ndarray):
+        if val.ndim != 1 or val.dtype.kind != kind or \
+                val.dtype.itemsize != width:
+            return None
+        return val.astype(dtype, copy=False).tobytes()
+
+    if isinstance(val, array.array) and val.typecode == typecode:
+        if LITTLE_ENDIAN:
+            val = val[:]
+            val.byteswap()
+        return val.tobytes() if hasattr(val, "tobytes") else val.tostring()
+
+    return None
+
+
+def to_array(ttype, values):
+    """Return a sequence of numbers of `ttype` as an array."""
+    typecode = NUMERIC[ttype][3]
+    if numpy is not None:
+        dtype = numpy.dtype(NUMERIC[ttype][1]).newbyteorder("=")
+        return numpy.array(values, dtype)
+    return array.array(typecode, values)
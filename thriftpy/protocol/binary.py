@@ -4,8 +4,10 @@ from __future__ import absolute_import
 
 import struct
 
-from ..thrift import TType
+from ..thrift import TSizedIterator, TType
 
+from .arrays import NUMERIC, decode_array, encode_array
+from .columns import empty_columns, finish_columns, struct_spec
 from .exc import TProtocolException
 
 # VERSION_MASK = 0xffff0000
@@ -86,6 +88,31 @@ def write_map_begin(outbuf, ktype, vtype, size):
     outbuf.write(pack_i8(ktype) + pack_i8(vtype) + pack_i32(size))
 
 
+def write_sized(outbuf, val, e_type, e_spec, v_type=None, v_spec=None):
+    """Write the elements of a TSizedIterator, or its (key, value) pairs
+    with a `v_type`, flushing the transport every `chunk_size` elements
+    unless it's framed, a flush closing the frame in the middle of the
+    message there. Once a part of the message is sent, an error closes the
+    transport, the connection being unusable.
+    """
+    chunk_size = 0 if getattr(outbuf, "framed", False) else val.chunk_size
+    n = 0
+    try:
+        for e_val in val:
+            if v_type is None:
+                write_val(outbuf, e_type, e_val, e_spec)
+            else:
+                write_val(outbuf, e_type, e_val[0], e_spec)
+                write_val(outbuf, v_type, e_val[1], v_spec)
+            n += 1
+            if chunk_size and n % chunk_size == 0:
+                outbuf.flush()
+    except Exception:
+        if chunk_size and n >= chunk_size:
+            outbuf.close()
+        raise
+
+
 def write_val(outbuf, ttype, val, spec=None):
     if ttype == TType.BOOL:
         if val:
@@ -120,9 +147,19 @@ def write_val(outbuf, ttype, val, spec=None):
             e_type, t_spec = spec, None
 
         val_len = len(val)
+        if e_type in NUMERIC:
+            data = encode_array(e_type, val)
+            if data is not None:
+                write_list_begin(outbuf, e_type, val_len)
+                outbuf.write(data)
+                return
+
         write_list_begin(outbuf, e_type, val_len)
-        for e_val in val:
-            write_val(outbuf, e_type, e_val, t_spec)
+        if isinstance(val, TSizedIterator):
+            write_sized(outbuf, val, e_type, t_spec)
+        else:
+            for e_val in val:
+                write_val(outbuf, e_type, e_val, t_spec)
 
     elif ttype == TType.MAP:
         if isinstance(spec[0], int):
@@ -138,9 +175,12 @@ def write_val(outbuf, ttype, val, spec=None):
             v_type, v_spec = spec[1]
 
         write_map_begin(outbuf, k_type, v_type, len(val))
-        for k in iter(val):
-            write_val(outbuf, k_type, k, k_spec)
-            write_val(outbuf, v_type, val[k], v_spec)
+        if isinstance(val, TSizedIterator):
+            write_sized(outbuf, val, k_type, k_spec, v_type, v_spec)
+        else:
+            for k, v in val.items():
+                write_val(outbuf, k_type, k, k_spec)
+                write_val(outbuf, v_type, v, v_spec)
 
     elif ttype == TType.STRUCT:
         for fid in iter(val.thrift_spec):
@@ -205,7 +245,7 @@ def read_map_begin(inbuf):
     return k_type, v_type, sz
 
 
-def read_val(inbuf, ttype, spec=None):
+def read_val(inbuf, ttype, spec=None, decode_arrays=False):
     if ttype == TType.BOOL:
         return bool(unpack_i8(inbuf.read(1)))
 
@@ -247,8 +287,13 @@ def read_val(inbuf, ttype, spec=None):
                 skip(inbuf, r_type)
             return []
 
+        if decode_arrays and ttype == TType.LIST and v_type in NUMERIC:
+            # a negative size is an empty list, as element by element
+            return decode_array(v_type,
+                                inbuf.read(max(sz, 0) * NUMERIC[v_type][0]))
+
         for i in range(sz):
-            result.append(read_val(inbuf, v_type, v_spec))
+            result.append(read_val(inbuf, v_type, v_spec, decode_arrays))
         return result
 
     elif ttype == TType.MAP:
@@ -273,19 +318,19 @@ def read_val(inbuf, ttype, spec=None):
             return {}
 
         for i in range(sz):
-            k_val = read_val(inbuf, k_type, k_spec)
-            v_val = read_val(inbuf, v_type, v_spec)
+            k_val = read_val(inbuf, k_type, k_spec, decode_arrays)
+            v_val = read_val(inbuf, v_type, v_spec, decode_arrays)
             result[k_val] = v_val
 
         return result
 
     elif ttype == TType.STRUCT:
         obj = spec()
-        read_struct(inbuf, obj)
+        read_struct(inbuf, obj, decode_arrays)
         return obj
 
 
-def read_struct(inbuf, obj):
+def read_struct(inbuf, obj, decode_arrays=False):
     while True:
         f_type, fid = read_field_begin(inbuf)
         if f_type == TType.STOP:
@@ -307,7 +352,161 @@ def read_struct(inbuf, obj):
             skip(inbuf, f_type)
             continue
 
-        setattr(obj, f_name, read_val(inbuf, f_type, f_container_spec))
+        setattr(obj, f_name, read_val(inbuf, f_type, f_container_spec,
+                                      decode_arrays))
+
+
+def iter_val(inbuf, ttype, spec, decode_arrays=False):
+    """Yield the elements of a list or set, or the (key, value) pairs of a
+    map, as they are read.
+    """
+    if ttype == TType.SET or ttype == TType.LIST:
+        if isinstance(spec, tuple):
+            v_type, v_spec = spec[0], spec[1]
+        else:
+            v_type, v_spec = spec, None
+
+        r_type, sz = read_list_begin(inbuf)
+        if r_type != v_type:
+            for _ in range(sz):
+                skip(inbuf, r_type)
+            return
+
+        for i in range(sz):
+            yield read_val(inbuf, v_type, v_spec, decode_arrays)
+
+    elif ttype == TType.MAP:
+        if isinstance(spec[0], int):
+            k_type, k_spec = spec[0], None
+        else:
+            k_type, k_spec = spec[0]
+
+        if isinstance(spec[1], int):
+            v_type, v_spec = spec[1], None
+        else:
+            v_type, v_spec = spec[1]
+
+        sk_type, sv_type, sz = read_map_begin(inbuf)
+        if sk_type != k_type or sv_type != v_type:
+            for _ in range(sz):
+                skip(inbuf, sk_type)
+                skip(inbuf, sv_type)
+            return
+
+        for i in range(sz):
+            k_val = read_val(inbuf, k_type, k_spec, decode_arrays)
+            yield k_val, read_val(inbuf, v_type, v_spec, decode_arrays)
+
+    else:
+        raise TypeError("Can't iterate over a value of type %d" % ttype)
+
+
+def iter_struct(inbuf, obj, name, decode_arrays=False):
+    """Read `obj`, yielding the elements of its container field `name` one
+    at a time instead of building the container.
+
+    The other fields are set on `obj`, those following the streamed field
+    once the iteration is over.
+    """
+    while True:
+        f_type, fid = read_field_begin(inbuf)
+        if f_type == TType.STOP:
+            break
+
+        if fid not in obj.thrift_spec:
+            skip(inbuf, f_type)
+            continue
+
+        if len(obj.thrift_spec[fid]) == 3:
+            sf_type, f_name, f_req = obj.thrift_spec[fid]
+            f_container_spec = None
+        else:
+            sf_type, f_name, f_container_spec, f_req = obj.thrift_spec[fid]
+
+        if f_type != sf_type:
+            skip(inbuf, f_type)
+            continue
+
+        if f_name == name:
+            for val in iter_val(inbuf, f_type, f_container_spec,
+                                decode_arrays):
+                yield val
+        else:
+            setattr(obj, f_name, read_val(inbuf, f_type, f_container_spec,
+                                          decode_arrays))
+
+
+def read_columns(inbuf, ttype, spec, decode_arrays=False):
+    """Read a list or set of structs into columns, a dict mapping the name
+    of every field of the struct to the list of its values, without
+    building the structs.
+
+    With `decode_arrays`, the columns of numeric fields without missing
+    values are arrays.
+    """
+    cls = struct_spec(ttype, spec)
+    if cls is None:
+        raise TypeError("Can't read a value of type %d into columns" % ttype)
+
+    r_type, sz = read_list_begin(inbuf)
+    if r_type != TType.STRUCT:
+        for _ in range(sz):
+            skip(inbuf, r_type)
+        return empty_columns(cls, 0)
+
+    columns = empty_columns(cls, sz)
+    fields = {}
+    for fid, f_spec in cls.thrift_spec.items():
+        f_container_spec = f_spec[2] if len(f_spec) == 4 else None
+        fields[fid] = (f_spec[0], f_container_spec, columns[f_spec[1]])
+
+    for i in range(sz):
+        while True:
+            f_type, fid = read_field_begin(inbuf)
+            if f_type == TType.STOP:
+                break
+
+            field = fields.get(fid)
+            if field is None or field[0] != f_type:
+                skip(inbuf, f_type)
+                continue
+
+            field[2][i] = read_val(inbuf, f_type, field[1], decode_arrays)
+
+    return finish_columns(cls, columns, decode_arrays)
+
+
+def read_struct_columns(inbuf, obj, name, decode_arrays=False):
+    """Read `obj`, returning its list of structs field `name` as columns,
+    see `read_columns`. The other fields are set on `obj`.
+    """
+    columns = None
+    while True:
+        f_type, fid = read_field_begin(inbuf)
+        if f_type == TType.STOP:
+            break
+
+        if fid not in obj.thrift_spec:
+            skip(inbuf, f_type)
+            continue
+
+        if len(obj.thrift_spec[fid]) == 3:
+            sf_type, f_name, f_req = obj.thrift_spec[fid]
+            f_container_spec = None
+        else:
+            sf_type, f_name, f_container_spec, f_req = obj.thrift_spec[fid]
+
+        if f_type != sf_type:
+            skip(inbuf, f_type)
+            continue
+
+        if f_name == name:
+            columns = read_columns(inbuf, f_type, f_container_spec,
+                                   decode_arrays)
+        else:
+            setattr(obj, f_name, read_val(inbuf, f_type, f_container_spec,
+                                          decode_arrays))
+    return columns
 
 
 def skip(inbuf, ftype):
@@ -349,12 +548,18 @@ def skip(inbuf, ftype):
 
 
 class TBinaryProtocol(object):
-    """Binary implementation of the Thrift protocol driver."""
+    """Binary implementation of the Thrift protocol driver.
 
-    def __init__(self, trans, strict_read=True, strict_write=True):
+    With `decode_arrays`, numeric lists are decoded into arrays, see
+    `thriftpy.protocol.arrays`.
+    """
+
+    def __init__(self, trans, strict_read=True, strict_write=True,
+                 decode_arrays=False):
         self.trans = trans
         self.strict_read = strict_read
         self.strict_write = strict_write
+        self.decode_arrays = decode_arrays
 
     def skip(self, ttype):
         skip(self.trans, ttype)
@@ -375,16 +580,25 @@ class TBinaryProtocol(object):
         pass
 
     def read_struct(self, obj):
-        return read_struct(self.trans, obj)
+        return read_struct(self.trans, obj, self.decode_arrays)
+
+    def iter_struct(self, obj, name):
+        return iter_struct(self.trans, obj, name, self.decode_arrays)
+
+    def read_struct_columns(self, obj, name):
+        return read_struct_columns(self.trans, obj, name, self.decode_arrays)
 
     def write_struct(self, obj):
         write_val(self.trans, TType.STRUCT, obj)
 
 
 class TBinaryProtocolFactory(object):
-    def __init__(self, strict_read=True, strict_write=True):
+    def __init__(self, strict_read=True, strict_write=True,
+                 decode_arrays=False):
         self.strict_read = strict_read
         self.strict_write = strict_write
+        self.decode_arrays = decode_arrays
 
     def get_protocol(self, trans):
-        return TBinaryProtocol(trans, self.strict_read, self.strict_write)
+        return TBinaryProtocol(trans, self.strict_read, self.strict_write,
+                               self.decode_arrays)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lists of structs as columns.
+
+A list<SomeStruct> can be decoded into a dict mapping the name of every field
+of SomeStruct to the list of its values, one per element, without building
+the structs. Missing fields take their default value, so all the columns have
+the same length.
+"""
+
+from __future__ import absolute_import
+
+from ..thrift import TType
+from .arrays import NUMERIC, to_array
+
+
+def struct_spec(ttype, spec):
+    """Return the struct class of a list or set of structs, or None."""
+    if ttype != TType.LIST and ttype != TType.SET:
+        return None
+    if not isinstance(spec, tuple) or spec[0] != TType.STRUCT:
+        return None
+    return spec[1]
+
+
+def empty_columns(cls, size):
+    """Return the columns of `size` structs of `cls`, filled with the
+    default values of their fields.
+    """
+    default = cls()
+    columns = {}
+    for fid in sorted(cls.thrift_spec):
+        name = cls.thrift_spec[fid][1]
+        columns[name] = [getattr(default, name, None)] * size
+    return columns
+
+
+def finish_columns(cls, columns, decode_arrays):
+    """With `decode_arrays`, turn the columns of numeric fields without
+    missing values into arrays.
+    """
+    if decode_arrays:
+        for spec in cls.thrift_spec.values():
+            values = columns[spec[1]]
+            if spec[0] in NUMERIC and None not in values:
+                columns[spec[1]] = to_array(spec[0], values)
+    return columns
+
+
+def to_columns(cls, objs, decode_arrays=False):
+    """Return the columns of already decoded structs of `cls`."""
+    objs = list(objs or ())
+    columns = empty_columns(cls, 0)
+    for name in columns:
+        columns[name] = [getattr(obj, name) for obj in objs]
+    return finish_columns(cls, columns, decode_arrays)
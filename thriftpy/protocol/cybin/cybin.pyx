@@ -1,8 +1,14 @@
-from libc.stdlib cimport free, malloc
 from libc.stdint cimport int16_t, int32_t, int64_t
 from cpython cimport bool
 
 from thriftpy.transport.cybase cimport CyTransportBase, STACK_STRING_LEN
+from thriftpy.thrift import TSizedIterator
+from thriftpy.protocol.arrays import NUMERIC, decode_array, encode_array
+from thriftpy.protocol.columns import (
+    empty_columns,
+    finish_columns,
+    struct_spec,
+)
 
 cdef extern from "endian_port.h":
     int16_t htobe16(int16_t n)
@@ -41,6 +47,11 @@ class ProtocolError(Exception):
     pass
 
 
+cdef inline bint is_numeric(TType ttype):
+    return ttype == T_I16 or ttype == T_I32 or ttype == T_I64 or \
+        ttype == T_DOUBLE
+
+
 cdef inline char read_i08(CyTransportBase buf) except? -1:
     cdef char data
     buf.c_read(1, &data)
@@ -94,7 +105,7 @@ cdef inline int write_double(CyTransportBase buf, double val) except -1:
     return 0
 
 
-cdef inline read_struct(CyTransportBase buf, obj):
+cdef inline read_struct(CyTransportBase buf, obj, bint decode_arrays):
     cdef dict field_specs = obj.thrift_spec
     cdef int fid
     cdef TType field_type, ttype
@@ -123,7 +134,7 @@ cdef inline read_struct(CyTransportBase buf, obj):
         else:
             spec = field_spec[2]
 
-        setattr(obj, name, c_read_val(buf, ttype, spec))
+        setattr(obj, name, c_read_val(buf, ttype, spec, decode_arrays))
 
     return obj
 
@@ -157,11 +168,10 @@ cdef inline write_struct(CyTransportBase buf, obj):
 cdef inline c_read_string(CyTransportBase buf, int32_t size):
     cdef char string_val[STACK_STRING_LEN]
 
-    if size > STACK_STRING_LEN:
-        data = <char*>malloc(size)
-        buf.c_read(size, data)
-        py_data = data[:size]
-        free(data)
+    if size < 0:
+        raise ProtocolError("Invalid string size %d" % size)
+    elif size > STACK_STRING_LEN:
+        py_data = buf.get_string(size)
     else:
         buf.c_read(size, string_val)
         py_data = string_val[:size]
@@ -172,7 +182,7 @@ cdef inline c_read_string(CyTransportBase buf, int32_t size):
         return py_data
 
 
-cdef c_read_val(CyTransportBase buf, TType ttype, spec=None):
+cdef c_read_val(CyTransportBase buf, TType ttype, spec, bint decode_arrays):
     cdef int size
     cdef int64_t n
     cdef TType v_type, k_type, orig_type, orig_key_type
@@ -216,7 +226,13 @@ cdef c_read_val(CyTransportBase buf, TType ttype, spec=None):
                 skip(buf, orig_type)
             return []
 
-        return [c_read_val(buf, v_type, v_spec) for _ in range(size)]
+        if decode_arrays and ttype == T_LIST and is_numeric(v_type):
+            # a negative size is an empty list, as element by element
+            data = buf.get_string(max(size, 0) * NUMERIC[v_type][0])
+            return decode_array(v_type, data)
+
+        return [c_read_val(buf, v_type, v_spec, decode_arrays)
+                for _ in range(size)]
 
     elif ttype == T_MAP:
         key = spec[0]
@@ -245,11 +261,41 @@ cdef c_read_val(CyTransportBase buf, TType ttype, spec=None):
                 skip(buf, orig_type)
             return {}
 
-        return {c_read_val(buf, k_type, k_spec): c_read_val(buf, v_type, v_spec)
+        return {c_read_val(buf, k_type, k_spec, decode_arrays):
+                c_read_val(buf, v_type, v_spec, decode_arrays)
                 for _ in range(size)}
 
     elif ttype == T_STRUCT:
-        return read_struct(buf, spec())
+        return read_struct(buf, spec(), decode_arrays)
+
+
+cdef write_sized(CyTransportBase buf, val, TType e_type, e_spec,
+                 int v_type=-1, v_spec=None):
+    """Write the elements of a TSizedIterator, or its (key, value) pairs
+    with a `v_type`, flushing the transport every `chunk_size` elements
+    unless it's framed, a flush closing the frame in the middle of the
+    message there. Once a part of the message is sent, an error closes the
+    transport, the connection being unusable.
+    """
+    cdef Py_ssize_t chunk_size = 0, n = 0
+
+    if not buf.framed and val.chunk_size:
+        chunk_size = val.chunk_size
+
+    try:
+        for e_val in val:
+            if v_type < 0:
+                c_write_val(buf, e_type, e_val, e_spec)
+            else:
+                c_write_val(buf, e_type, e_val[0], e_spec)
+                c_write_val(buf, <TType>v_type, e_val[1], v_spec)
+            n += 1
+            if chunk_size and n % chunk_size == 0:
+                buf.c_flush()
+    except Exception:
+        if chunk_size and n >= chunk_size:
+            buf.close()
+        raise
 
 
 cdef c_write_val(CyTransportBase buf, TType ttype, val, spec=None):
@@ -292,11 +338,22 @@ cdef c_write_val(CyTransportBase buf, TType ttype, val, spec=None):
             e_spec = spec[1]
 
         val_len = len(val)
+        if is_numeric(e_type):
+            data = encode_array(e_type, val)
+            if data is not None:
+                write_i08(buf, e_type)
+                write_i32(buf, val_len)
+                buf.c_write(<char*>data, len(data))
+                return
+
         write_i08(buf, e_type)
         write_i32(buf, val_len)
 
-        for e_val in val:
-            c_write_val(buf, e_type, e_val, e_spec)
+        if isinstance(val, TSizedIterator):
+            write_sized(buf, val, e_type, e_spec)
+        else:
+            for e_val in val:
+                c_write_val(buf, e_type, e_val, e_spec)
 
     elif ttype == T_MAP:
         key = spec[0]
@@ -321,9 +378,12 @@ cdef c_write_val(CyTransportBase buf, TType ttype, val, spec=None):
         write_i08(buf, v_type)
         write_i32(buf, val_len)
 
-        for k, v in val.items():
-            c_write_val(buf, k_type, k, k_spec)
-            c_write_val(buf, v_type, v, v_spec)
+        if isinstance(val, TSizedIterator):
+            write_sized(buf, val, k_type, k_spec, v_type, v_spec)
+        else:
+            for k, v in val.items():
+                c_write_val(buf, k_type, k, k_spec)
+                c_write_val(buf, v_type, v, v_spec)
 
     elif ttype == T_STRUCT:
         write_struct(buf, val)
@@ -365,8 +425,178 @@ cpdef skip(CyTransportBase buf, TType ttype):
             skip(buf, f_type)
 
 
+def iter_val(CyTransportBase buf, TType ttype, spec, bint decode_arrays):
+    cdef int i, size
+    cdef TType v_type, k_type, orig_type, orig_key_type
+
+    if ttype == T_SET or ttype == T_LIST:
+        if isinstance(spec, int):
+            v_type = spec
+            v_spec = None
+        else:
+            v_type = spec[0]
+            v_spec = spec[1]
+
+        orig_type = <TType>read_i08(buf)
+        size = read_i32(buf)
+
+        if orig_type != v_type:
+            for i in range(size):
+                skip(buf, orig_type)
+            return
+
+        for i in range(size):
+            yield c_read_val(buf, v_type, v_spec, decode_arrays)
+
+    elif ttype == T_MAP:
+        key = spec[0]
+        if isinstance(key, int):
+            k_type = key
+            k_spec = None
+        else:
+            k_type = key[0]
+            k_spec = key[1]
+
+        value = spec[1]
+        if isinstance(value, int):
+            v_type = value
+            v_spec = None
+        else:
+            v_type = value[0]
+            v_spec = value[1]
+
+        orig_key_type = <TType>read_i08(buf)
+        orig_type = <TType>read_i08(buf)
+        size = read_i32(buf)
+
+        if orig_key_type != k_type or orig_type != v_type:
+            for i in range(size):
+                skip(buf, orig_key_type)
+                skip(buf, orig_type)
+            return
+
+        for i in range(size):
+            k = c_read_val(buf, k_type, k_spec, decode_arrays)
+            yield k, c_read_val(buf, v_type, v_spec, decode_arrays)
+
+    else:
+        raise TypeError("Can't iterate over a value of type %d" % ttype)
+
+
+cdef read_columns(CyTransportBase buf, TType ttype, spec,
+                  bint decode_arrays):
+    cdef int i, size, fid
+    cdef TType orig_type, field_type
+    cdef dict columns, fields
+    cdef tuple field
+
+    cls = struct_spec(ttype, spec)
+    if cls is None:
+        raise TypeError("Can't read a value of type %d into columns" % ttype)
+
+    orig_type = <TType>read_i08(buf)
+    size = read_i32(buf)
+
+    if orig_type != T_STRUCT:
+        for i in range(size):
+            skip(buf, orig_type)
+        return empty_columns(cls, 0)
+
+    columns = empty_columns(cls, size)
+    fields = {}
+    for fid, field_spec in cls.thrift_spec.items():
+        fields[fid] = (field_spec[0],
+                       field_spec[2] if len(field_spec) > 3 else None,
+                       columns[field_spec[1]])
+
+    for i in range(size):
+        while True:
+            field_type = <TType>read_i08(buf)
+            if field_type == T_STOP:
+                break
+
+            fid = read_i16(buf)
+            field = fields.get(fid)
+            if field is None or <TType>field[0] != field_type:
+                skip(buf, field_type)
+                continue
+
+            (<list>field[2])[i] = c_read_val(buf, field_type, field[1],
+                                             decode_arrays)
+
+    return finish_columns(cls, columns, decode_arrays)
+
+
+cdef read_struct_columns(CyTransportBase buf, obj, name, bint decode_arrays):
+    cdef dict field_specs = obj.thrift_spec
+    cdef int fid
+    cdef TType field_type, ttype
+    cdef tuple field_spec
+
+    columns = None
+    while True:
+        field_type = <TType>read_i08(buf)
+        if field_type == T_STOP:
+            break
+
+        fid = read_i16(buf)
+        if fid not in field_specs:
+            skip(buf, field_type)
+            continue
+
+        field_spec = field_specs[fid]
+        ttype = field_spec[0]
+        if field_type != ttype:
+            skip(buf, field_type)
+            continue
+
+        spec = field_spec[2] if len(field_spec) > 3 else None
+        if field_spec[1] == name:
+            columns = read_columns(buf, ttype, spec, decode_arrays)
+        else:
+            setattr(obj, field_spec[1],
+                    c_read_val(buf, ttype, spec, decode_arrays))
+
+    return columns
+
+
+def iter_struct(CyTransportBase buf, obj, name, bint decode_arrays):
+    cdef dict field_specs = obj.thrift_spec
+    cdef int fid
+    cdef TType field_type, ttype
+    cdef tuple field_spec
+
+    while True:
+        field_type = <TType>read_i08(buf)
+        if field_type == T_STOP:
+            break
+
+        fid = read_i16(buf)
+        if fid not in field_specs:
+            skip(buf, field_type)
+            continue
+
+        field_spec = field_specs[fid]
+        ttype = field_spec[0]
+        if field_type != ttype:
+            skip(buf, field_type)
+            continue
+
+        if len(field_spec) <= 3:
+            spec = None
+        else:
+            spec = field_spec[2]
+
+        if field_spec[1] == name:
+            for val in iter_val(buf, ttype, spec, decode_arrays):
+                yield val
+        else:
+            setattr(obj, field_spec[1],
+                    c_read_val(buf, ttype, spec, decode_arrays))
+
+
 def read_val(CyTransportBase buf, TType ttype):
-    return c_read_val(buf, ttype)
+    return c_read_val(buf, ttype, None, False)
 
 
 def write_val(CyTransportBase buf, TType ttype, val, spec=None):
@@ -377,11 +607,14 @@ cdef class TCyBinaryProtocol(object):
     cdef public CyTransportBase trans
     cdef public bool strict_read
     cdef public bool strict_write
+    cdef public bint decode_arrays
 
-    def __init__(self, trans, strict_read=True, strict_write=True):
+    def __init__(self, trans, strict_read=True, strict_write=True,
+                 decode_arrays=False):
         self.trans = trans
         self.strict_read = strict_read
         self.strict_write = strict_write
+        self.decode_arrays = decode_arrays
 
     def skip(self, ttype):
         skip(self.trans, <TType>(ttype))
@@ -396,7 +629,7 @@ cdef class TCyBinaryProtocol(object):
             if version != VERSION_1:
                 raise ProtocolError('invalid version %d' % version)
 
-            name = c_read_val(self.trans, T_STRING)
+            name = c_read_val(self.trans, T_STRING, None, False)
             ttype = <TType>(size & TYPE_MASK)
         else:
             if self.strict_read:
@@ -428,7 +661,30 @@ cdef class TCyBinaryProtocol(object):
 
     def read_struct(self, obj):
         try:
-            return read_struct(self.trans, obj)
+            return read_struct(self.trans, obj, self.decode_arrays)
+        except Exception:
+            self.trans.clean()
+            raise
+
+    def iter_struct(self, obj, name):
+        """Read `obj`, yielding the elements of its container field `name`
+        as they are read, see `thriftpy.protocol.binary.iter_struct`.
+        """
+        try:
+            for val in iter_struct(self.trans, obj, name,
+                                   self.decode_arrays):
+                yield val
+        except Exception:
+            self.trans.clean()
+            raise
+
+    def read_struct_columns(self, obj, name):
+        """Read `obj`, returning its list of structs field `name` as
+        columns, see `thriftpy.protocol.binary.read_columns`.
+        """
+        try:
+            return read_struct_columns(self.trans, obj, name,
+                                       self.decode_arrays)
         except Exception:
             self.trans.clean()
             raise
@@ -442,9 +698,12 @@ cdef class TCyBinaryProtocol(object):
 
 
 class TCyBinaryProtocolFactory(object):
-    def __init__(self, strict_read=True, strict_write=True):
+    def __init__(self, strict_read=True, strict_write=True,
+                 decode_arrays=False):
         self.strict_read = strict_read
         self.strict_write = strict_write
+        self.decode_arrays = decode_arrays
 
     def get_protocol(self, trans):
-        return TCyBinaryProtocol(trans, self.strict_read, self.strict_write)
+        return TCyBinaryProtocol(trans, self.strict_read, self.strict_write,
+                                 self.decode_arrays)
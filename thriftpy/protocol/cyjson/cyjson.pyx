@@ -0,0 +1,1411 @@
+from libc.stdlib cimport malloc, realloc, free
+from libc.string cimport memcpy, strlen
+from libc.stdio cimport snprintf
+from libc.math cimport isnan, isinf
+from cpython.unicode cimport PyUnicode_DecodeUTF8
+
+from thriftpy.transport.cybase cimport CyTransportBase
+from thriftpy.protocol.exc import TProtocolException
+from thriftpy.protocol.json import VERSION, unpack_field_spec
+from thriftpy.protocol.apache_json import NAME_TYPES
+from thriftpy.protocol.apache_json import VERSION as APACHE_VERSION
+
+ctypedef enum TType:
+    T_STOP = 0,
+    T_VOID = 1,
+    T_BOOL = 2,
+    T_BYTE = 3,
+    T_I08 = 3,
+    T_I16 = 6,
+    T_I32 = 8,
+    T_U64 = 9,
+    T_I64 = 10,
+    T_DOUBLE = 4,
+    T_STRING = 11,
+    T_UTF7 = 11,
+    T_NARY = 11
+    T_STRUCT = 12,
+    T_MAP = 13,
+    T_SET = 14,
+    T_LIST = 15,
+    T_UTF8 = 16,
+    T_UTF16 = 17
+
+DEF INITIAL_SIZE = 4096
+
+cdef bytes HEX = b"0123456789abcdef"
+
+
+cdef invalid(msg):
+    return TProtocolException(TProtocolException.INVALID_DATA, msg)
+
+
+cdef write_only():
+    return TProtocolException(TProtocolException.NOT_IMPLEMENTED,
+                              "TSimpleJSONProtocol is write only")
+
+
+cdef class JSONWriter(object):
+    """Growable output buffer, `reserved` bytes are left at its start."""
+
+    cdef:
+        char *buf
+        Py_ssize_t size, cap
+
+    def __cinit__(self, Py_ssize_t reserved=0):
+        self.cap = INITIAL_SIZE
+        self.buf = <char*>malloc(self.cap)
+        if self.buf == NULL:
+            raise MemoryError("allocate buffer fail")
+        self.size = reserved
+
+    def __dealloc__(self):
+        free(self.buf)
+
+    cdef int reserve(self, Py_ssize_t n) except -1:
+        cdef:
+            Py_ssize_t cap = self.cap
+            char *buf
+
+        if self.size + n <= cap:
+            return 0
+
+        while cap < self.size + n:
+            cap *= 2
+        buf = <char*>realloc(self.buf, cap)
+        if buf == NULL:
+            raise MemoryError("allocate buffer fail")
+        self.buf = buf
+        self.cap = cap
+        return 0
+
+    cdef inline int put(self, const char *data, Py_ssize_t n) except -1:
+        self.reserve(n)
+        memcpy(self.buf + self.size, data, n)
+        self.size += n
+        return 0
+
+    cdef inline int putc(self, char c) except -1:
+        if self.size == self.cap:
+            self.reserve(1)
+        self.buf[self.size] = c
+        self.size += 1
+        return 0
+
+    cdef getvalue(self):
+        return self.buf[:self.size]
+
+
+cdef int write_escape(JSONWriter w, unsigned int ch) except -1:
+    cdef const char *hex = HEX
+    cdef char out[6]
+
+    out[0] = b'\\'
+    out[1] = b'u'
+    out[2] = hex[(ch >> 12) & 0xf]
+    out[3] = hex[(ch >> 8) & 0xf]
+    out[4] = hex[(ch >> 4) & 0xf]
+    out[5] = hex[ch & 0xf]
+    return w.put(out, 6)
+
+
+cdef int write_string(JSONWriter w, s) except -1:
+    """Write a string like json.dumps, escaping anything but printable
+    ascii.
+    """
+    cdef:
+        unicode u
+        Py_UCS4 ch
+        unsigned int code
+
+    if isinstance(s, bytes):
+        try:
+            u = (<bytes>s).decode("utf-8")
+        except UnicodeDecodeError:
+            raise invalid("Binary data isn't UTF-8 and can't be written as "
+                          "a JSON string")
+    elif isinstance(s, unicode):
+        u = <unicode>s
+    else:
+        raise TypeError("%r is not a string" % (s,))
+
+    w.reserve(len(u) + 2)
+    w.putc(b'"')
+    for ch in u:
+        code = <unsigned int>ch
+        if 0x20 <= code < 0x7f:
+            if ch == u'"':
+                w.put(b'\\"', 2)
+            elif ch == u'\\':
+                w.put(b'\\\\', 2)
+            else:
+                w.putc(<char>code)
+        elif ch == u'\n':
+            w.put(b'\\n', 2)
+        elif ch == u'\r':
+            w.put(b'\\r', 2)
+        elif ch == u'\t':
+            w.put(b'\\t', 2)
+        elif ch == u'\b':
+            w.put(b'\\b', 2)
+        elif ch == u'\f':
+            w.put(b'\\f', 2)
+        elif code < 0x10000:
+            write_escape(w, code)
+        else:
+            code -= 0x10000
+            write_escape(w, 0xd800 | ((code >> 10) & 0x3ff))
+            write_escape(w, 0xdc00 | (code & 0x3ff))
+    w.putc(b'"')
+    return 0
+
+
+cdef int write_int(JSONWriter w, val) except -1:
+    cdef:
+        long long v
+        char tmp[32]
+        int n
+
+    try:
+        v = val
+    except OverflowError:
+        s = str(val).encode("ascii")
+        return w.put(s, len(s))
+
+    n = snprintf(tmp, 32, "%lld", v)
+    return w.put(tmp, n)
+
+
+cdef int write_float(JSONWriter w, double v) except -1:
+    if v != v:
+        return w.put(b"NaN", 3)
+    if v == float("inf"):
+        return w.put(b"Infinity", 8)
+    if v == float("-inf"):
+        return w.put(b"-Infinity", 9)
+
+    s = repr(v).encode("ascii")
+    return w.put(s, len(s))
+
+
+cdef int write_any(JSONWriter w, val) except -1:
+    """Write a python value like json.dumps."""
+    cdef bint first = True
+
+    if val is None:
+        w.put(b"null", 4)
+    elif val is True:
+        w.put(b"true", 4)
+    elif val is False:
+        w.put(b"false", 5)
+    elif isinstance(val, (int, long)):
+        write_int(w, val)
+    elif isinstance(val, float):
+        write_float(w, val)
+    elif isinstance(val, (unicode, bytes)):
+        write_string(w, val)
+    elif isinstance(val, (list, tuple)):
+        w.putc(b'[')
+        for item in val:
+            if not first:
+                w.put(b", ", 2)
+            first = False
+            write_any(w, item)
+        w.putc(b']')
+    elif isinstance(val, dict):
+        w.putc(b'{')
+        for k, v in val.items():
+            if not first:
+                w.put(b", ", 2)
+            first = False
+            write_string(w, k if isinstance(k, (unicode, bytes)) else
+                         str(k))
+            w.put(b": ", 2)
+            write_any(w, v)
+        w.putc(b'}')
+    else:
+        raise TypeError("%r is not JSON serializable" % (val,))
+    return 0
+
+
+cdef int write_val(JSONWriter w, TType ttype, val, spec) except -1:
+    cdef bint first = True
+
+    if ttype == T_BOOL:
+        if val:
+            w.put(b"true", 4)
+        else:
+            w.put(b"false", 5)
+
+    elif ttype == T_STRUCT:
+        write_struct(w, val)
+
+    elif ttype == T_LIST or ttype == T_SET:
+        if isinstance(spec, tuple):
+            e_type, e_spec = spec
+        else:
+            e_type, e_spec = spec, None
+
+        w.putc(b'[')
+        for e_val in val:
+            if not first:
+                w.put(b", ", 2)
+            first = False
+            write_val(w, e_type, e_val, e_spec)
+        w.putc(b']')
+
+    elif ttype == T_MAP:
+        if isinstance(spec[0], int):
+            k_type, k_spec = spec[0], None
+        else:
+            k_type, k_spec = spec[0]
+
+        if isinstance(spec[1], int):
+            v_type, v_spec = spec[1], None
+        else:
+            v_type, v_spec = spec[1]
+
+        w.putc(b'[')
+        for k, v in val.items():
+            if not first:
+                w.put(b", ", 2)
+            first = False
+            w.put(b'{"key": ', 8)
+            write_val(w, k_type, k, k_spec)
+            w.put(b', "value": ', 11)
+            write_val(w, v_type, v, v_spec)
+            w.putc(b'}')
+        w.putc(b']')
+
+    elif ttype == T_BYTE or ttype == T_I16 or ttype == T_I32 or \
+            ttype == T_I64 or ttype == T_DOUBLE or ttype == T_STRING:
+        # numbers and strings are written as they are
+        write_any(w, val)
+
+    else:
+        w.put(b"null", 4)
+    return 0
+
+
+cdef int write_struct(JSONWriter w, obj) except -1:
+    cdef bint first = True
+
+    w.putc(b'{')
+    for field_spec in obj.thrift_spec.values():
+        f_type, f_name, f_spec = unpack_field_spec(field_spec)
+        v = getattr(obj, f_name)
+        if v is None:
+            continue
+
+        if not first:
+            w.put(b", ", 2)
+        first = False
+        write_string(w, f_name)
+        w.put(b": ", 2)
+        write_val(w, f_type, v, f_spec)
+    w.putc(b'}')
+    return 0
+
+
+cdef class JSONReader(object):
+    cdef:
+        bytes data
+        const char *buf
+        Py_ssize_t pos, end
+
+    def __cinit__(self, bytes data):
+        self.data = data
+        self.buf = data
+        self.pos = 0
+        self.end = len(data)
+
+    cdef inline char peek(self) except? -1:
+        """Return the next non blank character, 0 at the end."""
+        cdef char c
+        while self.pos < self.end:
+            c = self.buf[self.pos]
+            if c != b' ' and c != b'\t' and c != b'\n' and c != b'\r':
+                return c
+            self.pos += 1
+        return 0
+
+    cdef int expect(self, char c) except -1:
+        if self.peek() != c:
+            raise invalid("Expected %r at offset %d" % (chr(c), self.pos))
+        self.pos += 1
+        return 0
+
+    cdef bint next_item(self, char close) except -1:
+        """Consume the separator after an item, return whether the
+        container goes on.
+        """
+        cdef char c = self.peek()
+        if c == b',':
+            self.pos += 1
+            return True
+        if c == close:
+            self.pos += 1
+            return False
+        raise invalid("Expected ',' or %r at offset %d"
+                      % (chr(close), self.pos))
+
+    cdef bint empty(self, char close) except -1:
+        """Consume `close` right after an opening, if the container is
+        empty.
+        """
+        if self.peek() == close:
+            self.pos += 1
+            return True
+        return False
+
+    cdef unicode parse_string(self):
+        cdef:
+            Py_ssize_t start, i
+            char c
+            JSONWriter w
+
+        self.expect(b'"')
+        start = i = self.pos
+        while i < self.end:
+            c = self.buf[i]
+            if c == b'"':
+                self.pos = i + 1
+                return PyUnicode_DecodeUTF8(self.buf + start, i - start,
+                                            NULL)
+            if c == b'\\':
+                break
+            i += 1
+        else:
+            raise invalid("Unterminated string at offset %d" % start)
+
+        # slow path, unescape into a buffer
+        w = JSONWriter()
+        w.put(self.buf + start, i - start)
+        self.pos = i
+        while True:
+            if self.pos >= self.end:
+                raise invalid("Unterminated string at offset %d" % start)
+            c = self.buf[self.pos]
+            self.pos += 1
+            if c == b'"':
+                break
+            if c != b'\\':
+                w.putc(c)
+                continue
+
+            if self.pos >= self.end:
+                raise invalid("Unterminated string at offset %d" % start)
+            c = self.buf[self.pos]
+            self.pos += 1
+            if c == b'u':
+                self.unescape_unicode(w)
+            elif c == b'n':
+                w.putc(b'\n')
+            elif c == b't':
+                w.putc(b'\t')
+            elif c == b'r':
+                w.putc(b'\r')
+            elif c == b'b':
+                w.putc(b'\b')
+            elif c == b'f':
+                w.putc(b'\f')
+            elif c == b'"' or c == b'\\' or c == b'/':
+                w.putc(c)
+            else:
+                raise invalid("Bad escape at offset %d" % (self.pos - 2))
+
+        return PyUnicode_DecodeUTF8(w.buf, w.size, NULL)
+
+    cdef unsigned int parse_hex4(self) except? 0xffffffff:
+        cdef:
+            unsigned int v = 0
+            int i
+            char c
+
+        if self.pos + 4 > self.end:
+            raise invalid("Bad unicode escape at offset %d" % self.pos)
+        for i in range(4):
+            c = self.buf[self.pos + i]
+            v <<= 4
+            if b'0' <= c <= b'9':
+                v |= c - c'0'
+            elif b'a' <= c <= b'f':
+                v |= c - c'a' + 10
+            elif b'A' <= c <= b'F':
+                v |= c - c'A' + 10
+            else:
+                raise invalid("Bad unicode escape at offset %d" % self.pos)
+        self.pos += 4
+        return v
+
+    cdef int unescape_unicode(self, JSONWriter w) except -1:
+        """Write the code point of a \\uXXXX escape, or of a surrogate pair
+        of them, as utf-8.
+        """
+        cdef:
+            unsigned int cp = self.parse_hex4(), low
+            char out[4]
+
+        if 0xd800 <= cp < 0xdc00 and self.pos + 6 <= self.end and \
+                self.buf[self.pos] == b'\\' and self.buf[self.pos + 1] == b'u':
+            self.pos += 2
+            low = self.parse_hex4()
+            if 0xdc00 <= low < 0xe000:
+                cp = 0x10000 + ((cp - 0xd800) << 10) + (low - 0xdc00)
+            else:
+                self.pos -= 6
+
+        if cp < 0x80:
+            return w.putc(<char>cp)
+        if cp < 0x800:
+            out[0] = <char>(0xc0 | (cp >> 6))
+            out[1] = <char>(0x80 | (cp & 0x3f))
+            return w.put(out, 2)
+        if cp < 0x10000:
+            out[0] = <char>(0xe0 | (cp >> 12))
+            out[1] = <char>(0x80 | ((cp >> 6) & 0x3f))
+            out[2] = <char>(0x80 | (cp & 0x3f))
+            return w.put(out, 3)
+        out[0] = <char>(0xf0 | (cp >> 18))
+        out[1] = <char>(0x80 | ((cp >> 12) & 0x3f))
+        out[2] = <char>(0x80 | ((cp >> 6) & 0x3f))
+        out[3] = <char>(0x80 | (cp & 0x3f))
+        return w.put(out, 4)
+
+    cdef Py_ssize_t token_end(self):
+        cdef:
+            Py_ssize_t i = self.pos
+            char c
+
+        while i < self.end:
+            c = self.buf[i]
+            if c == b',' or c == b']' or c == b'}' or c == b' ' or \
+                    c == b'\t' or c == b'\n' or c == b'\r':
+                break
+            i += 1
+        return i
+
+    cdef parse_number(self):
+        cdef:
+            Py_ssize_t start, end, i
+            long long v = 0
+            bint negative = False, is_float = False
+            char c
+
+        self.peek()
+        start, end = self.pos, self.token_end()
+        token = self.buf[start:end]
+        self.pos = end
+
+        i = start
+        if i < end and self.buf[i] == b'-':
+            negative = True
+            i += 1
+        if i == end:
+            raise invalid("Bad number at offset %d" % start)
+
+        if end - i <= 18:
+            while i < end:
+                c = self.buf[i]
+                if b'0' <= c <= b'9':
+                    v = v * 10 + (c - c'0')
+                else:
+                    is_float = True
+                    break
+                i += 1
+            if not is_float:
+                return -v if negative else v
+
+        try:
+            if token in (b"NaN", b"Infinity", b"-Infinity") or \
+                    b"." in token or b"e" in token or b"E" in token:
+                return float(token)
+            return int(token)
+        except ValueError:
+            raise invalid("Bad number at offset %d" % start)
+
+    cdef parse_any(self):
+        """Parse a value like json.loads."""
+        cdef:
+            char c = self.peek()
+            dict d
+            list l
+
+        if c == b'"':
+            return self.parse_string()
+
+        if c == b'{':
+            self.pos += 1
+            d = {}
+            if self.empty(b'}'):
+                return d
+            while True:
+                k = self.parse_string()
+                self.expect(b':')
+                d[k] = self.parse_any()
+                if not self.next_item(b'}'):
+                    return d
+
+        if c == b'[':
+            self.pos += 1
+            l = []
+            if self.empty(b']'):
+                return l
+            while True:
+                l.append(self.parse_any())
+                if not self.next_item(b']'):
+                    return l
+
+        if c == b't' and self.match(b"true", 4):
+            return True
+        if c == b'f' and self.match(b"false", 5):
+            return False
+        if c == b'n' and self.match(b"null", 4):
+            return None
+        if c == 0:
+            raise invalid("Unexpected end of data")
+        return self.parse_number()
+
+    cdef bint match(self, const char *word, Py_ssize_t n):
+        cdef Py_ssize_t i
+        if self.pos + n > self.end:
+            return False
+        for i in range(n):
+            if self.buf[self.pos + i] != word[i]:
+                return False
+        self.pos += n
+        return True
+
+    cdef int skip_value(self) except -1:
+        cdef:
+            char c = self.peek()
+            int depth = 0
+            bint in_string = False
+
+        if c != b'{' and c != b'[':
+            self.parse_any()
+            return 0
+
+        # scan to the matching close, minding the strings
+        while self.pos < self.end:
+            c = self.buf[self.pos]
+            self.pos += 1
+            if in_string:
+                if c == b'\\':
+                    self.pos += 1
+                elif c == b'"':
+                    in_string = False
+            elif c == b'"':
+                in_string = True
+            elif c == b'{' or c == b'[':
+                depth += 1
+            elif c == b'}' or c == b']':
+                depth -= 1
+                if depth == 0:
+                    return 0
+        raise invalid("Unexpected end of data")
+
+
+cdef read_val(JSONReader r, TType ttype, spec):
+    cdef char c = r.peek()
+
+    if c == b'n' and r.match(b"null", 4):
+        return None
+
+    if ttype == T_BYTE or ttype == T_I16 or ttype == T_I32 or \
+            ttype == T_I64:
+        if c == b'"':
+            return int(r.parse_string())
+        return int(r.parse_number())
+
+    if ttype == T_DOUBLE:
+        if c == b'"':
+            return float(r.parse_string())
+        return float(r.parse_number())
+
+    if ttype == T_STRING or ttype == T_BOOL:
+        return r.parse_any()
+
+    if ttype == T_STRUCT:
+        return read_struct(r, spec())
+
+    if ttype == T_LIST or ttype == T_SET:
+        return read_list(r, spec)
+
+    if ttype == T_MAP:
+        return read_map(r, spec)
+
+    r.skip_value()
+    return None
+
+
+cdef list read_list(JSONReader r, spec):
+    cdef list result = []
+
+    if isinstance(spec, tuple):
+        e_type, e_spec = spec
+    else:
+        e_type, e_spec = spec, None
+
+    r.expect(b'[')
+    if r.empty(b']'):
+        return result
+    while True:
+        result.append(read_val(r, e_type, e_spec))
+        if not r.next_item(b']'):
+            return result
+
+
+cdef dict read_map(JSONReader r, spec):
+    cdef:
+        dict result = {}
+        bint has_key, has_value
+
+    if isinstance(spec[0], int):
+        k_type, k_spec = spec[0], None
+    else:
+        k_type, k_spec = spec[0]
+
+    if isinstance(spec[1], int):
+        v_type, v_spec = spec[1], None
+    else:
+        v_type, v_spec = spec[1]
+
+    r.expect(b'[')
+    if r.empty(b']'):
+        return result
+    while True:
+        r.expect(b'{')
+        has_key = has_value = False
+        if not r.empty(b'}'):
+            while True:
+                name = r.parse_string()
+                r.expect(b':')
+                if name == u"key":
+                    k = read_val(r, k_type, k_spec)
+                    has_key = True
+                elif name == u"value":
+                    v = read_val(r, v_type, v_spec)
+                    has_value = True
+                else:
+                    r.skip_value()
+                if not r.next_item(b'}'):
+                    break
+        if not (has_key and has_value):
+            raise invalid("Map entry without key or value at offset %d"
+                          % r.pos)
+        result[k] = v
+
+        if not r.next_item(b']'):
+            return result
+
+
+# class -> {field name: (ttype, type spec)}
+cdef dict field_cache = {}
+
+
+cdef dict struct_fields(cls):
+    cdef dict fields = field_cache.get(cls)
+    if fields is None:
+        fields = {}
+        for field_spec in cls.thrift_spec.values():
+            f_type, f_name, f_spec = unpack_field_spec(field_spec)
+            fields[f_name] = (f_type, f_spec)
+        field_cache[cls] = fields
+    return fields
+
+
+cdef read_struct(JSONReader r, obj):
+    cdef:
+        dict fields = struct_fields(type(obj))
+        tuple field
+
+    r.expect(b'{')
+    if r.empty(b'}'):
+        return obj
+    while True:
+        name = r.parse_string()
+        r.expect(b':')
+        field = fields.get(name)
+        if field is None:
+            r.skip_value()
+        else:
+            setattr(obj, name, read_val(r, field[0], field[1]))
+        if not r.next_item(b'}'):
+            return obj
+
+
+cdef void pack_len(char *out, Py_ssize_t n):
+    out[0] = <char>((n >> 24) & 0xff)
+    out[1] = <char>((n >> 16) & 0xff)
+    out[2] = <char>((n >> 8) & 0xff)
+    out[3] = <char>(n & 0xff)
+
+
+cdef Py_ssize_t unpack_len(bytes data) except -1:
+    cdef const unsigned char *buf = data
+    if len(data) < 4:
+        raise invalid("Truncated length")
+    return (buf[0] << 24) | (buf[1] << 16) | (buf[2] << 8) | buf[3]
+
+
+class TCyJSONProtocol(object):
+    """Cython version of `thriftpy.protocol.json.TJSONProtocol`, speaking
+    the same format, which encodes and decodes structs straight from and to
+    JSON text instead of through intermediate dicts.
+    """
+
+    def __init__(self, trans):
+        self.trans = trans
+        self._meta = {"version": VERSION}
+        self._reader = None
+        self._payload = -1
+
+    def _read_message(self):
+        cdef:
+            JSONReader r
+            Py_ssize_t payload = -1
+
+        size = unpack_len(self.trans.read(4))
+        r = JSONReader(self.trans.read(size))
+
+        # find the metadata, the payload is parsed later by read_struct
+        metadata = None
+        r.expect(b'{')
+        if not r.empty(b'}'):
+            while True:
+                key = r.parse_string()
+                r.expect(b':')
+                if key == u"metadata":
+                    metadata = r.parse_any()
+                elif key == u"payload":
+                    r.peek()
+                    payload = r.pos
+                    if metadata is not None:
+                        break
+                    r.skip_value()
+                else:
+                    r.skip_value()
+                if not r.next_item(b'}'):
+                    break
+
+        if payload < 0:
+            raise invalid("Message without payload")
+        self._reader = r
+        self._payload = payload
+        return metadata
+
+    def read_message_begin(self):
+        metadata = self._read_message()
+        if not isinstance(metadata, dict):
+            raise invalid("Message without metadata")
+
+        version = int(metadata["version"])
+        if version != VERSION:
+            raise TProtocolException(
+                type=TProtocolException.BAD_VERSION,
+                message="Bad version in read_message_begin:{}".format(version))
+
+        return metadata["name"], metadata["ttype"], metadata["seqid"]
+
+    def read_message_end(self):
+        pass
+
+    def write_message_begin(self, name, ttype, seqid):
+        self._meta.update({"name": name, "ttype": ttype, "seqid": seqid})
+
+    def write_message_end(self):
+        pass
+
+    def read_struct(self, obj):
+        cdef JSONReader r
+
+        if self._reader is None:
+            self._read_message()
+
+        r = self._reader
+        self._reader = None
+        r.pos = self._payload
+        return read_struct(r, obj)
+
+    def write_struct(self, obj):
+        cdef JSONWriter w = JSONWriter(4)
+
+        w.put(b'{"metadata": ', 13)
+        write_any(w, self._meta)
+        w.put(b', "payload": ', 13)
+        write_struct(w, obj)
+        w.putc(b'}')
+
+        pack_len(w.buf, w.size - 4)
+        self.trans.write(w.getvalue())
+
+
+class TCyJSONProtocolFactory(object):
+    def get_protocol(self, trans):
+        return TCyJSONProtocol(trans)
+
+
+# The JSON protocols of Apache Thrift, see thriftpy.protocol.apache_json
+
+cdef const char *type_name(TType ttype) except NULL:
+    if ttype == T_BOOL:
+        return "tf"
+    if ttype == T_BYTE:
+        return "i8"
+    if ttype == T_I16:
+        return "i16"
+    if ttype == T_I32:
+        return "i32"
+    if ttype == T_I64:
+        return "i64"
+    if ttype == T_DOUBLE:
+        return "dbl"
+    if ttype == T_STRING:
+        return "str"
+    if ttype == T_STRUCT:
+        return "rec"
+    if ttype == T_MAP:
+        return "map"
+    if ttype == T_LIST:
+        return "lst"
+    if ttype == T_SET:
+        return "set"
+    raise invalid("Unknown type %d" % ttype)
+
+
+cdef int write_tag(JSONWriter w, TType ttype) except -1:
+    cdef const char *name = type_name(ttype)
+    w.putc(b'"')
+    w.put(name, strlen(name))
+    return w.putc(b'"')
+
+
+cdef int write_double(JSONWriter w, double v, bint quote) except -1:
+    """Write a double, quoted if `quote` or if it's NaN or infinite."""
+    quote = quote or isnan(v) or isinf(v)
+    if quote:
+        w.putc(b'"')
+    write_float(w, v)
+    if quote:
+        w.putc(b'"')
+    return 0
+
+
+cdef int write_scalar(JSONWriter w, TType ttype, val) except -1:
+    if ttype == T_BOOL:
+        if val:
+            return w.putc(b'1')
+        return w.putc(b'0')
+    if ttype == T_DOUBLE:
+        return write_double(w, val, False)
+    if ttype == T_STRING:
+        return write_string(w, val)
+    if ttype == T_BYTE or ttype == T_I16 or ttype == T_I32 or \
+            ttype == T_I64:
+        return write_int(w, val)
+    return w.put(b"null", 4)
+
+
+cdef int write_key(JSONWriter w, TType ttype, val) except -1:
+    """Write a map key, as a string since JSON object keys are strings."""
+    if ttype == T_STRING:
+        return write_string(w, val)
+    if ttype == T_DOUBLE:
+        return write_double(w, val, True)
+    if ttype == T_BOOL or ttype == T_BYTE or ttype == T_I16 or \
+            ttype == T_I32 or ttype == T_I64:
+        w.putc(b'"')
+        write_scalar(w, ttype, val)
+        return w.putc(b'"')
+    raise invalid("Can't write a map key of type %d" % ttype)
+
+
+# class -> {field id: (ttype, name, type spec)}
+cdef dict spec_cache = {}
+
+
+cdef dict struct_specs(cls):
+    cdef dict specs = spec_cache.get(cls)
+    if specs is None:
+        specs = {}
+        for fid, field_spec in cls.thrift_spec.items():
+            specs[fid] = unpack_field_spec(field_spec)
+        spec_cache[cls] = specs
+    return specs
+
+
+cdef int write_tagged_val(JSONWriter w, TType ttype, val, spec) except -1:
+    cdef bint first = True
+
+    if ttype == T_STRUCT:
+        return write_tagged_struct(w, val)
+
+    if ttype == T_LIST or ttype == T_SET:
+        if isinstance(spec, tuple):
+            e_type, e_spec = spec
+        else:
+            e_type, e_spec = spec, None
+
+        w.putc(b'[')
+        write_tag(w, e_type)
+        w.putc(b',')
+        write_int(w, len(val))
+        for e_val in val:
+            w.putc(b',')
+            write_tagged_val(w, e_type, e_val, e_spec)
+        return w.putc(b']')
+
+    if ttype == T_MAP:
+        if isinstance(spec[0], int):
+            k_type, k_spec = spec[0], None
+        else:
+            k_type, k_spec = spec[0]
+
+        if isinstance(spec[1], int):
+            v_type, v_spec = spec[1], None
+        else:
+            v_type, v_spec = spec[1]
+
+        w.putc(b'[')
+        write_tag(w, k_type)
+        w.putc(b',')
+        write_tag(w, v_type)
+        w.putc(b',')
+        write_int(w, len(val))
+        w.put(b',{', 2)
+        for k, v in val.items():
+            if not first:
+                w.putc(b',')
+            first = False
+            write_key(w, k_type, k)
+            w.putc(b':')
+            write_tagged_val(w, v_type, v, v_spec)
+        return w.put(b'}]', 2)
+
+    return write_scalar(w, ttype, val)
+
+
+cdef int write_tagged_struct(JSONWriter w, obj) except -1:
+    cdef:
+        bint first = True
+        tuple field
+
+    w.putc(b'{')
+    for fid, field in struct_specs(type(obj)).items():
+        v = getattr(obj, field[1])
+        if v is None:
+            continue
+
+        if not first:
+            w.putc(b',')
+        first = False
+        w.putc(b'"')
+        write_int(w, fid)
+        w.put(b'":{', 3)
+        write_tag(w, field[0])
+        w.putc(b':')
+        write_tagged_val(w, field[0], v, field[2])
+        w.putc(b'}')
+    return w.putc(b'}')
+
+
+cdef int write_simple_val(JSONWriter w, TType ttype, val, spec) except -1:
+    cdef bint first = True
+
+    if ttype == T_STRUCT:
+        return write_simple_struct(w, val)
+
+    if ttype == T_LIST or ttype == T_SET:
+        if isinstance(spec, tuple):
+            e_type, e_spec = spec
+        else:
+            e_type, e_spec = spec, None
+
+        w.putc(b'[')
+        for e_val in val:
+            if not first:
+                w.putc(b',')
+            first = False
+            write_simple_val(w, e_type, e_val, e_spec)
+        return w.putc(b']')
+
+    if ttype == T_MAP:
+        if isinstance(spec[0], int):
+            k_type, k_spec = spec[0], None
+        else:
+            k_type, k_spec = spec[0]
+
+        if isinstance(spec[1], int):
+            v_type, v_spec = spec[1], None
+        else:
+            v_type, v_spec = spec[1]
+
+        w.putc(b'{')
+        for k, v in val.items():
+            if not first:
+                w.putc(b',')
+            first = False
+            write_key(w, k_type, k)
+            w.putc(b':')
+            write_simple_val(w, v_type, v, v_spec)
+        return w.putc(b'}')
+
+    return write_scalar(w, ttype, val)
+
+
+cdef int write_simple_struct(JSONWriter w, obj) except -1:
+    cdef:
+        bint first = True
+        tuple field
+
+    w.putc(b'{')
+    for field in struct_specs(type(obj)).values():
+        v = getattr(obj, field[1])
+        if v is None:
+            continue
+
+        if not first:
+            w.putc(b',')
+        first = False
+        write_string(w, field[1])
+        w.putc(b':')
+        write_simple_val(w, field[0], v, field[2])
+    return w.putc(b'}')
+
+
+cdef int read_tag(JSONReader r) except -1:
+    tag = r.parse_string()
+    ttype = NAME_TYPES.get(tag)
+    if ttype is None:
+        raise invalid("Unknown type %r" % tag)
+    return ttype
+
+
+cdef read_key(JSONReader r, TType ttype):
+    key = r.parse_string()
+    try:
+        if ttype == T_STRING:
+            return key
+        if ttype == T_BYTE or ttype == T_I16 or ttype == T_I32 or \
+                ttype == T_I64:
+            return int(key)
+        if ttype == T_BOOL:
+            return int(key) != 0
+        if ttype == T_DOUBLE:
+            return float(key)
+    except ValueError:
+        raise invalid("Bad map key %r" % key)
+    raise invalid("Can't read a map key of type %d" % ttype)
+
+
+cdef read_tagged_val(JSONReader r, TType ttype, spec):
+    if ttype == T_STRUCT:
+        return read_tagged_struct(r, spec())
+
+    if ttype == T_LIST or ttype == T_SET:
+        return read_tagged_list(r, spec)
+
+    if ttype == T_MAP:
+        return read_tagged_map(r, spec)
+
+    if ttype == T_STRING:
+        return r.parse_string()
+
+    if ttype == T_BOOL:
+        return bool(r.parse_any())
+
+    # numbers, NaN and infinities are quoted
+    return read_val(r, ttype, None)
+
+
+cdef list read_tagged_list(JSONReader r, spec):
+    cdef:
+        list result = []
+        Py_ssize_t size, i
+        int e_tag
+
+    if isinstance(spec, tuple):
+        e_type, e_spec = spec
+    else:
+        e_type, e_spec = spec, None
+
+    r.expect(b'[')
+    e_tag = read_tag(r)
+    r.expect(b',')
+    size = r.parse_number()
+
+    # elements of another type are skipped, like the binary protocol does
+    if e_tag != e_type:
+        while r.next_item(b']'):
+            r.skip_value()
+        return result
+
+    for i in range(size):
+        r.expect(b',')
+        result.append(read_tagged_val(r, e_type, e_spec))
+    r.expect(b']')
+    return result
+
+
+cdef dict read_tagged_map(JSONReader r, spec):
+    cdef:
+        dict result = {}
+        int k_tag, v_tag
+
+    if isinstance(spec[0], int):
+        k_type, k_spec = spec[0], None
+    else:
+        k_type, k_spec = spec[0]
+
+    if isinstance(spec[1], int):
+        v_type, v_spec = spec[1], None
+    else:
+        v_type, v_spec = spec[1]
+
+    r.expect(b'[')
+    k_tag = read_tag(r)
+    r.expect(b',')
+    v_tag = read_tag(r)
+    r.expect(b',')
+    r.parse_number()
+    r.expect(b',')
+
+    if k_tag != k_type or v_tag != v_type:
+        r.skip_value()
+    else:
+        r.expect(b'{')
+        if not r.empty(b'}'):
+            while True:
+                k = read_key(r, k_type)
+                r.expect(b':')
+                result[k] = read_tagged_val(r, v_type, v_spec)
+                if not r.next_item(b'}'):
+                    break
+    r.expect(b']')
+    return result
+
+
+cdef read_tagged_struct(JSONReader r, obj):
+    cdef:
+        dict specs = struct_specs(type(obj))
+        tuple field
+        int f_tag
+
+    r.expect(b'{')
+    if r.empty(b'}'):
+        return obj
+    while True:
+        fid = r.parse_string()
+        r.expect(b':')
+        r.expect(b'{')
+        f_tag = read_tag(r)
+        r.expect(b':')
+
+        try:
+            field = specs.get(int(fid))
+        except ValueError:
+            raise invalid("Bad field id %r" % fid)
+
+        # fields of another type are skipped, like the binary protocol does
+        if field is None or field[0] != f_tag:
+            r.skip_value()
+        else:
+            setattr(obj, field[1], read_tagged_val(r, field[0], field[2]))
+
+        r.expect(b'}')
+        if not r.next_item(b'}'):
+            return obj
+
+
+cdef inline char read_char(trans, CyTransportBase cy) except? -1:
+    cdef:
+        char c
+        bytes data
+
+    if cy is not None:
+        if cy.c_read(1, &c) != 1:
+            raise invalid("Unexpected end of data")
+        return c
+
+    data = trans.read(1)
+    if not data:
+        raise invalid("Unexpected end of data")
+    return (<const char*>data)[0]
+
+
+cdef bytes read_json(trans):
+    """Read a whole JSON object or array from `trans`, byte by byte so
+    nothing after it is consumed.
+    """
+    cdef:
+        CyTransportBase cy = None
+        JSONWriter w = JSONWriter()
+        int depth = 1
+        bint in_string = False
+        char c
+
+    if isinstance(trans, CyTransportBase):
+        cy = <CyTransportBase>trans
+
+    c = read_char(trans, cy)
+    while c == b' ' or c == b'\t' or c == b'\n' or c == b'\r':
+        c = read_char(trans, cy)
+    if c != b'{' and c != b'[':
+        raise invalid("Expected a JSON object or array")
+
+    w.putc(c)
+    while depth:
+        c = read_char(trans, cy)
+        w.putc(c)
+        if in_string:
+            if c == b'\\':
+                w.putc(read_char(trans, cy))
+            elif c == b'"':
+                in_string = False
+        elif c == b'"':
+            in_string = True
+        elif c == b'{' or c == b'[':
+            depth += 1
+        elif c == b'}' or c == b']':
+            depth -= 1
+    return w.getvalue()
+
+
+cdef int send(trans, JSONWriter w) except -1:
+    if isinstance(trans, CyTransportBase):
+        (<CyTransportBase>trans).c_write(w.buf, w.size)
+    else:
+        trans.write(w.getvalue())
+    return 0
+
+
+class TCyApacheJSONProtocol(object):
+    """Cython version of
+    `thriftpy.protocol.apache_json.TApacheJSONProtocol`.
+    """
+
+    def __init__(self, trans):
+        self.trans = trans
+        self._message = None
+        self._reader = None
+
+    def read_message_begin(self):
+        cdef JSONReader r = JSONReader(read_json(self.trans))
+
+        r.expect(b'[')
+        version = r.parse_number()
+        if version != APACHE_VERSION:
+            raise TProtocolException(
+                type=TProtocolException.BAD_VERSION,
+                message="Bad version in read_message_begin:{}".format(version))
+
+        r.expect(b',')
+        name = r.parse_string()
+        r.expect(b',')
+        ttype = r.parse_number()
+        r.expect(b',')
+        seqid = r.parse_number()
+        r.expect(b',')
+
+        self._reader = r
+        return name, ttype, seqid
+
+    def read_message_end(self):
+        self._reader = None
+
+    def write_message_begin(self, name, ttype, seqid):
+        self._message = (name, ttype, seqid)
+
+    def write_message_end(self):
+        pass
+
+    def read_struct(self, obj):
+        cdef JSONReader r = self._reader
+
+        self._reader = None
+        if r is None:
+            r = JSONReader(read_json(self.trans))
+        return read_tagged_struct(r, obj)
+
+    def write_struct(self, obj):
+        cdef JSONWriter w = JSONWriter()
+
+        if self._message is None:
+            write_tagged_struct(w, obj)
+        else:
+            name, ttype, seqid = self._message
+            self._message = None
+
+            w.putc(b'[')
+            write_int(w, APACHE_VERSION)
+            w.putc(b',')
+            write_string(w, name)
+            w.putc(b',')
+            write_int(w, ttype)
+            w.putc(b',')
+            write_int(w, seqid)
+            w.putc(b',')
+            write_tagged_struct(w, obj)
+            w.putc(b']')
+        send(self.trans, w)
+
+    def skip(self, ttype):
+        if self._reader is None:
+            read_json(self.trans)
+        self._reader = None
+
+
+class TCyApacheJSONProtocolFactory(object):
+    def get_protocol(self, trans):
+        return TCyApacheJSONProtocol(trans)
+
+
+class TCySimpleJSONProtocol(object):
+    """Cython version of
+    `thriftpy.protocol.apache_json.TSimpleJSONProtocol`.
+    """
+
+    def __init__(self, trans):
+        self.trans = trans
+        self._message = None
+
+    def read_message_begin(self):
+        raise write_only()
+
+    def read_message_end(self):
+        raise write_only()
+
+    def write_message_begin(self, name, ttype, seqid):
+        self._message = (name, ttype, seqid)
+
+    def write_message_end(self):
+        pass
+
+    def read_struct(self, obj):
+        raise write_only()
+
+    def write_struct(self, obj):
+        cdef JSONWriter w = JSONWriter()
+
+        if self._message is None:
+            write_simple_struct(w, obj)
+        else:
+            name, ttype, seqid = self._message
+            self._message = None
+
+            w.putc(b'[')
+            write_string(w, name)
+            w.putc(b',')
+            write_int(w, ttype)
+            w.putc(b',')
+            write_int(w, seqid)
+            w.putc(b',')
+            write_simple_struct(w, obj)
+            w.putc(b']')
+        send(self.trans, w)
+
+
+class TCySimpleJSONProtocolFactory(object):
+    def get_protocol(self, trans):
+        return TCySimpleJSONProtocol(trans)
@@ -13,6 +13,7 @@ class TProtocolException(TException):
     NEGATIVE_SIZE = 2
     SIZE_LIMIT = 3
     BAD_VERSION = 4
+    NOT_IMPLEMENTED = 5
 
     def __init__(self, type=UNKNOWN, message=None):
         TException.__init__(self, message)
@@ -110,14 +110,23 @@ def list_to_json(val, spec):
     return [json_value(elem_type, i, type_spec) for i in val]
 
 
+def unpack_field_spec(field_spec):
+    """Return (ttype, name, type spec) of a field spec, which is either
+    (ttype, name, required) or (ttype, name, type spec, required). The
+    required flag may be omitted.
+    """
+    field_type, field_name = field_spec[:2]
+    if len(field_spec) == 4 or \
+            (len(field_spec) == 3 and not isinstance(field_spec[2], bool)):
+        return field_type, field_name, field_spec[2]
+    return field_type, field_name, None
+
+
 def struct_to_json(val):
     outobj = {}
     for fid, field_spec in val.thrift_spec.items():
-        if len(field_spec) == 2:
-            field_type, field_name = field_spec
-            field_type_spec = None
-        else:
-            field_type, field_name, field_type_spec = field_spec
+        field_type, field_name, field_type_spec = \
+            unpack_field_spec(field_spec)
 
         v = getattr(val, field_name)
         if v is None:
@@ -130,11 +139,8 @@ def struct_to_json(val):
 
 def struct_to_obj(val, obj):
     for fid, field_spec in obj.thrift_spec.items():
-        if len(field_spec) == 2:
-            field_type, field_name = field_spec
-            field_type_spec = None
-        else:
-            field_type, field_name, field_type_spec = field_spec
+        field_type, field_name, field_type_spec = \
+            unpack_field_spec(field_spec)
 
         if field_name in val:
             setattr(obj, field_name,
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from ..thrift import TMessageType
+
+SEPARATOR = ":"
+
+
+class TMultiplexedProtocol(object):
+    """Protocol wrapper compatible with Apache Thrift's TMultiplexedProtocol.
+
+    The service name is prefixed to the name of every outgoing call as
+    "Service:method", so that a `TMultiplexedProcessor` can route messages
+    of several services sharing one connection. All other operations are
+    delegated to the wrapped protocol.
+    """
+
+    def __init__(self, proto, service_name):
+        self._proto = proto
+        self.trans = proto.trans
+        self.service_name = service_name
+
+    def write_message_begin(self, name, ttype, seqid):
+        if ttype in (TMessageType.CALL, TMessageType.ONEWAY):
+            name = self.service_name + SEPARATOR + name
+        self._proto.write_message_begin(name, ttype, seqid)
+
+    def __getattr__(self, name):
+        return getattr(self._proto, name)
+
+
+class TMultiplexedProtocolFactory(object):
+    def __init__(self, proto_factory, service_name):
+        self.proto_factory = proto_factory
+        self.service_name = service_name
+
+    def get_protocol(self, trans):
+        return TMultiplexedProtocol(self.proto_factory.get_protocol(trans),
+                                    self.service_name)
@@ -17,7 +17,7 @@ from thriftpy.transport import (
 def make_client(service, host="localhost", port=9090, unix_socket=None,
                 proto_factory=TBinaryProtocolFactory(),
                 trans_factory=TBufferedTransportFactory(),
-                timeout=None):
+                timeout=None, hooks=None):
     if unix_socket:
         socket = TSocket(unix_socket=unix_socket)
     elif host and port:
@@ -31,14 +31,24 @@ def make_client(service, host="localhost", port=9090, unix_socket=None,
     transport = trans_factory.get_transport(socket)
     protocol = proto_factory.get_protocol(transport)
     transport.open()
-    return TClient(service, protocol)
+    return TClient(service, protocol, hooks=hooks)
+
+
+def iter_call(client, api, *args, **kwargs):
+    """Call `api` and iterate over the elements of its list, set or map
+    result as they are decoded, instead of building the whole container::
+
+        for record in iter_call(client, "export", since=0):
+            ...
+    """
+    return client._req_iter(api, *args, **kwargs)
 
 
 def make_server(service, handler,
                 host="localhost", port=9090, unix_socket=None,
                 proto_factory=TBinaryProtocolFactory(),
-                trans_factory=TBufferedTransportFactory()):
-    processor = TProcessor(service, handler)
+                trans_factory=TBufferedTransportFactory(), hooks=None):
+    processor = TProcessor(service, handler, hooks=hooks)
     if unix_socket:
         server_socket = TServerSocket(unix_socket=unix_socket)
     elif host and port:
@@ -56,7 +66,7 @@ def make_server(service, handler,
 def client_context(service, host="localhost", port=9090, unix_socket=None,
                    proto_factory=TBinaryProtocolFactory(),
                    trans_factory=TBufferedTransportFactory(),
-                   timeout=None):
+                   timeout=None, hooks=None):
     if unix_socket:
         socket = TSocket(unix_socket=unix_socket)
     elif host and port:
@@ -72,7 +82,7 @@ def client_context(service, host="localhost", port=9090, unix_socket=None,
         transport = trans_factory.get_transport(socket)
         protocol = proto_factory.get_protocol(transport)
         transport.open()
-        yield TClient(service, protocol)
+        yield TClient(service, protocol, hooks=hooks)
 
     finally:
         transport.close()
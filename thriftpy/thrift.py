@@ -12,7 +12,7 @@ from __future__ import absolute_import
 import functools
 import inspect
 
-from ._compat import init_func_generator, with_metaclass
+from ._compat import init_func_generator, perf_counter, with_metaclass
 
 
 def args2kwargs(thrift_spec, *args):
@@ -111,14 +111,144 @@ class TPayload(with_metaclass(TPayloadMeta, object)):
         return not self.__eq__(other)
 
 
+class TSizedIterator(object):
+    """Elements of a list, set or map field produced by `iterable`, with
+    their number declared up front, so they are encoded as they come
+    instead of being built as a whole. Map elements are (key, value) pairs.
+
+    With `chunk_size`, the transport is flushed every `chunk_size` elements,
+    but for framed transports, whose frames must hold whole messages.
+    Producing more or fewer elements than `size` raises ValueError, and once
+    chunks are flushed closes the transport, the message on the connection
+    being cut short.
+    """
+
+    def __init__(self, iterable, size, chunk_size=None):
+        self.iterable = iterable
+        self.size = size
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        count = 0
+        for item in self.iterable:
+            count += 1
+            if count > self.size:
+                raise ValueError("More than the {} declared elements".format(
+                    self.size))
+            yield item
+
+        if count < self.size:
+            raise ValueError("{} elements produced, {} declared".format(
+                count, self.size))
+
+    def items(self):
+        return iter(self)
+
+
+class TCallInfo(object):
+    """Details of a call handed to the hooks of clients and processors.
+
+    Times are in seconds and sizes in bytes, they are None if not known.
+    Sizes are only known when the transport under the protocol counts the
+    bytes going through it. On the client side, `decode_time` includes the
+    wait for the response and there is no `handler_time`.
+    """
+
+    OK = "ok"
+    EXCEPTION = "exception"  # an exception declared by the api was raised
+    ERROR = "error"
+
+    __slots__ = ("api", "seqid", "decode_time", "handler_time", "encode_time",
+                 "request_bytes", "response_bytes", "outcome", "exception")
+
+    def __init__(self, api=None, seqid=None):
+        self.api = api
+        self.seqid = seqid
+        self.decode_time = self.handler_time = self.encode_time = None
+        self.request_bytes = self.response_bytes = None
+        self.outcome = None
+        self.exception = None
+
+
+class THook(object):
+    """Base class of the hooks of clients and processors.
+
+    `begin` is called with a `TCallInfo` when a call starts, processors call
+    it once the request is decoded. `end` is called with the same object
+    completed, whatever the outcome of the call.
+    """
+
+    def begin(self, info):
+        pass
+
+    def end(self, info):
+        pass
+
+
+def _declared_exceptions(result_cls):
+    return tuple(spec[2] for k, spec in result_cls.thrift_spec.items()
+                 if k != 0 and spec[0] == TType.STRUCT)
+
+
+def iter_struct(iprot, obj, name):
+    """Read `obj` from `iprot`, yielding the elements of its list or set
+    field `name`, or the (key, value) pairs of its map field, one at a time.
+
+    Protocols without streaming support read the whole struct first.
+    """
+    if hasattr(iprot, "iter_struct"):
+        return iprot.iter_struct(obj, name)
+
+    obj.read(iprot)
+    value = getattr(obj, name)
+    if isinstance(value, dict):
+        return iter(value.items())
+    return iter(value or ())
+
+
+def read_columns(iprot, obj, name):
+    """Read `obj` from `iprot`, returning its list of structs field `name`
+    as a dict mapping every field name of the struct to the list of its
+    values, see `thriftpy.protocol.binary.read_columns`.
+
+    Protocols without columnar support read the whole struct first.
+    """
+    if hasattr(iprot, "read_struct_columns"):
+        return iprot.read_struct_columns(obj, name)
+
+    from .protocol.columns import struct_spec, to_columns
+
+    obj.read(iprot)
+    for spec in obj.thrift_spec.values():
+        if spec[1] == name:
+            cls = struct_spec(spec[0], spec[2] if len(spec) > 3 else None)
+            if cls is None:
+                raise TypeError("Can't read a value of type %d into columns"
+                                % spec[0])
+            values = getattr(obj, name)
+            setattr(obj, name, None)
+            if values is None:
+                return None
+            return to_columns(cls, values,
+                              getattr(iprot, "decode_arrays", False))
+
+
 class TClient(object):
-    def __init__(self, service, iprot, oprot=None):
+    _hooks = ()
+
+    def __init__(self, service, iprot, oprot=None, hooks=None):
         self._service = service
         self._iprot = self._oprot = iprot
         if oprot is not None:
             self._oprot = oprot
         self._seqid = 0
 
+        if hooks:
+            self._hooks = list(hooks)
+
     def __getattr__(self, _api):
         if _api in self._service.thrift_services:
             return functools.partial(self._req, _api)
@@ -130,6 +260,9 @@ class TClient(object):
         return self._service.thrift_services
 
     def _req(self, _api, *args, **kwargs):
+        if self._hooks:
+            return self._req_with_hooks(_api, *args, **kwargs)
+
         _kw = args2kwargs(getattr(self._service, _api + "_args").thrift_spec,
                           *args)
         kwargs.update(_kw)
@@ -140,6 +273,67 @@ class TClient(object):
         if not getattr(result_cls, "oneway"):
             return self._recv(_api)
 
+    def _req_with_hooks(self, _api, *args, **kwargs):
+        _kw = args2kwargs(getattr(self._service, _api + "_args").thrift_spec,
+                          *args)
+        kwargs.update(_kw)
+        result_cls = getattr(self._service, _api + "_result")
+
+        info = TCallInfo(_api, self._seqid)
+        for hook in self._hooks:
+            hook.begin(info)
+
+        otrans, itrans = self._oprot.trans, self._iprot.trans
+        bytes_written = getattr(otrans, "bytes_written", None)
+        bytes_read = getattr(itrans, "bytes_read", None)
+
+        start = sent = perf_counter()
+        try:
+            self._send(_api, **kwargs)
+            sent = perf_counter()
+
+            res = None
+            if not getattr(result_cls, "oneway"):
+                res = self._recv(_api)
+            info.outcome = TCallInfo.OK
+            return res
+        except Exception as e:
+            info.exception = e
+            if isinstance(e, _declared_exceptions(result_cls)):
+                info.outcome = TCallInfo.EXCEPTION
+            else:
+                info.outcome = TCallInfo.ERROR
+            raise
+        finally:
+            info.encode_time = sent - start
+            info.decode_time = perf_counter() - sent
+            if bytes_written is not None:
+                info.request_bytes = otrans.bytes_written - bytes_written
+            if bytes_read is not None:
+                info.response_bytes = itrans.bytes_read - bytes_read
+
+            for hook in self._hooks:
+                hook.end(info)
+
+    def _req_iter(self, _api, *args, **kwargs):
+        """Send the request now, and return an iterator decoding the
+        elements of the container result as they are read.
+
+        The iterator must be exhausted before the client is used again.
+        """
+        _kw = args2kwargs(getattr(self._service, _api + "_args").thrift_spec,
+                          *args)
+        kwargs.update(_kw)
+        result_cls = getattr(self._service, _api + "_result")
+
+        success = result_cls.thrift_spec.get(0)
+        if success is None or \
+                success[0] not in (TType.LIST, TType.SET, TType.MAP):
+            raise TypeError("{} doesn't return a container".format(_api))
+
+        self._send(_api, **kwargs)
+        return self._recv_iter(_api)
+
     def _send(self, _api, **kwargs):
         self._oprot.write_message_begin(_api, TMessageType.CALL, self._seqid)
         args = getattr(self._service, _api + "_args")()
@@ -176,17 +370,45 @@ class TClient(object):
         if hasattr(result, "success"):
             raise TApplicationException(TApplicationException.MISSING_RESULT)
 
+    def _recv_iter(self, _api):
+        fname, mtype, rseqid = self._iprot.read_message_begin()
+        if mtype == TMessageType.EXCEPTION:
+            x = TApplicationException()
+            x.read(self._iprot)
+            self._iprot.read_message_end()
+            raise x
+
+        result = getattr(self._service, _api + "_result")()
+        for val in iter_struct(self._iprot, result, "success"):
+            yield val
+        self._iprot.read_message_end()
+
+        # check throws
+        for k, v in result.__dict__.items():
+            if k != "success" and v is not None:
+                raise v
+
 
 class TProcessor(object):
     """Base class for procsessor, which works on two streams."""
 
-    def __init__(self, service, handler):
+    _hooks = ()
+
+    def __init__(self, service, handler, hooks=None):
         self._service = service
         self._handler = handler
+        self._apis = frozenset(service.thrift_services)
+
+        if hooks:
+            self._hooks = list(hooks)
+
+    def add_hook(self, hook):
+        """Register a `THook` called around every processed call."""
+        self._hooks = list(self._hooks) + [hook]
 
     def process_in(self, iprot):
         api, type, seqid = iprot.read_message_begin()
-        if api not in self._service.thrift_services:
+        if api not in self._apis:
             iprot.skip(TType.STRUCT)
             iprot.read_message_end()
             return api, seqid, TApplicationException(TApplicationException.UNKNOWN_METHOD), None   # noqa
@@ -232,6 +454,9 @@ class TProcessor(object):
             raise
 
     def process(self, iprot, oprot):
+        if self._hooks:
+            return self._process_with_hooks(iprot, oprot)
+
         api, seqid, result, call = self.process_in(iprot)
 
         if isinstance(result, TApplicationException):
@@ -246,13 +471,73 @@ class TProcessor(object):
         if not result.oneway:
             self.send_result(oprot, api, result, seqid)
 
+    def _process_with_hooks(self, iprot, oprot):
+        itrans, otrans = iprot.trans, oprot.trans
+        bytes_read = getattr(itrans, "bytes_read", None)
 
-class TMultiplexingProcessor(TProcessor):
-    processors = {}
-    service_map = {}
+        timed = _TimedProtocol(iprot)
+        api, seqid, result, call = self.process_in(timed)
+        decoded = handled = perf_counter()
+
+        info = TCallInfo(api, seqid)
+        info.decode_time = decoded - timed.started
+        if bytes_read is not None:
+            info.request_bytes = itrans.bytes_read - bytes_read
+        for hook in self._hooks:
+            hook.begin(info)
 
+        bytes_written = getattr(otrans, "bytes_written", None)
+        try:
+            if isinstance(result, TApplicationException):
+                info.outcome, info.exception = TCallInfo.ERROR, result
+                return self.send_exception(oprot, api, result, seqid)
+
+            try:
+                result.success = call()
+                info.outcome = TCallInfo.OK
+            except Exception as e:
+                info.outcome, info.exception = TCallInfo.ERROR, e
+                # raise if api don't have throws
+                self.handle_exception(e, result)
+                info.outcome = TCallInfo.EXCEPTION
+            finally:
+                handled = perf_counter()
+                info.handler_time = handled - decoded
+
+            if not result.oneway:
+                self.send_result(oprot, api, result, seqid)
+        finally:
+            info.encode_time = perf_counter() - handled
+            if bytes_written is not None:
+                info.response_bytes = otrans.bytes_written - bytes_written
+
+            for hook in self._hooks:
+                hook.end(info)
+
+
+class _TimedProtocol(object):
+    """Protocol wrapper noting when the header of a message was read, the
+    wait for the message on a kept alive connection isn't decoding time.
+    """
+
+    def __init__(self, proto):
+        self._proto = proto
+        self.trans = proto.trans
+        self.started = None
+
+    def read_message_begin(self):
+        res = self._proto.read_message_begin()
+        self.started = perf_counter()
+        return res
+
+    def __getattr__(self, name):
+        return getattr(self._proto, name)
+
+
+class TMultiplexingProcessor(TProcessor):
     def __init__(self):
-        pass
+        self.processors = {}
+        self.service_map = {}
 
     def register_processor(self, processor):
         service = processor._service
@@ -299,6 +584,60 @@ class TMultiplexingProcessor(TProcessor):
         return api, seqid, result, call
 
 
+class TStoredMessageProtocol(object):
+    """Protocol wrapper replaying an already read message header."""
+
+    def __init__(self, proto, name, ttype, seqid):
+        self._proto = proto
+        self.trans = proto.trans
+        self._message = name, ttype, seqid
+
+    def read_message_begin(self):
+        return self._message
+
+    def __getattr__(self, name):
+        return getattr(self._proto, name)
+
+
+class TMultiplexedProcessor(TProcessor):
+    """Processor compatible with Apache Thrift's TMultiplexedProcessor.
+
+    Incoming messages are named "Service:method" by `TMultiplexedProtocol`,
+    the service name picks the registered processor and the bare method name
+    is handed over to it, so method names only need to be unique inside
+    their own service.
+    """
+
+    def __init__(self):
+        self.processors = {}
+
+    def register_processor(self, service_name, processor):
+        if service_name in self.processors:
+            raise TApplicationException(
+                type=TApplicationException.INTERNAL_ERROR,
+                message='processor for `{0}` already registered'
+                .format(service_name))
+        self.processors[service_name] = processor
+
+    def process_in(self, iprot):
+        from .protocol.multiplex import SEPARATOR
+
+        name, type, seqid = iprot.read_message_begin()
+        service_name, _, api = name.partition(SEPARATOR)
+
+        proc = self.processors.get(service_name) if api else None
+        if proc is None:
+            iprot.skip(TType.STRUCT)
+            iprot.read_message_end()
+            e = TApplicationException(
+                TApplicationException.UNKNOWN_METHOD,
+                'unknown service or method `{0}`'.format(name))
+            return name, seqid, e, None
+
+        return proc.process_in(
+            TStoredMessageProtocol(iprot, api, type, seqid))
+
+
 class TProcessorFactory(object):
     def __init__(self, processor_class, *args, **kwargs):
         self.args = args
@@ -37,6 +37,7 @@ import toro
 
 class TTornadoStreamTransport(TTransportBase):
     """a framed, buffered transport over a Tornado stream"""
+    framed = True
     DEFAULT_CONNECT_TIMEOUT = timedelta(seconds=1)
     DEFAULT_READ_TIMEOUT = timedelta(seconds=1)
 
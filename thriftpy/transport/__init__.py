@@ -23,10 +23,20 @@ def readall(read_fn, sz):
 
 
 class TTransportBase(object):
-    """Base class for Thrift transport layer."""
+    """Base class for Thrift transport layer.
+
+    Transports count the bytes read and written through them in
+    `bytes_read` and `bytes_written`. Transports sending every flush as a
+    frame of its own are `framed`, as are the transports wrapping them.
+    """
+
+    bytes_read = bytes_written = 0
+    framed = False
 
     def read(self, sz):
-        return readall(self._read, sz)
+        buff = readall(self._read, sz)
+        self.bytes_read += sz
+        return buff
 
 
 class TTransportException(TException):
@@ -54,11 +64,15 @@ from .socket import TSocketBase, TSocket, TServerSocket  # noqa
 from .buffered import TBufferedTransport, TBufferedTransportFactory  # noqa
 from .framed import TFramedTransport, TFramedTransportFactory  # noqa
 from .memory import TMemoryBuffer  # noqa
+from .header import THeaderTransport, THeaderTransportFactory  # noqa
+from .compressed import TZlibTransport, TZlibTransportFactory  # noqa
 
 if CYTHON:
     from .buffered import TCyBufferedTransport, TCyBufferedTransportFactory
     from .framed import TCyFramedTransport, TCyFramedTransportFactory
     from .memory import TCyMemoryBuffer
+    from .header import TCyHeaderTransport, TCyHeaderTransportFactory
+    from .compressed import TCyZlibTransport, TCyZlibTransportFactory
 
     # enable cython binary by default for CPython.
     TMemoryBuffer = TCyMemoryBuffer  # noqa
@@ -66,6 +80,10 @@ if CYTHON:
     TBufferedTransportFactory = TCyBufferedTransportFactory  # noqa
     TFramedTransport = TCyFramedTransport  # noqa
     TFramedTransportFactory = TCyFramedTransportFactory  # noqa
+    THeaderTransport = TCyHeaderTransport  # noqa
+    THeaderTransportFactory = TCyHeaderTransportFactory  # noqa
+    TZlibTransport = TCyZlibTransport  # noqa
+    TZlibTransportFactory = TCyZlibTransportFactory  # noqa
 else:
     # disable cython binary protocol for PYPY since it's slower.
     TCyMemoryBuffer = TMemoryBuffer
@@ -73,6 +91,10 @@ else:
     TCyBufferedTransportFactory = TBufferedTransportFactory
     TCyFramedTransport = TFramedTransport
     TCyFramedTransportFactory = TFramedTransportFactory
+    TCyHeaderTransport = THeaderTransport
+    TCyHeaderTransportFactory = THeaderTransportFactory
+    TCyZlibTransport = TZlibTransport
+    TCyZlibTransportFactory = TZlibTransportFactory
 
 __all__ = [
     'TSocketBase', 'TSocket', 'TServerSocket',
@@ -80,5 +102,9 @@ __all__ = [
     'TMemoryBuffer', 'TFramedTransport', 'TFramedTransportFactory',
     'TBufferedTransport', 'TBufferedTransportFactory', 'TCyMemoryBuffer',
     'TCyBufferedTransport', 'TCyBufferedTransportFactory',
-    'TCyFramedTransport', 'TCyFramedTransportFactory'
+    'TCyFramedTransport', 'TCyFramedTransportFactory',
+    'THeaderTransport', 'THeaderTransportFactory',
+    'TCyHeaderTransport', 'TCyHeaderTransportFactory',
+    'TZlibTransport', 'TZlibTransportFactory',
+    'TCyZlibTransport', 'TCyZlibTransportFactory'
     ]
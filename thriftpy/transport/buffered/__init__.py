@@ -21,6 +21,7 @@ class TBufferedTransport(TTransportBase):
         self.__wbuf = BytesIO()
         self.__rbuf = BytesIO(b"")
         self.__buf_size = buf_size
+        self.framed = getattr(trans, "framed", False)
 
     def is_open(self):
         return self.__trans.is_open()
@@ -41,6 +42,7 @@ class TBufferedTransport(TTransportBase):
 
     def write(self, buf):
         self.__wbuf.write(buf)
+        self.bytes_written += len(buf)
 
     def flush(self):
         out = self.__wbuf.getvalue()
@@ -54,8 +56,17 @@ class TBufferedTransport(TTransportBase):
 
 
 class TBufferedTransportFactory(object):
+    """Factory of buffered transports, `adaptive` is only meaningful to the
+    cython transport, python buffers don't outlive a message anyway.
+    """
+
+    def __init__(self, buf_size=TBufferedTransport.DEFAULT_BUFFER,
+                 adaptive=False):
+        self.buf_size = buf_size
+        self.adaptive = adaptive
+
     def get_transport(self, trans):
-        return TBufferedTransport(trans)
+        return TBufferedTransport(trans, self.buf_size)
 
 
 if CYTHON:
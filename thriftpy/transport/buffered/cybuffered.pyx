@@ -1,7 +1,8 @@
 from thriftpy.transport.cybase cimport (
     TCyBuffer,
     CyTransportBase,
-    DEFAULT_BUFFER
+    DEFAULT_BUFFER,
+    trans_send,
 )
 
 from .. import TTransportException
@@ -10,19 +11,26 @@ DEF MIN_BUFFER_SIZE = 1024
 
 
 cdef class TCyBufferedTransport(CyTransportBase):
-    """binary reader/writer"""
+    """binary reader/writer
+
+    The buffers grow to hold large messages, with `adaptive` they shrink
+    back to `buf_size` once a run of small messages went through.
+    """
 
     cdef:
         object trans
         TCyBuffer rbuf, wbuf
+        bint adaptive
 
-    def __init__(self, trans, int buf_size=DEFAULT_BUFFER):
+    def __init__(self, trans, int buf_size=DEFAULT_BUFFER, adaptive=False):
         if buf_size < MIN_BUFFER_SIZE:
             raise Exception("buffer too small")
 
         self.trans = trans
         self.rbuf = TCyBuffer(buf_size)
         self.wbuf = TCyBuffer(buf_size)
+        self.adaptive = adaptive
+        self.framed = getattr(trans, "framed", False)
 
     def clean(self):
         self.rbuf.clean()
@@ -38,19 +46,19 @@ cdef class TCyBufferedTransport(CyTransportBase):
         return self.trans.close()
 
     def write(self, bytes data):
-        cdef int sz = len(data)
+        cdef Py_ssize_t sz = len(data)
         return self.c_write(data, sz)
 
-    def read(self, int sz):
+    def read(self, Py_ssize_t sz):
         return self.get_string(sz)
 
     def flush(self):
         return self.c_flush()
 
-    cdef c_write(self, const char *data, int sz):
+    cdef c_write(self, const char *data, Py_ssize_t sz):
         cdef:
-            int cap = self.wbuf.buf_size - self.wbuf.data_size
-            int r
+            Py_ssize_t cap = self.wbuf.buf_size - self.wbuf.data_size
+            Py_ssize_t r
 
         if cap < sz:
             self.c_flush()
@@ -58,30 +66,48 @@ cdef class TCyBufferedTransport(CyTransportBase):
         r = self.wbuf.write(sz, data)
         if r == -1:
             raise MemoryError("Write to buffer error")
+        self.bytes_written += sz
+
+    cdef c_read(self, Py_ssize_t sz, char* out):
+        if sz <= 0:
+            return 0
 
-    cdef c_read(self, int sz, char* out):
         self.read_trans(sz, out)
+        self.bytes_read += sz
+        return sz
 
-    cdef read_trans(self, int sz, char *out):
-        cdef int i = self.rbuf.read_trans(self.trans, sz, out)
+    cdef read_trans(self, Py_ssize_t sz, char *out):
+        cdef Py_ssize_t i = self.rbuf.read_trans(self.trans, sz, out)
+        self.read_calls = self.rbuf.trans_reads
         if i == -1:
             raise TTransportException(TTransportException.END_OF_FILE,
                                       "End of file reading from transport")
-        elif i == -2:
-            raise MemoryError("grow read buffer fail")
 
     cdef c_flush(self):
-        cdef bytes data
         if self.wbuf.data_size > 0:
-            data = self.wbuf.buf[:self.wbuf.data_size]
-            self.trans.write(data)
+            trans_send(self.trans, NULL, 0, self.wbuf.buf, self.wbuf.data_size)
             self.trans.flush()
             self.wbuf.clean()
+            self.write_calls += 1
+
+        if self.adaptive:
+            self.rbuf.relax()
+            self.wbuf.relax()
 
     def getvalue(self):
         return self.trans.getvalue()
 
+    def stats(self):
+        stats = CyTransportBase.stats(self)
+        self.rbuf.add_stats(stats)
+        self.wbuf.add_stats(stats)
+        return stats
+
 
 class TCyBufferedTransportFactory(object):
+    def __init__(self, buf_size=DEFAULT_BUFFER, adaptive=False):
+        self.buf_size = buf_size
+        self.adaptive = adaptive
+
     def get_transport(self, trans):
-        return TCyBufferedTransport(trans)
+        return TCyBufferedTransport(trans, self.buf_size, self.adaptive)
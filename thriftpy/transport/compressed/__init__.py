@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""Transport compressing every flushed message with zlib.
+
+Each flush is sent as a block::
+
+    FLAG(1) | LENGTH(4) | DATA
+
+FLAG tells whether DATA is zlib compressed (1) or raw (0). Messages smaller
+than `min_size`, or which do not shrink, are sent raw so small calls don't pay
+for the compression. The transport can wrap a socket directly or another
+transport such as the framed one, in which case every block is one frame.
+"""
+
+from __future__ import absolute_import
+
+import struct
+import zlib
+from io import BytesIO
+
+from thriftpy._compat import CYTHON
+from .. import TTransportBase, TTransportException, readall
+from ..buffered import TBufferedTransport
+
+RAW = 0
+ZLIB = 1
+
+DEFAULT_LEVEL = 6
+DEFAULT_MIN_SIZE = 512
+
+
+def compress_block(data, level=DEFAULT_LEVEL, min_size=DEFAULT_MIN_SIZE):
+    flag = RAW
+    if len(data) >= min_size:
+        compressed = zlib.compress(data, level)
+        if len(compressed) < len(data):
+            flag, data = ZLIB, compressed
+
+    return struct.pack("!Bi", flag, len(data)) + data
+
+
+def read_block(read_fn):
+    flag, sz = struct.unpack("!Bi", readall(read_fn, 5))
+    if sz < 0:
+        raise TTransportException(TTransportException.UNKNOWN,
+                                  "Invalid block size %d" % sz)
+    if flag not in (RAW, ZLIB):
+        raise TTransportException(TTransportException.UNKNOWN,
+                                  "Invalid block flag %d" % flag)
+
+    data = readall(read_fn, sz)
+    if flag == ZLIB:
+        try:
+            data = zlib.decompress(data)
+        except zlib.error as e:
+            raise TTransportException(TTransportException.UNKNOWN,
+                                      "Bad compressed block: %s" % e)
+    return data
+
+
+class TZlibTransport(TTransportBase):
+    """Class that wraps another transport and compresses its I/O."""
+
+    def __init__(self, trans, level=DEFAULT_LEVEL, min_size=DEFAULT_MIN_SIZE):
+        self.__trans = trans
+        self.__rbuf = BytesIO()
+        self.__wbuf = BytesIO()
+        self.level = level
+        self.min_size = min_size
+        self.framed = getattr(trans, "framed", False)
+
+    def is_open(self):
+        return self.__trans.is_open()
+
+    def open(self):
+        return self.__trans.open()
+
+    def close(self):
+        return self.__trans.close()
+
+    def _read(self, sz):
+        ret = self.__rbuf.read(sz)
+        if len(ret) != 0:
+            return ret
+
+        self.__rbuf = BytesIO(read_block(self.__trans.read))
+        return self.__rbuf.read(sz)
+
+    def write(self, buf):
+        self.__wbuf.write(buf)
+        self.bytes_written += len(buf)
+
+    def flush(self):
+        data = self.__wbuf.getvalue()
+        if not data:
+            return
+        self.__wbuf = BytesIO()
+
+        self.__trans.write(compress_block(data, self.level, self.min_size))
+        self.__trans.flush()
+
+    def getvalue(self):
+        return self.__trans.getvalue()
+
+
+class TZlibTransportFactory(object):
+    """Factory of zlib transports, optionally wrapping the transports made
+    by `trans_factory`, e.g. a framed transport factory. Like the framed
+    factory, `buf_size` is only used by the cython transport.
+    """
+
+    def __init__(self, level=DEFAULT_LEVEL, min_size=DEFAULT_MIN_SIZE,
+                 trans_factory=None,
+                 buf_size=TBufferedTransport.DEFAULT_BUFFER):
+        self.level = level
+        self.min_size = min_size
+        self.trans_factory = trans_factory
+        self.buf_size = buf_size
+
+    def get_transport(self, trans):
+        if self.trans_factory is not None:
+            trans = self.trans_factory.get_transport(trans)
+        return TZlibTransport(trans, self.level, self.min_size)
+
+
+if CYTHON:
+    from .cycompressed import TCyZlibTransport, TCyZlibTransportFactory  # noqa
@@ -0,0 +1,117 @@
+from libc.string cimport memcpy
+
+from thriftpy.transport.cybase cimport (
+    TCyBuffer,
+    CyTransportBase,
+    DEFAULT_BUFFER,
+)
+
+from . import DEFAULT_LEVEL, DEFAULT_MIN_SIZE, compress_block, read_block
+
+
+cdef class TCyZlibTransport(CyTransportBase):
+    """Cython zlib transport, the messages are buffered in TCyBuffer and
+    compressed only when flushed.
+    """
+
+    cdef:
+        object trans
+        TCyBuffer rbuf, wbuf
+
+    cdef public:
+        int level, min_size
+
+    def __init__(self, trans, int level=DEFAULT_LEVEL,
+                 int min_size=DEFAULT_MIN_SIZE, int buf_size=DEFAULT_BUFFER):
+        self.trans = trans
+        self.level = level
+        self.min_size = min_size
+        self.rbuf = TCyBuffer(buf_size)
+        self.wbuf = TCyBuffer(buf_size)
+        self.framed = getattr(trans, "framed", False)
+
+    cdef c_read(self, Py_ssize_t sz, char *out):
+        cdef Py_ssize_t r
+
+        if sz == 0:
+            return 0
+
+        while self.rbuf.data_size < sz:
+            data = read_block(self.trans.read)
+            r = self.rbuf.write(len(data), data)
+            if r == -1:
+                raise MemoryError("Write to buffer error")
+
+        memcpy(out, self.rbuf.buf + self.rbuf.cur, sz)
+        self.rbuf.cur += sz
+        self.rbuf.data_size -= sz
+        self.bytes_read += sz
+
+        return sz
+
+    cdef c_write(self, const char *data, Py_ssize_t sz):
+        cdef Py_ssize_t r = self.wbuf.write(sz, data)
+        if r == -1:
+            raise MemoryError("Write to buffer error")
+        self.bytes_written += sz
+
+    cdef c_flush(self):
+        cdef bytes data
+
+        if self.wbuf.data_size > 0:
+            data = self.wbuf.buf[:self.wbuf.data_size]
+            self.wbuf.clean()
+
+            self.trans.write(compress_block(data, self.level, self.min_size))
+            self.trans.flush()
+
+    def read(self, Py_ssize_t sz):
+        return self.get_string(sz)
+
+    def write(self, bytes data):
+        cdef Py_ssize_t sz = len(data)
+        self.c_write(data, sz)
+
+    def flush(self):
+        self.c_flush()
+
+    def is_open(self):
+        return self.trans.is_open()
+
+    def open(self):
+        return self.trans.open()
+
+    def close(self):
+        return self.trans.close()
+
+    def clean(self):
+        self.rbuf.clean()
+        self.wbuf.clean()
+
+    def getvalue(self):
+        return self.trans.getvalue()
+
+    def stats(self):
+        stats = CyTransportBase.stats(self)
+        self.rbuf.add_stats(stats)
+        self.wbuf.add_stats(stats)
+        return stats
+
+
+class TCyZlibTransportFactory(object):
+    """Factory of cython zlib transports, optionally wrapping the transports
+    made by `trans_factory`, e.g. `TCyFramedTransportFactory`.
+    """
+
+    def __init__(self, level=DEFAULT_LEVEL, min_size=DEFAULT_MIN_SIZE,
+                 trans_factory=None, buf_size=DEFAULT_BUFFER):
+        self.level = level
+        self.min_size = min_size
+        self.trans_factory = trans_factory
+        self.buf_size = buf_size
+
+    def get_transport(self, trans):
+        if self.trans_factory is not None:
+            trans = self.trans_factory.get_transport(trans)
+        return TCyZlibTransport(trans, self.level, self.min_size,
+                                self.buf_size)
@@ -5,18 +5,41 @@ cdef enum:
 cdef class TCyBuffer(object):
     cdef:
         char *buf
-        int cur, buf_size, data_size
+        Py_ssize_t cur, buf_size, data_size
+
+        # reads from the underlying transport, grows and largest capacity
+        long long trans_reads
+        int grows, shrinks
+        Py_ssize_t peak_size
+
+        # adaptive sizing, see relax()
+        Py_ssize_t base_size, window_peak
+        int quiet
 
         void move_to_start(self)
         void clean(self)
-        int write(self, int sz, const char *value)
-        int grow(self, int min_size)
-        read_trans(self, trans, int sz, char *out)
+        Py_ssize_t write(self, Py_ssize_t sz, const char *value)
+        int grow(self, Py_ssize_t min_size)
+        int relax(self)
+        Py_ssize_t read_trans(self, trans, Py_ssize_t sz, char *out) except -3
+        add_stats(self, dict stats)
+
+
+cdef int trans_fd(trans) except -2
+cdef Py_ssize_t trans_recv(trans, int fd, char *out,
+                           Py_ssize_t sz) except -3
+cdef int trans_send(trans, const char *head, Py_ssize_t head_sz,
+                    const char *data, Py_ssize_t sz) except -1
+cdef void copy_bytes(char *dst, const char *src, Py_ssize_t sz)
 
 
 cdef class CyTransportBase(object):
-    cdef c_read(self, int sz, char* out)
-    cdef c_write(self, char* data, int sz)
+    cdef public long long bytes_read, bytes_written
+    cdef public long long read_calls, write_calls
+    cdef public bint framed
+
+    cdef c_read(self, Py_ssize_t sz, char* out)
+    cdef c_write(self, char* data, Py_ssize_t sz)
     cdef c_flush(self)
 
-    cdef get_string(self, int sz)
+    cdef get_string(self, Py_ssize_t sz)
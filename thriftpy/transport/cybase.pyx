@@ -1,17 +1,240 @@
+from libc.errno cimport errno, EINTR
 from libc.stdlib cimport malloc, free
 from libc.string cimport memcpy, memmove
+from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING
+
+
+cdef extern from "sys/types.h":
+    ctypedef long ssize_t
+
+
+cdef extern from "sys/socket.h":
+    ssize_t recv(int fd, void *buf, size_t n, int flags) nogil
+
+
+cdef extern from "sys/uio.h":
+    struct iovec:
+        void *iov_base
+        size_t iov_len
+
+    ssize_t writev(int fd, const iovec *iov, int iovcnt) nogil
+
+# Buffers are drawn from a pool of size classes, powers of two from 1KB up to
+# 4MB, and returned to it when released, so connection churn doesn't keep
+# hitting malloc and fragmenting the heap. Larger buffers are never pooled.
+DEF POOL_MIN_SHIFT = 10
+DEF POOL_CLASSES = 13
+DEF POOL_SLOTS = 64
+
+# Copies at least this large are done with the GIL released.
+DEF NOGIL_COPY = 65536
+
+# An adaptive buffer shrinks back to its initial size once this many
+# messages in a row used less than a quarter of it.
+DEF SHRINK_AFTER = 16
+
+cdef char *pool_bufs[POOL_CLASSES][POOL_SLOTS]
+cdef int pool_counts[POOL_CLASSES]
+cdef Py_ssize_t pool_retained = 0
+cdef Py_ssize_t pool_limit = 16 * 1024 * 1024
+cdef long long pool_hits = 0
+cdef long long pool_misses = 0
+
+
+cdef inline int pool_class(Py_ssize_t size):
+    cdef:
+        int cls = 0
+        Py_ssize_t cls_size = 1 << POOL_MIN_SHIFT
+
+    while cls < POOL_CLASSES and cls_size < size:
+        cls_size <<= 1
+        cls += 1
+    return cls
+
+
+cdef Py_ssize_t pool_capacity(Py_ssize_t size):
+    """Return the real capacity allocated for a buffer of `size` bytes."""
+    cdef:
+        int cls = pool_class(size)
+        Py_ssize_t largest = (1 << POOL_MIN_SHIFT) << (POOL_CLASSES - 1)
+
+    if cls < POOL_CLASSES:
+        return (1 << POOL_MIN_SHIFT) << cls
+
+    # beyond the pool, grow by steps of the largest class
+    return (size + largest - 1) // largest * largest
+
+
+cdef char *pool_alloc(Py_ssize_t capacity):
+    global pool_retained, pool_hits, pool_misses
+
+    cdef int cls = pool_class(capacity)
+
+    if cls < POOL_CLASSES and pool_counts[cls] > 0:
+        pool_counts[cls] -= 1
+        pool_retained -= capacity
+        pool_hits += 1
+        return pool_bufs[cls][pool_counts[cls]]
+
+    pool_misses += 1
+    return <char*>malloc(capacity)
+
+
+cdef void pool_free(char *buf, Py_ssize_t capacity):
+    global pool_retained
+
+    cdef int cls = pool_class(capacity)
+
+    if cls < POOL_CLASSES and pool_counts[cls] < POOL_SLOTS and \
+            pool_retained + capacity <= pool_limit:
+        pool_bufs[cls][pool_counts[cls]] = buf
+        pool_counts[cls] += 1
+        pool_retained += capacity
+    else:
+        free(buf)
+
+
+cdef void pool_trim(Py_ssize_t limit):
+    global pool_retained
+
+    cdef int cls = POOL_CLASSES - 1
+
+    # release the largest buffers first
+    while pool_retained > limit and cls >= 0:
+        if pool_counts[cls] == 0:
+            cls -= 1
+            continue
+
+        pool_counts[cls] -= 1
+        free(pool_bufs[cls][pool_counts[cls]])
+        pool_retained -= (1 << POOL_MIN_SHIFT) << cls
+
+
+def set_buffer_pool_limit(Py_ssize_t max_bytes):
+    """Cap the memory retained by the buffer pool, 0 disables pooling."""
+    global pool_limit
+
+    pool_limit = max_bytes
+    pool_trim(max_bytes)
+
+
+def clear_buffer_pool():
+    pool_trim(0)
+
+
+def buffer_pool_stats():
+    return {
+        "retained": pool_retained,
+        "limit": pool_limit,
+        "hits": pool_hits,
+        "misses": pool_misses,
+        "buffers": dict(((1 << POOL_MIN_SHIFT) << cls, pool_counts[cls])
+                        for cls in range(POOL_CLASSES) if pool_counts[cls]),
+    }
+
+
+cdef void copy_bytes(char *dst, const char *src, Py_ssize_t sz):
+    if sz >= NOGIL_COPY:
+        with nogil:
+            memcpy(dst, src, sz)
+    else:
+        memcpy(dst, src, sz)
+
+
+cdef int trans_fd(trans) except -2:
+    """Return the descriptor of a blocking socket transport, which is
+    read and written here with the GIL released, or -1.
+    """
+    blocking_fd = getattr(trans, "_blocking_fd", None)
+    if blocking_fd is None:
+        return -1
+    return blocking_fd()
+
+
+cdef Py_ssize_t trans_recv(trans, int fd, char *out,
+                           Py_ssize_t sz) except -3:
+    """Read at most `sz` bytes of `trans` into `out`, return the size read,
+    0 at end of file.
+    """
+    cdef Py_ssize_t n = -1
+
+    if fd >= 0:
+        with nogil:
+            while True:
+                n = recv(fd, out, sz, 0)
+                if n >= 0 or errno != EINTR:
+                    break
+
+        if n >= 0:
+            trans.read_calls += 1
+            trans.bytes_read += n
+            return n
+
+    # not a raw socket, or failed, let the transport read or raise
+    data = trans.read(sz)
+    n = len(data)
+    copy_bytes(out, <char*>data, n)
+    return n
+
+
+cdef int trans_send(trans, const char *head, Py_ssize_t head_sz,
+                    const char *data, Py_ssize_t sz) except -1:
+    """Write `head` followed by `data` to `trans` in one go."""
+    cdef:
+        int fd = trans_fd(trans)
+        iovec iov[2]
+        Py_ssize_t n, sent = 0, total = head_sz + sz
+
+    if fd >= 0:
+        iov[0].iov_base = <void*>head
+        iov[0].iov_len = head_sz
+        iov[1].iov_base = <void*>data
+        iov[1].iov_len = sz
+
+        with nogil:
+            while sent < total:
+                if sent < head_sz:
+                    iov[0].iov_base = <void*>(head + sent)
+                    iov[0].iov_len = head_sz - sent
+                    n = writev(fd, iov, 2)
+                else:
+                    iov[1].iov_base = <void*>(data + sent - head_sz)
+                    iov[1].iov_len = total - sent
+                    n = writev(fd, &iov[1], 1)
+
+                if n < 0:
+                    if errno == EINTR:
+                        continue
+                    break
+                sent += n
+
+        if sent:
+            trans.write_calls += 1
+            trans.bytes_written += sent
+        if sent == total:
+            return 0
+
+    # not a raw socket, or failed, let the transport write the rest or raise
+    if sent < head_sz:
+        trans.write(head[sent:head_sz] + data[:sz])
+    else:
+        trans.write(data[sent - head_sz:sz])
+    return 0
 
 
 cdef class TCyBuffer(object):
     def __cinit__(self, buf_size):
-        self.buf = <char*>malloc(buf_size)
-        self.buf_size = buf_size
+        self.buf_size = pool_capacity(buf_size)
+        self.buf = pool_alloc(self.buf_size)
+        if self.buf == NULL:
+            raise MemoryError("allocate buffer fail")
         self.cur = 0
         self.data_size = 0
+        self.peak_size = self.base_size = self.buf_size
 
     def __dealloc__(self):
         if self.buf != NULL:
-            free(self.buf)
+            pool_free(self.buf, self.buf_size)
             self.buf = NULL
 
     cdef void move_to_start(self):
@@ -22,10 +245,10 @@ cdef class TCyBuffer(object):
         self.cur = 0
         self.data_size = 0
 
-    cdef int write(self, int sz, const char *value):
+    cdef Py_ssize_t write(self, Py_ssize_t sz, const char *value):
         cdef:
-            int cap = self.buf_size - self.data_size
-            int remain = cap - self.cur
+            Py_ssize_t cap = self.buf_size - self.data_size
+            Py_ssize_t remain = cap - self.cur
 
         if remain < sz:
             self.move_to_start()
@@ -39,68 +262,115 @@ cdef class TCyBuffer(object):
 
         memcpy(self.buf + self.cur + self.data_size, value, sz)
         self.data_size += sz
+        if self.data_size > self.window_peak:
+            self.window_peak = self.data_size
 
         return sz
 
-    cdef read_trans(self, trans, int sz, char *out):
-        cdef int cap, new_data_len
-
-        if self.data_size < sz:
-            if self.buf_size < sz:
-                if self.grow(sz) != 0:
-                    return -2  # grow buffer error
-
-            cap = self.buf_size - self.data_size
+    cdef Py_ssize_t read_trans(self, trans, Py_ssize_t sz,
+                               char *out) except -3:
+        cdef:
+            Py_ssize_t got, n
+            int fd
 
-            new_data = trans.read(cap)
-            new_data_len = len(new_data)
+        if self.data_size < sz and self.buf_size < sz:
+            # larger than the buffer, hand out what is buffered and read
+            # the rest straight into `out` rather than growing the buffer
+            got = self.data_size
+            copy_bytes(out, self.buf + self.cur, got)
+            self.clean()
 
-            while new_data_len + self.data_size < sz:
-                more = trans.read(cap - new_data_len)
-                more_len = len(more)
-                if more_len <= 0:
+            fd = trans_fd(trans)
+            while got < sz:
+                n = trans_recv(trans, fd, out + got, sz - got)
+                self.trans_reads += 1
+                if n <= 0:
                     return -1  # end of file error
+                got += n
 
-                new_data += more
-                new_data_len += more_len
+            return sz
 
-            if cap - self.cur < new_data_len:
+        if self.data_size < sz:
+            if self.cur:
                 self.move_to_start()
 
-            memcpy(self.buf + self.cur + self.data_size, <char*>new_data,
-                   new_data_len)
-            self.data_size += new_data_len
+            # fill the free space of the buffer in place
+            fd = trans_fd(trans)
+            while self.data_size < sz:
+                n = trans_recv(trans, fd, self.buf + self.cur + self.data_size,
+                               self.buf_size - self.cur - self.data_size)
+                self.trans_reads += 1
+                if n <= 0:
+                    return -1  # end of file error
+                self.data_size += n
+
+            if self.data_size > self.window_peak:
+                self.window_peak = self.data_size
 
-        memcpy(out, self.buf + self.cur, sz)
+        copy_bytes(out, self.buf + self.cur, sz)
         self.cur += sz
         self.data_size -= sz
 
         return sz
 
-    cdef int grow(self, int min_size):
+    cdef int grow(self, Py_ssize_t min_size):
         if min_size <= self.buf_size:
             return 0
 
-        cdef int multiples = min_size / self.buf_size
-        if min_size % self.buf_size != 0:
-            multiples += 1
-
-        cdef int new_size = self.buf_size * multiples
-        cdef char *new_buf = <char*>malloc(new_size)
+        cdef Py_ssize_t new_size = pool_capacity(min_size)
+        cdef char *new_buf = pool_alloc(new_size)
         if new_buf == NULL:
             return -1
         memcpy(new_buf + self.cur, self.buf + self.cur, self.data_size)
-        free(self.buf)
+        pool_free(self.buf, self.buf_size)
         self.buf_size = new_size
         self.buf = new_buf
+        self.grows += 1
+        if new_size > self.peak_size:
+            self.peak_size = new_size
+        return 0
+
+    cdef int relax(self):
+        """Called between messages, shrink a grown buffer back to its
+        initial size after SHRINK_AFTER small messages in a row.
+        """
+        cdef char *new_buf
+
+        if self.window_peak * 4 > self.buf_size:
+            self.quiet = 0
+        else:
+            self.quiet += 1
+        self.window_peak = self.data_size
+
+        if self.buf_size <= self.base_size or self.quiet < SHRINK_AFTER or \
+                self.data_size > self.base_size:
+            return 0
+
+        new_buf = pool_alloc(self.base_size)
+        if new_buf == NULL:
+            return -1
+        memcpy(new_buf, self.buf + self.cur, self.data_size)
+        pool_free(self.buf, self.buf_size)
+        self.buf = new_buf
+        self.buf_size = self.base_size
+        self.cur = 0
+        self.quiet = 0
+        self.shrinks += 1
         return 0
 
+    cdef add_stats(self, dict stats):
+        stats["buffer_grows"] = stats.get("buffer_grows", 0) + self.grows
+        stats["buffer_shrinks"] = stats.get("buffer_shrinks", 0) + \
+            self.shrinks
+        stats["peak_buffer_size"] = max(stats.get("peak_buffer_size", 0),
+                                        self.peak_size)
+
 
 cdef class CyTransportBase(object):
-    cdef c_read(self, int sz, char* out):
+    cdef c_read(self, Py_ssize_t sz, char* out):
         pass
 
-    cdef c_write(self, char* data, int sz):
+    cdef c_write(self, char* data, Py_ssize_t sz):
         pass
 
     cdef c_flush(self):
@@ -109,18 +379,30 @@ cdef class CyTransportBase(object):
     def clean(self):
         pass
 
-    cdef get_string(self, int sz):
+    def stats(self):
+        """Return the counters of the transport, the reads and writes are
+        the calls made to the underlying transport.
+        """
+        return {
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "read_calls": self.read_calls,
+            "write_calls": self.write_calls,
+        }
+
+    cdef get_string(self, Py_ssize_t sz):
         cdef:
             char out[STACK_STRING_LEN]
-            char *dy_out
-
-        if sz > STACK_STRING_LEN:
-            dy_out = <char*>malloc(sz)
-            try:
-                size = self.c_read(sz, dy_out)
-                return dy_out[:size]
-            finally:
-                free(dy_out)
-        else:
+            bytes result
+            Py_ssize_t size
+
+        if sz <= STACK_STRING_LEN:
             size = self.c_read(sz, out)
             return out[:size]
+
+        # read large strings in place instead of through a temporary buffer
+        result = PyBytes_FromStringAndSize(NULL, sz)
+        size = self.c_read(sz, PyBytes_AS_STRING(result))
+        if size < sz:
+            return result[:size]
+        return result
@@ -8,10 +8,14 @@ from io import BytesIO
 from thriftpy._compat import CYTHON
 from .. import TTransportBase, readall
 from ..buffered import TBufferedTransport
+from ..header import decode_frame, is_header_frame
 
 
 class TFramedTransport(TTransportBase):
     """Class that wraps another transport and frames its I/O when writing."""
+
+    framed = True
+
     def __init__(self, trans):
         self.__trans = trans
         self.__rbuf = BytesIO()
@@ -32,16 +36,19 @@ class TFramedTransport(TTransportBase):
             return b''
 
         ret = self.__rbuf.read(sz)
-        if len(ret) != 0:
-            return ret
+        if len(ret) == 0:
+            self.read_frame()
+            ret = self.__rbuf.read(sz)
 
-        self.read_frame()
-        return self.__rbuf.read(sz)
+        self.bytes_read += len(ret)
+        return ret
 
     def read_frame(self):
         buff = readall(self.__trans.read, 4)
         sz, = struct.unpack('!i', buff)
         frame = readall(self.__trans.read, sz)
+        if is_header_frame(frame):
+            frame = decode_frame(frame)[0]
         self.__rbuf = BytesIO(frame)
 
     def write(self, buf):
@@ -54,6 +61,7 @@ class TFramedTransport(TTransportBase):
         towrite = struct.pack("!i", wsz) + buf
         self.__trans.write(towrite)
         self.__trans.flush()
+        self.bytes_written += wsz
 
     def flush(self):
         pass
@@ -63,8 +71,17 @@ class TFramedTransport(TTransportBase):
 
 
 class TFramedTransportFactory(object):
+    """Factory of framed transports behind a buffer of `buf_size`, like
+    the buffered factory `adaptive` is only used by the cython transport.
+    """
+
+    def __init__(self, buf_size=TBufferedTransport.DEFAULT_BUFFER,
+                 adaptive=False):
+        self.buf_size = buf_size
+        self.adaptive = adaptive
+
     def get_transport(self, trans):
-        return TBufferedTransport(TFramedTransport(trans))
+        return TBufferedTransport(TFramedTransport(trans), self.buf_size)
 
 
 if CYTHON:
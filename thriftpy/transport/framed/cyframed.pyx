@@ -1,15 +1,17 @@
-from libc.stdlib cimport malloc, free
 from libc.string cimport memcpy
 from libc.stdint cimport int32_t
+from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING
 
 from thriftpy.transport.cybase cimport (
     TCyBuffer,
     CyTransportBase,
     DEFAULT_BUFFER,
-    STACK_STRING_LEN
+    copy_bytes,
+    trans_send,
 )
 
 from .. import TTransportException
+from ..header import decode_frame
 
 
 cdef extern from "../../protocol/cybin/endian_port.h":
@@ -18,85 +20,125 @@ cdef extern from "../../protocol/cybin/endian_port.h":
 
 
 cdef class TCyFramedTransport(CyTransportBase):
+    """Framed transport, with `adaptive` the buffers grown for large frames
+    shrink back to `buf_size` once a run of small frames went through.
+
+    Frames are read through as their payload is asked for, a large frame is
+    never held in memory as a whole.
+    """
+
     cdef:
         object trans
         TCyBuffer rbuf, rframe_buf, wframe_buf
+        bint adaptive
+
+        # payload of the current frame not read from the transport yet
+        Py_ssize_t frame_remaining
+
+    cdef public long long frames_read, frames_written
 
-    def __init__(self, trans, int buf_size=DEFAULT_BUFFER):
+    def __init__(self, trans, int buf_size=DEFAULT_BUFFER, adaptive=False):
         self.trans = trans
         self.rbuf = TCyBuffer(buf_size)
         self.rframe_buf = TCyBuffer(buf_size)
         self.wframe_buf = TCyBuffer(buf_size)
+        self.adaptive = adaptive
+        self.frame_remaining = 0
+        self.framed = True
 
-    cdef read_trans(self, int sz, char *out):
-        cdef int i = self.rbuf.read_trans(self.trans, sz, out)
+    cdef read_trans(self, Py_ssize_t sz, char *out):
+        cdef Py_ssize_t i = self.rbuf.read_trans(self.trans, sz, out)
+        self.read_calls = self.rbuf.trans_reads
         if i == -1:
             raise TTransportException(TTransportException.END_OF_FILE,
                                       "End of file reading from transport")
-        elif i == -2:
-            raise MemoryError("grow buffer fail")
 
-    cdef write_rframe_buffer(self, const char *data, int sz):
-        cdef int r = self.rframe_buf.write(sz, data)
-        if r == -1:
+    cdef write_rframe_buffer(self, const char *data, Py_ssize_t sz):
+        if self.rframe_buf.write(sz, data) == -1:
             raise MemoryError("Write to buffer error")
 
-    cdef c_read(self, int sz, char *out):
-        if sz == 0:
-            return 0
-
-        while self.rframe_buf.data_size < sz:
-            self.read_frame()
-
-        memcpy(out, self.rframe_buf.buf + self.rframe_buf.cur, sz)
-        self.rframe_buf.cur += sz
-        self.rframe_buf.data_size -= sz
-
+    cdef c_read(self, Py_ssize_t sz, char *out):
+        cdef Py_ssize_t n, got = 0
+
+        while got < sz:
+            if self.rframe_buf.data_size > 0:
+                n = min(self.rframe_buf.data_size, sz - got)
+                copy_bytes(out + got, self.rframe_buf.buf + self.rframe_buf.cur,
+                           n)
+                self.rframe_buf.cur += n
+                self.rframe_buf.data_size -= n
+            elif self.frame_remaining > 0:
+                n = min(self.frame_remaining, sz - got)
+                self.read_trans(n, out + got)
+                self.frame_remaining -= n
+            else:
+                self.read_frame()
+                continue
+
+            got += n
+
+        self.bytes_read += sz
         return sz
 
-    cdef c_write(self, const char *data, int sz):
+    cdef c_write(self, const char *data, Py_ssize_t sz):
         self.wframe_buf.write(sz, data)
+        self.bytes_written += sz
 
     cdef read_frame(self):
         cdef:
             char frame_len[4]
-            char stack_frame[STACK_STRING_LEN]
-            char *dy_frame
+            char magic[2]
             int32_t frame_size
+            bytes frame
 
         self.read_trans(4, frame_len)
         frame_size = be32toh((<int32_t*>frame_len)[0])
+        if frame_size < 0:
+            raise TTransportException(TTransportException.UNKNOWN,
+                                      "Invalid frame size %d" % frame_size)
+        self.frames_read += 1
+
+        if frame_size >= 10:
+            self.read_trans(2, magic)
 
-        if frame_size <= STACK_STRING_LEN:
-            self.read_trans(frame_size, stack_frame)
-            self.write_rframe_buffer(stack_frame, frame_size)
-        else:
-            dy_frame = <char*>malloc(frame_size)
-            try:
-                self.read_trans(frame_size, dy_frame)
-                self.write_rframe_buffer(dy_frame, frame_size)
-            finally:
-                free(dy_frame)
+            # frames sent by the header transport carry headers before
+            # payload, they are decoded as a whole
+            if magic[0] == 0x0f and <unsigned char>magic[1] == 0xff:
+                frame = PyBytes_FromStringAndSize(NULL, frame_size)
+                memcpy(PyBytes_AS_STRING(frame), magic, 2)
+                self.read_trans(frame_size - 2, PyBytes_AS_STRING(frame) + 2)
+
+                payload = decode_frame(frame)[0]
+                self.write_rframe_buffer(payload, len(payload))
+                return
+
+            self.write_rframe_buffer(magic, 2)
+            frame_size -= 2
+
+        self.frame_remaining = frame_size
 
     cdef c_flush(self):
-        cdef:
-            bytes data
-            char *size_str
+        cdef int32_t size
 
         if self.wframe_buf.data_size > 0:
-            data = self.wframe_buf.buf[:self.wframe_buf.data_size]
             size = htobe32(self.wframe_buf.data_size)
-            size_str = <char*>(&size)
-
-            self.trans.write(size_str[:4] + data)
+            trans_send(self.trans, <char*>(&size), 4, self.wframe_buf.buf,
+                       self.wframe_buf.data_size)
             self.trans.flush()
             self.wframe_buf.clean()
+            self.write_calls += 1
+            self.frames_written += 1
+
+        if self.adaptive:
+            self.rbuf.relax()
+            self.rframe_buf.relax()
+            self.wframe_buf.relax()
 
-    def read(self, int sz):
+    def read(self, Py_ssize_t sz):
         return self.get_string(sz)
 
     def write(self, bytes data):
-        cdef int sz = len(data)
+        cdef Py_ssize_t sz = len(data)
         self.c_write(data, sz)
 
     def flush(self):
@@ -115,8 +157,22 @@ cdef class TCyFramedTransport(CyTransportBase):
         self.rbuf.clean()
         self.rframe_buf.clean()
         self.wframe_buf.clean()
+        self.frame_remaining = 0
+
+    def stats(self):
+        stats = CyTransportBase.stats(self)
+        stats["frames_read"] = self.frames_read
+        stats["frames_written"] = self.frames_written
+        self.rbuf.add_stats(stats)
+        self.rframe_buf.add_stats(stats)
+        self.wframe_buf.add_stats(stats)
+        return stats
 
 
 class TCyFramedTransportFactory(object):
+    def __init__(self, buf_size=DEFAULT_BUFFER, adaptive=False):
+        self.buf_size = buf_size
+        self.adaptive = adaptive
+
     def get_transport(self, trans):
-        return TCyFramedTransport(trans)
+        return TCyFramedTransport(trans, self.buf_size, self.adaptive)
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+"""Header transport compatible with Apache Thrift's THeaderTransport.
+
+Every message is sent as a frame carrying a small header section before the
+payload::
+
+    LENGTH(4) | MAGIC(2) | FLAGS(2) | SEQID(4) | HEADER SIZE / 4 (2) |
+    PROTOCOL ID(varint) | NUM TRANSFORMS(varint) | TRANSFORM IDS(varint)... |
+    INFO HEADERS... | PADDING | PAYLOAD
+
+The info headers are string key/value pairs, which is a cheap way to carry
+request ids, deadlines or priorities along with the call. The payload may be
+compressed by the zlib transform.
+
+Since the message is still length prefixed, header frames can also be read by
+the framed transports, and header transports read plain framed messages.
+"""
+
+from __future__ import absolute_import
+
+import struct
+import zlib
+from io import BytesIO
+
+from thriftpy._compat import CYTHON
+from .. import TTransportBase, TTransportException, readall
+from ..buffered import TBufferedTransport
+
+HEADER_MAGIC = 0x0FFF
+
+BINARY_PROTOCOL = 0
+
+ZLIB_TRANSFORM = 1
+
+INFO_KEYVALUE = 1
+INFO_PKEYVALUE = 2
+
+
+def write_varint(buf, n):
+    while n > 0x7f:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def read_varint(data, pos):
+    result = shift = 0
+    while True:
+        if pos >= len(data):
+            raise TTransportException(message="Truncated header varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def write_string(buf, s):
+    if not isinstance(s, bytes):
+        s = s.encode("utf-8")
+    write_varint(buf, len(s))
+    buf.extend(s)
+
+
+def read_string(data, pos):
+    size, pos = read_varint(data, pos)
+    if pos + size > len(data):
+        raise TTransportException(message="Truncated header string")
+    return bytes(data[pos:pos + size]).decode("utf-8"), pos + size
+
+
+def is_header_frame(frame):
+    return len(frame) >= 10 and frame[:2] == b'\x0f\xff'
+
+
+def apply_transforms(payload, transforms):
+    for transform in transforms:
+        if transform == ZLIB_TRANSFORM:
+            payload = zlib.compress(payload)
+        else:
+            raise TTransportException(
+                message="Unsupported header transform %d" % transform)
+    return payload
+
+
+def reverse_transforms(payload, transforms):
+    for transform in reversed(transforms):
+        if transform == ZLIB_TRANSFORM:
+            payload = zlib.decompress(payload)
+        else:
+            raise TTransportException(
+                message="Unsupported header transform %d" % transform)
+    return payload
+
+
+def encode_frame(payload, seqid=0, flags=0, transforms=(), headers=None,
+                 persistent_headers=None):
+    """Build a complete header frame, including its length prefix."""
+    header = bytearray()
+    write_varint(header, BINARY_PROTOCOL)
+    write_varint(header, len(transforms))
+    for transform in transforms:
+        write_varint(header, transform)
+
+    for info_type, info in ((INFO_KEYVALUE, headers),
+                            (INFO_PKEYVALUE, persistent_headers)):
+        if not info:
+            continue
+        write_varint(header, info_type)
+        write_varint(header, len(info))
+        for key, value in info.items():
+            write_string(header, key)
+            write_string(header, value)
+
+    # the header section is padded to a multiple of 4 bytes
+    header.extend(b'\x00' * (-len(header) % 4))
+
+    payload = apply_transforms(payload, transforms)
+    frame_size = 10 + len(header) + len(payload)
+    return b''.join([
+        struct.pack("!iHHiH", frame_size, HEADER_MAGIC, flags, seqid,
+                    len(header) // 4),
+        bytes(header),
+        payload,
+    ])
+
+
+def decode_frame(frame):
+    """Parse a header frame without its length prefix.
+
+    Return a tuple of (payload, seqid, flags, transforms, headers), plain
+    framed messages are returned as the payload with no headers.
+    """
+    if not is_header_frame(frame):
+        return frame, 0, 0, [], {}
+
+    _, flags, seqid, header_words = struct.unpack("!HHiH", frame[:10])
+    end = 10 + header_words * 4
+    if end > len(frame):
+        raise TTransportException(message="Header size is out of bounds")
+
+    # the header section is parsed alone, so it can't run into the payload
+    data = bytearray(frame[:end])
+
+    protocol_id, pos = read_varint(data, 10)
+    if protocol_id != BINARY_PROTOCOL:
+        raise TTransportException(
+            message="Unsupported header protocol %d" % protocol_id)
+
+    transforms = []
+    num_transforms, pos = read_varint(data, pos)
+    for _ in range(num_transforms):
+        transform, pos = read_varint(data, pos)
+        transforms.append(transform)
+
+    headers = {}
+    while pos < end:
+        info_type, pos = read_varint(data, pos)
+        if info_type not in (INFO_KEYVALUE, INFO_PKEYVALUE):
+            # 0 is padding, other info types are not supported, and both
+            # end the header section.
+            break
+
+        count, pos = read_varint(data, pos)
+        for _ in range(count):
+            key, pos = read_string(data, pos)
+            value, pos = read_string(data, pos)
+            headers[key] = value
+
+    payload = reverse_transforms(frame[end:], transforms)
+    return payload, seqid, flags, transforms, headers
+
+
+class THeaderTransport(TTransportBase):
+    """Framed transport carrying key/value headers with every message.
+
+    Headers set by `set_header` are sent with the next flushed message only,
+    persistent headers are sent with every message. The headers of the last
+    received message are available from `get_headers`.
+    """
+
+    framed = True
+
+    def __init__(self, trans, transforms=None):
+        self.__trans = trans
+        self.__rbuf = BytesIO()
+        self.__wbuf = BytesIO()
+
+        self.transforms = list(transforms or [])
+        self.seqid = 0
+        self.flags = 0
+
+        self._write_headers = {}
+        self._persistent_headers = {}
+        self._read_headers = {}
+
+    def is_open(self):
+        return self.__trans.is_open()
+
+    def open(self):
+        return self.__trans.open()
+
+    def close(self):
+        return self.__trans.close()
+
+    def set_header(self, key, value):
+        self._write_headers[key] = value
+
+    def set_persistent_header(self, key, value):
+        self._persistent_headers[key] = value
+
+    def get_headers(self):
+        return self._read_headers
+
+    def add_transform(self, transform):
+        self.transforms.append(transform)
+
+    def _read(self, sz):
+        ret = self.__rbuf.read(sz)
+        if len(ret) != 0:
+            return ret
+
+        self.read_frame()
+        return self.__rbuf.read(sz)
+
+    def read_frame(self):
+        sz, = struct.unpack('!i', readall(self.__trans.read, 4))
+        if sz < 0:
+            raise TTransportException(TTransportException.UNKNOWN,
+                                      "Invalid frame size %d" % sz)
+        frame = readall(self.__trans.read, sz)
+
+        payload, self.seqid, self.flags, _, self._read_headers = \
+            decode_frame(frame)
+        self.__rbuf = BytesIO(payload)
+
+    def write(self, buf):
+        self.__wbuf.write(buf)
+        self.bytes_written += len(buf)
+
+    def flush(self):
+        payload = self.__wbuf.getvalue()
+        if not payload:
+            return
+        self.__wbuf = BytesIO()
+
+        frame = encode_frame(payload, self.seqid, self.flags, self.transforms,
+                             self._write_headers, self._persistent_headers)
+        self._write_headers = {}
+
+        self.__trans.write(frame)
+        self.__trans.flush()
+
+    def getvalue(self):
+        return self.__trans.getvalue()
+
+
+class THeaderTransportFactory(object):
+    """Factory of header transports, `buf_size` is only used by the cython
+    transport.
+    """
+
+    def __init__(self, transforms=None,
+                 buf_size=TBufferedTransport.DEFAULT_BUFFER):
+        self.transforms = transforms
+        self.buf_size = buf_size
+
+    def get_transport(self, trans):
+        return THeaderTransport(trans, self.transforms)
+
+
+if CYTHON:
+    from .cyheader import TCyHeaderTransport, TCyHeaderTransportFactory  # noqa
@@ -0,0 +1,161 @@
+from libc.stdint cimport int32_t
+from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING
+
+from thriftpy.transport.cybase cimport (
+    TCyBuffer,
+    CyTransportBase,
+    DEFAULT_BUFFER,
+    copy_bytes,
+    trans_send,
+)
+
+from .. import TTransportException
+from . import decode_frame, encode_frame
+
+
+cdef extern from "../../protocol/cybin/endian_port.h":
+    int32_t be32toh(int32_t n)
+
+
+cdef class TCyHeaderTransport(CyTransportBase):
+    """Framed transport carrying key/value headers with every message."""
+
+    cdef:
+        object trans
+        TCyBuffer rbuf, rframe_buf, wframe_buf
+        dict _write_headers, _persistent_headers, _read_headers
+
+    cdef public:
+        list transforms
+        int32_t seqid
+        int flags
+
+    def __init__(self, trans, transforms=None, int buf_size=DEFAULT_BUFFER):
+        self.trans = trans
+        self.rbuf = TCyBuffer(buf_size)
+        self.rframe_buf = TCyBuffer(buf_size)
+        self.wframe_buf = TCyBuffer(buf_size)
+        self.framed = True
+
+        self.transforms = list(transforms or [])
+        self.seqid = 0
+        self.flags = 0
+
+        self._write_headers = {}
+        self._persistent_headers = {}
+        self._read_headers = {}
+
+    def set_header(self, key, value):
+        self._write_headers[key] = value
+
+    def set_persistent_header(self, key, value):
+        self._persistent_headers[key] = value
+
+    def get_headers(self):
+        return self._read_headers
+
+    def add_transform(self, transform):
+        self.transforms.append(transform)
+
+    cdef read_trans(self, Py_ssize_t sz, char *out):
+        cdef Py_ssize_t i = self.rbuf.read_trans(self.trans, sz, out)
+        if i == -1:
+            raise TTransportException(TTransportException.END_OF_FILE,
+                                      "End of file reading from transport")
+
+    cdef c_read(self, Py_ssize_t sz, char *out):
+        if sz == 0:
+            return 0
+
+        while self.rframe_buf.data_size < sz:
+            self.read_frame()
+
+        copy_bytes(out, self.rframe_buf.buf + self.rframe_buf.cur, sz)
+        self.rframe_buf.cur += sz
+        self.rframe_buf.data_size -= sz
+        self.bytes_read += sz
+
+        return sz
+
+    cdef c_write(self, const char *data, Py_ssize_t sz):
+        cdef Py_ssize_t r = self.wframe_buf.write(sz, data)
+        if r == -1:
+            raise MemoryError("Write to buffer error")
+        self.bytes_written += sz
+
+    cdef read_frame(self):
+        cdef:
+            char frame_len[4]
+            int32_t frame_size
+            bytes frame
+            Py_ssize_t r
+
+        self.read_trans(4, frame_len)
+        frame_size = be32toh((<int32_t*>frame_len)[0])
+        if frame_size < 0:
+            raise TTransportException(TTransportException.UNKNOWN,
+                                      "Invalid frame size %d" % frame_size)
+
+        frame = PyBytes_FromStringAndSize(NULL, frame_size)
+        self.read_trans(frame_size, PyBytes_AS_STRING(frame))
+
+        payload, self.seqid, self.flags, _, self._read_headers = \
+            decode_frame(frame)
+
+        r = self.rframe_buf.write(len(payload), payload)
+        if r == -1:
+            raise MemoryError("Write to buffer error")
+
+    cdef c_flush(self):
+        cdef bytes data
+
+        if self.wframe_buf.data_size > 0:
+            data = self.wframe_buf.buf[:self.wframe_buf.data_size]
+            frame = encode_frame(data, self.seqid, self.flags,
+                                 self.transforms, self._write_headers,
+                                 self._persistent_headers)
+            self._write_headers = {}
+
+            trans_send(self.trans, NULL, 0, frame, len(frame))
+            self.trans.flush()
+            self.wframe_buf.clean()
+
+    def read(self, Py_ssize_t sz):
+        return self.get_string(sz)
+
+    def write(self, bytes data):
+        cdef Py_ssize_t sz = len(data)
+        self.c_write(data, sz)
+
+    def flush(self):
+        self.c_flush()
+
+    def is_open(self):
+        return self.trans.is_open()
+
+    def open(self):
+        return self.trans.open()
+
+    def close(self):
+        return self.trans.close()
+
+    def stats(self):
+        stats = CyTransportBase.stats(self)
+        self.rbuf.add_stats(stats)
+        self.rframe_buf.add_stats(stats)
+        self.wframe_buf.add_stats(stats)
+        return stats
+
+    def clean(self):
+        self.rbuf.clean()
+        self.rframe_buf.clean()
+        self.wframe_buf.clean()
+
+
+class TCyHeaderTransportFactory(object):
+    def __init__(self, transforms=None, buf_size=DEFAULT_BUFFER):
+        self.transforms = transforms
+        self.buf_size = buf_size
+
+    def get_transport(self, trans):
+        return TCyHeaderTransport(trans, self.transforms, self.buf_size)
@@ -29,7 +29,9 @@ class TMemoryBuffer(TTransportBase):
         self._buffer.close()
 
     def read(self, sz):
-        return self._read(sz)
+        res = self._read(sz)
+        self.bytes_read += len(res)
+        return res
 
     def _read(self, sz):
         orig_pos = self._buffer.tell()
@@ -41,6 +43,7 @@ class TMemoryBuffer(TTransportBase):
 
     def write(self, buf):
         self._buffer.write(buf)
+        self.bytes_written += len(buf)
 
     def flush(self):
         pass
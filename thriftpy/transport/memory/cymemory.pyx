@@ -1,5 +1,5 @@
 from libc.string cimport memcpy
-from libc.stdlib cimport malloc, free
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE
 from thriftpy.transport.cybase cimport (
     TCyBuffer,
     CyTransportBase,
@@ -23,7 +23,7 @@ cdef class TCyMemoryBuffer(CyTransportBase):
         if value:
             self.setvalue(value)
 
-    cdef c_read(self, int sz, char* out):
+    cdef c_read(self, Py_ssize_t sz, char* out):
         if self.buf.data_size < sz:
             sz = self.buf.data_size
 
@@ -33,29 +33,25 @@ cdef class TCyMemoryBuffer(CyTransportBase):
             memcpy(out, self.buf.buf + self.buf.cur, sz)
             self.buf.cur += sz
             self.buf.data_size -= sz
+            self.bytes_read += sz
 
         return sz
 
-    cdef c_write(self, const char* data, int sz):
-        cdef int r = self.buf.write(sz, data)
+    cdef c_write(self, const char* data, Py_ssize_t sz):
+        cdef Py_ssize_t r = self.buf.write(sz, data)
         if r == -1:
             raise MemoryError("Write to memory error")
+        self.bytes_written += sz
 
     cdef _getvalue(self):
-        cdef char *out
-        cdef int size = self.buf.data_size
+        cdef Py_ssize_t size = self.buf.data_size
 
         if size <= 0:
             return b''
 
-        out = <char*>malloc(size)
-        try:
-            memcpy(out, self.buf.buf + self.buf.cur, size)
-            return out[:size]
-        finally:
-            free(out)
+        return self.buf.buf[self.buf.cur:self.buf.cur + size]
 
-    cdef _setvalue(self, int sz, const char *value):
+    cdef _setvalue(self, Py_ssize_t sz, const char *value):
         self.buf.clean()
         self.buf.write(sz, value)
 
@@ -65,7 +61,7 @@ cdef class TCyMemoryBuffer(CyTransportBase):
     def write(self, data):
         data = to_bytes(data)
 
-        cdef int sz = len(data)
+        cdef Py_ssize_t sz = len(data)
         return self.c_write(data, sz)
 
     def is_open(self):
@@ -86,6 +82,20 @@ cdef class TCyMemoryBuffer(CyTransportBase):
     def getvalue(self):
         return self._getvalue()
 
+    def stats(self):
+        stats = CyTransportBase.stats(self)
+        self.buf.add_stats(stats)
+        return stats
+
     def setvalue(self, value):
+        """Copy `value`, a string or any contiguous buffer, into the
+        buffer.
+        """
+        cdef Py_buffer view
+
         value = to_bytes(value)
-        self._setvalue(len(value), value)
+        PyObject_GetBuffer(value, &view, PyBUF_SIMPLE)
+        try:
+            self._setvalue(view.len, <const char *>view.buf)
+        finally:
+            PyBuffer_Release(&view)
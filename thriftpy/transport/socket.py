@@ -31,7 +31,16 @@ class TSocketBase(TTransportBase):
 
 
 class TSocket(TSocketBase):
-    """Socket implementation of TTransport base."""
+    """Socket implementation of TTransport base.
+
+    Besides the bytes, the socket counts its recv and send calls in
+    `read_calls` and `write_calls`, returned along by `stats()`.
+
+    The cython transports recv and send on a blocking socket directly with
+    the GIL released, bypassing `read` and `write`.
+    """
+
+    read_calls = write_calls = 0
 
     def __init__(self, host='localhost', port=9090, unix_socket=None):
         """Initialize a TSocket
@@ -82,6 +91,7 @@ class TSocket(TSocketBase):
                                       message=message)
 
     def read(self, sz):
+        self.read_calls += 1
         try:
             buff = self.handle.recv(sz)
         except socket.error as e:
@@ -100,17 +110,36 @@ class TSocket(TSocketBase):
         if len(buff) == 0:
             raise TTransportException(type=TTransportException.END_OF_FILE,
                                       message='TSocket read 0 bytes')
+        self.bytes_read += len(buff)
         return buff
 
+    def _blocking_fd(self):
+        """Return the descriptor of the socket if it is open without a
+        timeout, or -1.
+        """
+        if self.handle is None or self.handle.gettimeout() is not None:
+            return -1
+        return self.handle.fileno()
+
     def write(self, buff):
         if not self.handle:
             raise TTransportException(type=TTransportException.NOT_OPEN,
                                       message='Transport not open')
         self.handle.sendall(buff)
+        self.write_calls += 1
+        self.bytes_written += len(buff)
 
     def flush(self):
         pass
 
+    def stats(self):
+        return {
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "read_calls": self.read_calls,
+            "write_calls": self.write_calls,
+        }
+
 
 class TServerSocket(TSocketBase):
     """Socket implementation of TServerTransport base."""
@@ -3,8 +3,11 @@
 from __future__ import absolute_import
 
 import binascii
+import struct
 
+from .thrift import iter_struct, read_columns
 from .transport import TMemoryBuffer
+from .protocol import TCyBinaryProtocolFactory
 from .protocol.binary import TBinaryProtocolFactory
 
 
@@ -23,6 +26,90 @@ def deserialize(thrift_object, buf, proto_factory=TBinaryProtocolFactory()):
     return thrift_object
 
 
+def serialize_many(thrift_objects, proto_factory=TCyBinaryProtocolFactory(),
+                   length_prefixed=False):
+    """Serialize every object of `thrift_objects` through a single reused
+    buffer and protocol, returning the list of their bytes.
+
+    With `length_prefixed`, return a single bytes of them all instead, each
+    preceded by its length as a 4 bytes big endian integer.
+    """
+    transport = TMemoryBuffer()
+    protocol = proto_factory.get_protocol(transport)
+
+    result = []
+    for thrift_object in thrift_objects:
+        thrift_object.write(protocol)
+        protocol.write_message_end()
+        data = transport.getvalue()
+        transport.setvalue(b"")
+
+        if length_prefixed:
+            result.append(struct.pack("!i", len(data)))
+        result.append(data)
+
+    if length_prefixed:
+        return b"".join(result)
+    return result
+
+
+def _split_prefixed(buf):
+    pos, end = 0, len(buf)
+    while pos < end:
+        if end - pos < 4:
+            raise ValueError("Truncated length prefix at offset %d" % pos)
+        sz, = struct.unpack_from("!i", buf, pos)
+        pos += 4
+        if sz < 0 or pos + sz > end:
+            raise ValueError("Bad length %d at offset %d" % (sz, pos - 4))
+        yield buf[pos:pos + sz]
+        pos += sz
+
+
+def deserialize_many(thrift_class, bufs,
+                     proto_factory=TCyBinaryProtocolFactory(),
+                     length_prefixed=False):
+    """Deserialize a new `thrift_class` object from every bytes of `bufs`
+    through a single reused buffer and protocol, returning the list of them.
+
+    With `length_prefixed`, `bufs` is a single bytes as returned by
+    `serialize_many` with `length_prefixed`.
+    """
+    transport = TMemoryBuffer()
+    protocol = proto_factory.get_protocol(transport)
+
+    if length_prefixed:
+        bufs = _split_prefixed(bufs)
+
+    result = []
+    for buf in bufs:
+        transport.setvalue(buf)
+        thrift_object = thrift_class()
+        thrift_object.read(protocol)
+        result.append(thrift_object)
+    return result
+
+
+def deserialize_iter(thrift_object, buf, name,
+                     proto_factory=TBinaryProtocolFactory()):
+    """Deserialize `thrift_object` from `buf`, yielding the elements of its
+    container field `name` one at a time instead of building it.
+    """
+    transport = TMemoryBuffer(buf)
+    protocol = proto_factory.get_protocol(transport)
+    return iter_struct(protocol, thrift_object, name)
+
+
+def deserialize_columns(thrift_object, buf, name,
+                        proto_factory=TBinaryProtocolFactory()):
+    """Deserialize `thrift_object` from `buf`, returning its list of structs
+    field `name` as columns instead of building the structs.
+    """
+    transport = TMemoryBuffer(buf)
+    protocol = proto_factory.get_protocol(transport)
+    return read_columns(protocol, thrift_object, name)
+
+
 def hexlify(byte_array, delimeter=' '):
     s = binascii.hexlify(byte_array).decode('utf-8')
     return delimeter.join(a+b for a, b in zip(s[::2], s[1::2]))